@@ -0,0 +1,411 @@
+import asyncio
+import inspect
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set
+from urllib.parse import urlsplit
+
+import asyncpg
+
+from app.core import consistency, metrics
+from app.core.config import get_settings
+from app.db import PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+CommitHook = Callable[[], Optional[Awaitable[None]]]
+# Callbacks waiting for the request transaction (see app.deps.get_conn) to commit.
+_after_commit: ContextVar[Optional[List[CommitHook]]] = ContextVar("after_commit", default=None)
+# Awaitable hooks started outside a request transaction, referenced until done.
+_detached_hooks: Set[asyncio.Future] = set()
+
+# WAL positions as plain integers (bytes since 0/0), comparable across servers of one cluster.
+CURRENT_LSN_SQL = "SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::bigint"
+REPLAY_LSN_SQL = """
+    SELECT pg_is_in_recovery() AS in_recovery,
+           pg_wal_lsn_diff(COALESCE(pg_last_wal_replay_lsn(), '0/0'), '0/0')::bigint AS replay_lsn
+"""
+# NULL until the transaction writes something; lets a commit skip the LSN lookup for pure reads.
+WROTE_SQL = "SELECT txid_current_if_assigned() IS NOT NULL"
+
+
+class PooledConnection(asyncpg.Connection):
+    """Connection that remembers when it was opened, for DB_POOL_MAX_LIFETIME."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.opened_at = time.monotonic()
+
+
+class InstrumentedConnection(PooledConnection):
+    """Connection that times every statement under the current query name.
+
+    Timings go to ``db_query_duration_seconds{query=...}``; statements slower
+    than SLOW_QUERY_MS are handed to the slow-query log.
+    """
+
+    async def _timed(self, method: Callable[..., Awaitable[Any]], query: str, args: Sequence[Any], **kwargs: Any):
+        name = metrics.current_query_name()
+        started = time.perf_counter()
+        try:
+            result = await method(query, *args, **kwargs)
+        except BaseException:
+            metrics.observe_query(name, time.perf_counter() - started, failed=True)
+            raise
+        elapsed = time.perf_counter() - started
+        metrics.observe_query(name, elapsed)
+        if metrics.slow_query_log.is_slow(elapsed):
+            await metrics.slow_query_log.record(self, name, query, args, elapsed)
+        return result
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._timed(super().execute, query, args, **kwargs)
+
+    async def executemany(self, command: str, args, **kwargs: Any) -> None:
+        # One batch, one observation; the slow-query log skips it (no single args tuple).
+        name = metrics.current_query_name()
+        started = time.perf_counter()
+        try:
+            await super().executemany(command, args, **kwargs)
+        except BaseException:
+            metrics.observe_query(name, time.perf_counter() - started, failed=True)
+            raise
+        metrics.observe_query(name, time.perf_counter() - started)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any):
+        return await self._timed(super().fetch, query, args, **kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any):
+        return await self._timed(super().fetchrow, query, args, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any):
+        return await self._timed(super().fetchval, query, args, **kwargs)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # Decode json/jsonb to Python objects so rows look like the psycopg2 ones.
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(typename, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def _create_pool(**connect: Any) -> asyncpg.Pool:
+    settings = get_settings()
+    return await asyncpg.create_pool(
+        **connect,
+        min_size=settings.db_async_pool_min_size,
+        max_size=settings.db_async_pool_max_size,
+        max_queries=settings.db_pool_max_uses,
+        init=_init_connection,
+        connection_class=InstrumentedConnection if settings.metrics_enabled else PooledConnection,
+    )
+
+
+async def init_async_pool() -> asyncpg.Pool:
+    """Create the asyncpg pool used by the request handlers."""
+    global _pool
+    if _pool is None:
+        settings = get_settings()
+        _pool = await _create_pool(
+            host=settings.db_host,
+            port=settings.db_port,
+            database=settings.db_name,
+            user=settings.db_user,
+            password=settings.db_password,
+        )
+    return _pool
+
+
+async def connect_primary() -> asyncpg.Connection:
+    """Dedicated primary connection outside the pool (LISTEN, long-lived sync jobs)."""
+    settings = get_settings()
+    conn = await asyncpg.connect(
+        host=settings.db_host,
+        port=settings.db_port,
+        database=settings.db_name,
+        user=settings.db_user,
+        password=settings.db_password,
+    )
+    await _init_connection(conn)
+    return conn
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_async_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("Async database pool is not initialized")
+    return _pool
+
+
+async def _release(pool: asyncpg.Pool, conn: asyncpg.Connection) -> None:
+    """Return ``conn`` to ``pool``, or close it once it is older than DB_POOL_MAX_LIFETIME.
+
+    asyncpg only limits uses (``max_queries``) and idle time; a closed
+    connection's slot is reopened by the pool on the next acquire.
+    """
+    max_lifetime = get_settings().db_pool_max_lifetime
+    if max_lifetime and not conn.is_closed() and time.monotonic() - conn.opened_at >= max_lifetime:
+        try:
+            await conn.close(timeout=get_settings().db_pool_timeout)
+        except Exception as exc:
+            logger.warning("Closing an expired pool connection failed: %s", exc)
+    await pool.release(conn)
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """Borrow a connection from the async pool, raising PoolTimeout when saturated."""
+    pool = _pool or await init_async_pool()
+    timeout = get_settings().db_pool_timeout
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=timeout)
+    except asyncio.TimeoutError:
+        metrics.DB_ACQUIRE_TIMEOUTS.inc()
+        raise PoolTimeout(f"Timed out after {timeout}s waiting for a database connection")
+    metrics.DB_ACQUIRE_WAIT.observe(time.perf_counter() - started)
+    metrics.observe_pool(pool.get_size(), pool.get_idle_size())
+    try:
+        yield conn
+    finally:
+        await _release(pool, conn)
+        metrics.observe_pool(pool.get_size(), pool.get_idle_size())
+
+
+def async_pool_stats() -> dict:
+    pool = _pool
+    if pool is None:
+        return {"initialized": False}
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "saturation": round((size - idle) / pool.get_max_size(), 3),
+    }
+
+
+class Replica:
+    """One streaming replica: its pool and the state of its last health check."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        parts = urlsplit(dsn)
+        # Label for metrics and /health/db; never includes credentials.
+        self.name = f"{parts.hostname}:{parts.port or 5432}"
+        self.pool: Optional[asyncpg.Pool] = None
+        self.healthy = False
+        self.replay_lsn = 0
+        self.lag_bytes: Optional[int] = None
+        self.error: Optional[str] = "not checked yet"
+
+    def in_use(self) -> int:
+        pool = self.pool
+        return pool.get_size() - pool.get_idle_size() if pool is not None else 0
+
+    def mark_down(self, reason: str) -> None:
+        if self.healthy:
+            logger.warning("Replica %s ejected: %s", self.name, reason)
+        self.healthy = False
+        self.error = reason
+        metrics.DB_REPLICA_HEALTHY.labels(self.name).set(0)
+
+    def mark_up(self) -> None:
+        if not self.healthy:
+            logger.info("Replica %s receives reads", self.name)
+        self.healthy = True
+        self.error = None
+        metrics.DB_REPLICA_HEALTHY.labels(self.name).set(1)
+
+    async def check(self, primary_lsn: Optional[int], max_lag_bytes: int, timeout: float) -> None:
+        try:
+            if self.pool is None:
+                self.pool = await asyncio.wait_for(_create_pool(dsn=self.dsn), timeout)
+            async with self.pool.acquire(timeout=timeout) as conn:
+                with metrics.query_name("replica_health"):
+                    row = await conn.fetchrow(REPLAY_LSN_SQL, timeout=timeout)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            self.mark_down(f"health check failed: {exc!r}")
+            return
+        if not row["in_recovery"]:
+            # A promoted standby has its own timeline; LSNs from the primary mean nothing there.
+            self.mark_down("server is not in recovery")
+            return
+        self.replay_lsn = row["replay_lsn"]
+        if primary_lsn is not None:
+            self.lag_bytes = max(primary_lsn - self.replay_lsn, 0)
+            metrics.DB_REPLICA_LAG.labels(self.name).set(self.lag_bytes)
+            if self.lag_bytes > max_lag_bytes:
+                self.mark_down(f"lagging {self.lag_bytes} bytes behind the primary")
+                return
+        self.mark_up()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_bytes": self.lag_bytes,
+            "in_use": self.in_use(),
+            "error": self.error,
+        }
+
+
+class ReplicaSet:
+    """Read replicas behind ``acquire_read``, health-checked in the background.
+
+    Every DB_REPLICA_CHECK_INTERVAL seconds each replica reports its replay
+    position; one that fails the check or trails the primary by more than
+    DB_REPLICA_MAX_LAG_BYTES stops receiving reads until a later check passes.
+    A replica whose connection fails mid-request is ejected at once.
+    """
+
+    def __init__(self, dsns: List[str]):
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self, min_lsn: int) -> Optional[Replica]:
+        """Least busy healthy replica that has replayed ``min_lsn``; None means use the primary."""
+        candidates = [r for r in self.replicas if r.healthy and r.replay_lsn >= min_lsn]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: (r.in_use(), random.random()))
+
+    async def check(self) -> None:
+        settings = get_settings()
+        try:
+            async with acquire() as conn:
+                with metrics.query_name("replica_health"):
+                    primary_lsn = await conn.fetchval(CURRENT_LSN_SQL)
+        except (OSError, PoolTimeout, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            # Lag is unknown without the primary; replicas are still checked for reachability.
+            logger.warning("Could not read the primary WAL position: %s", exc)
+            primary_lsn = None
+        await asyncio.gather(*(
+            r.check(primary_lsn, settings.db_replica_max_lag_bytes, settings.db_pool_timeout)
+            for r in self.replicas
+        ))
+
+    async def _run(self) -> None:
+        interval = get_settings().db_replica_check_interval
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Replica health check failed")
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+                replica.pool = None
+            replica.healthy = False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [r.stats() for r in self.replicas]
+
+
+@asynccontextmanager
+async def acquire_read() -> AsyncIterator[asyncpg.Connection]:
+    """Connection for read-only work: a replica that has replayed the client's last write, else the primary.
+
+    Callers must not write through it. Without DB_REPLICA_DSNS this is ``acquire()``.
+    """
+    replica = replica_set.choose(consistency.required_lsn())
+    if replica is not None:
+        try:
+            conn = await replica.pool.acquire(timeout=get_settings().db_pool_timeout)
+        except asyncio.TimeoutError:
+            conn = None  # busy, not broken: this read goes to the primary
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            replica.mark_down(f"connection failed: {exc!r}")
+            conn = None
+        if conn is not None:
+            metrics.DB_READS.labels(replica.name).inc()
+            try:
+                yield conn
+            except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError) as exc:
+                replica.mark_down(f"connection lost: {exc!r}")
+                raise
+            finally:
+                await _release(replica.pool, conn)
+            return
+    metrics.DB_READS.labels("primary").inc()
+    async with acquire() as conn:
+        yield conn
+
+
+def after_commit(callback: CommitHook) -> None:
+    """Run ``callback`` once the current request transaction has committed.
+
+    Dropped if the transaction rolls back. Outside a request transaction
+    (CLI, background tasks) it runs immediately. A callback may return an
+    awaitable: ``run_commit_hooks`` awaits it, outside a transaction it is
+    started as a task.
+    """
+    hooks = _after_commit.get()
+    if hooks is not None:
+        hooks.append(callback)
+        return
+    result = callback()
+    if inspect.isawaitable(result):
+        task = asyncio.ensure_future(result)
+        _detached_hooks.add(task)
+        task.add_done_callback(_detached_hooks.discard)
+
+
+@contextmanager
+def commit_hooks() -> Iterator[List[CommitHook]]:
+    """Collect ``after_commit`` callbacks; the caller runs them once its transaction committed."""
+    hooks: List[CommitHook] = []
+    token = _after_commit.set(hooks)
+    try:
+        yield hooks
+    finally:
+        _after_commit.reset(token)
+
+
+async def run_commit_hooks(hooks: List[CommitHook]) -> None:
+    """Run collected hooks in order; the data is committed, so one failing hook does not stop the rest."""
+    for hook in hooks:
+        try:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.exception("after_commit hook failed")
+
+
+async def record_commit_lsn(conn: asyncpg.Connection) -> None:
+    """After a committed write, hand the primary's WAL position to the read-your-writes cookie."""
+    consistency.record_write(await conn.fetchval(CURRENT_LSN_SQL))
+
+
+replica_set = ReplicaSet([d.strip() for d in get_settings().db_replica_dsns.split(",") if d.strip()])
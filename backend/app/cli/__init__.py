@@ -0,0 +1 @@
+# Command-line jobs: python -m app.cli.<job>
@@ -0,0 +1,65 @@
+"""Bulk-load places from a GeoJSON FeatureCollection, NDJSON or CSV file.
+
+    python -m app.cli.import_places places.geojson
+    python -m app.cli.import_places dump.txt --format ndjson --batch-size 10000
+
+Rows are upserted by external_id, one transaction per batch; the JSON report
+goes to stdout. A running API rebuilds its clusters on the places_changes
+NOTIFY; its tiles pick the new places up after TILE_CACHE_TTL (POST
+/places/import refreshes them at once).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import AsyncIterator
+
+from app.async_db import close_async_pool
+from app.core.config import get_settings
+from app.services.ingest import FORMATS, ImportFormatError, import_places
+
+CHUNK_SIZE = 1 << 16
+EXTENSIONS = {".geojson": "geojson", ".json": "geojson", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+async def _read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def _run(path: str, fmt: str, batch_size: int, max_errors: int) -> dict:
+    try:
+        return await import_places(_read_chunks(path), fmt, batch_size, max_errors)
+    finally:
+        await close_async_pool()
+
+
+def main(argv=None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=settings.import_batch_size)
+    parser.add_argument("--max-errors", type=int, default=settings.import_max_errors)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or EXTENSIONS.get(os.path.splitext(args.path)[1].lower())
+    if fmt is None:
+        parser.error("cannot guess the format from the file name, pass --format")
+    try:
+        report = asyncio.run(_run(args.path, fmt, args.batch_size, args.max_errors))
+    except ImportFormatError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        if exc.report is not None:
+            json.dump(exc.report, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        return 2
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
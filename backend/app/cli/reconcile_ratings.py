@@ -0,0 +1,41 @@
+"""Verify places.rating_sum/rating_count against reviews.
+
+    python -m app.cli.reconcile_ratings          # report mismatches, exit 1 if any
+    python -m app.cli.reconcile_ratings --fix    # also rewrite them from reviews
+
+Run from cron; with RATING_WRITE_BEHIND enabled, avoid --fix while the API is
+taking ratings, since changes still buffered in a worker would be counted twice.
+"""
+import argparse
+import logging
+import sys
+
+from app.db import close_pool, get_db_conn
+from app.services.ratings import reconcile_ratings
+
+logger = logging.getLogger("reconcile_ratings")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="repair mismatching aggregates")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    try:
+        with get_db_conn() as conn:
+            mismatches = reconcile_ratings(conn, fix=args.fix)
+    finally:
+        close_pool()
+
+    for m in mismatches:
+        logger.warning(
+            "place %s: stored sum=%s count=%s, reviews sum=%s count=%s",
+            m["place_id"], m["rating_sum"], m["rating_count"], m["actual_sum"], m["actual_count"],
+        )
+    logger.info("%d mismatching places%s", len(mismatches), " repaired" if args.fix and mismatches else "")
+    return 1 if mismatches and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
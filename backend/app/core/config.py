@@ -14,9 +14,102 @@ class Settings(BaseSettings):
     db_user: str = Field(default_factory=lambda: os.getenv("DB_USER", "postgres"))
     db_password: str = Field(default_factory=lambda: os.getenv("DB_PASSWORD", "postgres"))
 
+    db_pool_min_size: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_MIN_SIZE", "2")))
+    db_pool_max_size: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_MAX_SIZE", "20")))
+    db_pool_timeout: float = Field(default_factory=lambda: float(os.getenv("DB_POOL_TIMEOUT", "5")))
+    db_pool_max_uses: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_MAX_USES", "5000")))
+    db_pool_max_lifetime: float = Field(default_factory=lambda: float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")))
+    db_pool_health_check_interval: float = Field(
+        default_factory=lambda: float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+    )
+    db_async_pool_min_size: int = Field(default_factory=lambda: int(os.getenv("DB_ASYNC_POOL_MIN_SIZE", "5")))
+    db_async_pool_max_size: int = Field(default_factory=lambda: int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", "50")))
+    # Read replicas (CSV of postgresql:// DSNs); read-only handlers are balanced across the healthy ones.
+    db_replica_dsns: str = Field(default_factory=lambda: os.getenv("DB_REPLICA_DSNS", ""))
+    db_replica_check_interval: float = Field(default_factory=lambda: float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2")))
+    db_replica_max_lag_bytes: int = Field(
+        default_factory=lambda: int(os.getenv("DB_REPLICA_MAX_LAG_BYTES", str(16 * 1024 * 1024)))
+    )
+    # Lifetime of the read-your-writes cookie (primary WAL position of the client's last write).
+    read_your_writes_ttl: int = Field(default_factory=lambda: int(os.getenv("READ_YOUR_WRITES_TTL", "60")))
+
     jwt_secret: str = Field(default_factory=lambda: os.getenv("JWT_SECRET", "change-me-in-prod"))
     jwt_algorithm: str = Field(default_factory=lambda: os.getenv("JWT_ALGORITHM", "HS256"))
     jwt_expires_minutes: int = Field(default_factory=lambda: int(os.getenv("JWT_EXPIRES_MINUTES", "60")))
+    # When enabled, tokens carry username/role claims and authenticated requests skip the user lookup.
+    jwt_embed_role: bool = Field(default_factory=lambda: os.getenv("JWT_EMBED_ROLE", "false").lower() == "true")
+
+    password_bcrypt_rounds: int = Field(default_factory=lambda: int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12")))
+    password_hash_workers: int = Field(default_factory=lambda: int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+    password_hash_max_pending: int = Field(default_factory=lambda: int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")))
+
+    principal_cache_size: int = Field(default_factory=lambda: int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")))
+    principal_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("PRINCIPAL_CACHE_TTL", "60")))
+
+    tile_cache_size: int = Field(default_factory=lambda: int(os.getenv("TILE_CACHE_SIZE", "5000")))
+    tile_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("TILE_CACHE_TTL", "3600")))
+    tile_cache_dir: str = Field(default_factory=lambda: os.getenv("TILE_CACHE_DIR", ""))
+
+    cluster_max_zoom: int = Field(default_factory=lambda: int(os.getenv("CLUSTER_MAX_ZOOM", "16")))
+    cluster_rebuild_debounce: float = Field(default_factory=lambda: float(os.getenv("CLUSTER_REBUILD_DEBOUNCE", "5")))
+
+    tag_cache_size: int = Field(default_factory=lambda: int(os.getenv("TAG_CACHE_SIZE", "2048")))
+    tag_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("TAG_CACHE_TTL", "30")))
+    response_cache_size: int = Field(default_factory=lambda: int(os.getenv("RESPONSE_CACHE_SIZE", "1000")))
+    response_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("RESPONSE_CACHE_TTL", "60")))
+    response_cache_max_body: int = Field(
+        default_factory=lambda: int(os.getenv("RESPONSE_CACHE_MAX_BODY", str(1024 * 1024)))
+    )
+    # Buffer rating changes and apply them per place every RATING_FLUSH_INTERVAL seconds.
+    rating_write_behind: bool = Field(
+        default_factory=lambda: os.getenv("RATING_WRITE_BEHIND", "false").lower() == "true"
+    )
+    rating_flush_interval: float = Field(default_factory=lambda: float(os.getenv("RATING_FLUSH_INTERVAL", "1")))
+    # Distance (m) at which geo-biased search halves a result's score.
+    search_geo_bias_m: float = Field(default_factory=lambda: float(os.getenv("SEARCH_GEO_BIAS_M", "5000")))
+    distance_matrix_max_origins: int = Field(default_factory=lambda: int(os.getenv("DISTANCE_MATRIX_MAX_ORIGINS", "100")))
+    distance_matrix_max_places: int = Field(default_factory=lambda: int(os.getenv("DISTANCE_MATRIX_MAX_PLACES", "2000")))
+    distance_matrix_max_cells: int = Field(default_factory=lambda: int(os.getenv("DISTANCE_MATRIX_MAX_CELLS", "100000")))
+    import_batch_size: int = Field(default_factory=lambda: int(os.getenv("IMPORT_BATCH_SIZE", "5000")))
+    import_max_errors: int = Field(default_factory=lambda: int(os.getenv("IMPORT_MAX_ERRORS", "1000")))
+    export_batch_size: int = Field(default_factory=lambda: int(os.getenv("EXPORT_BATCH_SIZE", "1000")))
+    # ST_Subdivide target: polygon pieces of at most this many vertices keep GIST lookups selective.
+    polygon_subdivide_vertices: int = Field(default_factory=lambda: int(os.getenv("POLYGON_SUBDIVIDE_VERTICES", "128")))
+    polygon_cache_size: int = Field(default_factory=lambda: int(os.getenv("POLYGON_CACHE_SIZE", "256")))
+    polygon_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("POLYGON_CACHE_TTL", "3600")))
+    polygon_batch_max: int = Field(default_factory=lambda: int(os.getenv("POLYGON_BATCH_MAX", "50")))
+    # In-memory spatial index (needs numpy): answers nearby/within/distance/bbox export without SQL.
+    spatial_index_enabled: bool = Field(
+        default_factory=lambda: os.getenv("SPATIAL_INDEX_ENABLED", "false").lower() == "true"
+    )
+    spatial_index_cell_deg: float = Field(default_factory=lambda: float(os.getenv("SPATIAL_INDEX_CELL_DEG", "0.01")))
+    # session: clients see their own writes (db_lsn cookie), else PostGIS; eventual: always memory once loaded.
+    spatial_index_consistency: str = Field(
+        default_factory=lambda: os.getenv("SPATIAL_INDEX_CONSISTENCY", "session")
+    )
+    spatial_index_sync_interval: float = Field(
+        default_factory=lambda: float(os.getenv("SPATIAL_INDEX_SYNC_INTERVAL", "1"))
+    )
+    # Corridor search cuts routes into pieces of about this length (m) so each index probe stays narrow.
+    route_corridor_piece_m: float = Field(default_factory=lambda: float(os.getenv("ROUTE_CORRIDOR_PIECE_M", "1000")))
+    route_corridor_max_m: float = Field(default_factory=lambda: float(os.getenv("ROUTE_CORRIDOR_MAX_M", "5000")))
+
+    # Push notifications: LISTEN/NOTIFY listener per worker, geofence grid cell size in degrees.
+    notify_enabled: bool = Field(default_factory=lambda: os.getenv("NOTIFY_ENABLED", "true").lower() == "true")
+    notify_grid_deg: float = Field(default_factory=lambda: float(os.getenv("NOTIFY_GRID_DEG", "0.05")))
+    notify_queue_size: int = Field(default_factory=lambda: int(os.getenv("NOTIFY_QUEUE_SIZE", "100")))
+    notify_max_subscribers: int = Field(default_factory=lambda: int(os.getenv("NOTIFY_MAX_SUBSCRIBERS", "10000")))
+    notify_backlog: int = Field(default_factory=lambda: int(os.getenv("NOTIFY_BACKLOG", "10000")))
+    notify_keepalive: float = Field(default_factory=lambda: float(os.getenv("NOTIFY_KEEPALIVE", "15")))
+
+    metrics_enabled: bool = Field(default_factory=lambda: os.getenv("METRICS_ENABLED", "true").lower() == "true")
+    # Statements slower than this are logged; 0 disables the slow-query log.
+    slow_query_ms: float = Field(default_factory=lambda: float(os.getenv("SLOW_QUERY_MS", "500")))
+    slow_query_explain: bool = Field(default_factory=lambda: os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true")
+    # EXPLAIN ANALYZE re-runs the statement: at most once per query name per this many seconds.
+    slow_query_explain_interval: float = Field(
+        default_factory=lambda: float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+    )
 
     cors_origins: str = Field(default_factory=lambda: os.getenv("CORS_ORIGINS", "*"))
     admin_users: str = Field(default_factory=lambda: os.getenv("ADMIN_USERS", ""))
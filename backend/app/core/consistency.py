@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+from typing import Iterator, Optional
+
+LSN_COOKIE = "db_lsn"
+
+
+class _RequestLsn:
+    """WAL positions of one request: what it must read (cookie) and what it wrote."""
+
+    __slots__ = ("required", "written")
+
+    def __init__(self, required: int):
+        self.required = required
+        self.written: Optional[int] = None
+
+
+_request: ContextVar[Optional[_RequestLsn]] = ContextVar("request_lsn", default=None)
+# Floor raised inside at_least(), e.g. while building a response that gets cached for everyone.
+_floor: ContextVar[int] = ContextVar("lsn_floor", default=0)
+# Highest primary WAL position after a write committed by this process.
+_latest_write = 0
+
+
+def required_lsn() -> int:
+    """WAL position a replica must have replayed to serve the current read."""
+    state = _request.get()
+    return max(state.required if state is not None else 0, _floor.get())
+
+
+def latest_write_lsn() -> int:
+    return _latest_write
+
+
+def record_write(lsn: int) -> None:
+    """Remember the primary position after the current request's commit."""
+    global _latest_write
+    _latest_write = max(_latest_write, lsn)
+    state = _request.get()
+    if state is not None:
+        state.written = max(state.written or 0, lsn)
+
+
+@contextmanager
+def at_least(lsn: int) -> Iterator[None]:
+    token = _floor.set(max(_floor.get(), lsn))
+    try:
+        yield
+    finally:
+        _floor.reset(token)
+
+
+def _cookie_lsn(headers) -> int:
+    for name, value in headers:
+        if name != b"cookie":
+            continue
+        try:
+            morsel = SimpleCookie(value.decode("latin-1")).get(LSN_COOKIE)
+        except CookieError:
+            return 0
+        if morsel is not None and morsel.value.isdigit():
+            return int(morsel.value)
+    return 0
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware giving each client read-your-writes on top of replica reads.
+
+    A request that committed a write answers with a ``db_lsn`` cookie holding
+    the primary's WAL position after the commit. Later requests carrying it
+    are served by a replica only once that replica has replayed past the
+    position, by the primary until then; the cookie expires after ``ttl``
+    seconds, by which time replicas within DB_REPLICA_MAX_LAG_BYTES caught up.
+    """
+
+    def __init__(self, app, ttl: int):
+        self.app = app
+        self.ttl = ttl
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = _RequestLsn(_cookie_lsn(scope["headers"]))
+
+        async def send_with_cookie(message) -> None:
+            if message["type"] == "http.response.start" and state.written is not None:
+                cookie = f"{LSN_COOKIE}={state.written}; Max-Age={self.ttl}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        token = _request.set(state)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import asyncpg
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_query")
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests served", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method", "route"], multiprocess_mode="livesum"
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["query"], buckets=DB_BUCKETS
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised", ["query"])
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ["query"])
+DB_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a pooled connection", buckets=DB_BUCKETS
+)
+DB_ACQUIRE_TIMEOUTS = Counter("db_pool_acquire_timeouts_total", "Connection acquisitions that timed out")
+DB_POOL_SIZE = Gauge("db_pool_size", "Open connections in the async pool", multiprocess_mode="livesum")
+DB_POOL_IN_USE = Gauge("db_pool_in_use", "Async pool connections checked out", multiprocess_mode="livesum")
+DB_READS = Counter("db_reads_total", "Read-only connections handed out, by server", ["target"])
+DB_REPLICA_HEALTHY = Gauge("db_replica_healthy", "1 while a replica receives reads", ["replica"], multiprocess_mode="min")
+SPATIAL_INDEX_QUERIES = Counter(
+    "spatial_index_queries_total", "Spatial queries by where they were answered", ["query", "source"]
+)
+DB_REPLICA_LAG = Gauge("db_replica_lag_bytes", "WAL a replica has yet to replay", ["replica"], multiprocess_mode="max")
+
+UNNAMED_QUERY = "unnamed"
+UNMATCHED_ROUTE = "unmatched"
+
+# Logical name SQL timings are labelled with: the route's endpoint name unless overridden.
+_query_name: ContextVar[str] = ContextVar("query_name", default=UNNAMED_QUERY)
+
+# Only plain reads are re-run under EXPLAIN ANALYZE.
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|NEXTVAL|SETVAL)\b", re.IGNORECASE)
+
+
+@contextmanager
+def query_name(name: str) -> Iterator[None]:
+    """Label the SQL statements run inside the block, e.g. ``with query_name("rating_flush"):``."""
+    token = _query_name.set(name)
+    try:
+        yield
+    finally:
+        _query_name.reset(token)
+
+
+def current_query_name() -> str:
+    return _query_name.get()
+
+
+def observe_query(name: str, seconds: float, failed: bool = False) -> None:
+    DB_QUERY_LATENCY.labels(name).observe(seconds)
+    if failed:
+        DB_QUERY_ERRORS.labels(name).inc()
+
+
+def observe_pool(size: int, idle: int) -> None:
+    DB_POOL_SIZE.set(size)
+    DB_POOL_IN_USE.set(size - idle)
+
+
+class SlowQueryLog:
+    """Logs statements above ``threshold_ms``, with their plan for read-only ones.
+
+    The plan comes from re-running the statement under ``EXPLAIN (ANALYZE,
+    BUFFERS)`` on the same connection, inside a savepoint so a failure cannot
+    poison the caller's transaction. That doubles the cost of an already slow
+    query, so each query name is explained at most once per ``explain_interval``.
+    """
+
+    def __init__(self, threshold_ms: float, explain: bool, explain_interval: float):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._last_explain: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_slow(self, seconds: float) -> bool:
+        return self.threshold_ms > 0 and seconds * 1000 >= self.threshold_ms
+
+    def _should_explain(self, name: str, sql: str) -> bool:
+        if not self.explain or not _READ_ONLY.match(sql) or _WRITES.search(sql):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_explain.get(name, float("-inf")) < self.explain_interval:
+                return False
+            self._last_explain[name] = now
+        return True
+
+    async def record(self, conn, name: str, sql: str, args: Sequence[Any], seconds: float) -> None:
+        DB_SLOW_QUERIES.labels(name).inc()
+        plan: Optional[str] = None
+        if self._should_explain(name, sql):
+            plan = await self._explain(conn, sql, args)
+        statement = " ".join(sql.split())
+        if plan:
+            slow_query_logger.warning("Slow query %s: %.1f ms\n%s\n%s", name, seconds * 1000, statement, plan)
+        else:
+            slow_query_logger.warning("Slow query %s: %.1f ms: %s", name, seconds * 1000, statement)
+
+    @staticmethod
+    async def _explain(conn, sql: str, args: Sequence[Any]) -> Optional[str]:
+        try:
+            # Savepoint inside a request transaction, a short transaction otherwise.
+            async with conn.transaction():
+                # Bypass the instrumented fetch: the plan run must not count as traffic.
+                rows = await asyncpg.Connection.fetch(conn, "EXPLAIN (ANALYZE, BUFFERS) " + sql, *args)
+        except Exception as exc:
+            logger.debug("EXPLAIN of a slow query failed: %s", exc)
+            return None
+        return "\n".join(r[0] for r in rows)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status counts and in-flight requests.
+
+    Routes are labelled by their path template (``/places/{place_id:int}``) so
+    ids never explode label cardinality; SQL run while serving a request is
+    labelled with the route's endpoint name (e.g. ``nearby_places``).
+    """
+
+    def __init__(self, app, routes: Sequence[Any]):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope) -> Tuple[str, str]:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path, route.name
+            if match == Match.PARTIAL and partial is None:
+                partial = route
+        if partial is not None:
+            return partial.path, partial.name
+        return UNMATCHED_ROUTE, UNNAMED_QUERY
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route, name = self._route(scope)
+        status = [500]
+
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            with query_name(name):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status[0])).inc()
+            in_progress.dec()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition-format payload; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+_settings = get_settings()
+slow_query_log = SlowQueryLog(
+    threshold_ms=_settings.slow_query_ms,
+    explain=_settings.slow_query_explain,
+    explain_interval=_settings.slow_query_explain_interval,
+)
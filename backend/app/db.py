@@ -1,49 +1,257 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
 import psycopg2
+import psycopg2.extensions
+
 from app.core.config import get_settings
 
 
-def get_db_conn():
-    """Open a new database connection using environment variables."""
-    settings = get_settings()
-    return psycopg2.connect(
-        host=settings.db_host,
-        port=settings.db_port,
-        dbname=settings.db_name,
-        user=settings.db_user,
-        password=settings.db_password,
-    )
-import os
-import psycopg2
-import psycopg2.extras
+class PoolTimeout(Exception):
+    """Raised when no connection could be acquired within the pool timeout."""
 
 
-def get_db_conn():
-    """Open a new database connection using environment variables."""
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "db"),
-        port=int(os.getenv("DB_PORT", "5432")),
-        dbname=os.getenv("DB_NAME", "geodb"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-    )
-
-
-def refresh_avg_rating(conn, place_id: int) -> float:
-    """Recalculate and update avg_rating after rating changes."""
-    sql = """
-        WITH stats AS (
-            SELECT AVG(rating) AS avg_rating
-            FROM place_ratings
-            WHERE place_id = %s
-        )
-        UPDATE places
-        SET avg_rating = stats.avg_rating
-        FROM stats
-        WHERE id = %s
-        RETURNING COALESCE(stats.avg_rating, 0) AS avg_rating;
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool shared by all request handlers.
+
+    Connections are opened lazily up to ``max_size``, checked before being
+    handed out and recycled after ``max_uses`` checkouts or ``max_lifetime``
+    seconds, so a long-lived worker never keeps a stale backend around.
     """
-    with conn.cursor() as cur:
-        cur.execute(sql, (place_id, place_id))
-        row = cur.fetchone()
-    return float(row[0]) if row else 0.0
 
+    def __init__(
+        self,
+        min_size: int,
+        max_size: int,
+        timeout: float,
+        max_uses: int,
+        max_lifetime: float,
+        health_check_interval: float,
+        **conn_kwargs: Any,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 1 <= max_size and min_size <= max_size")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._conn_kwargs = conn_kwargs
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        self._meta: Dict[Any, Dict[str, float]] = {}
+        self._in_use = 0
+        self._opening = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "acquired_total": 0,
+            "timeouts_total": 0,
+            "opened_total": 0,
+            "recycled_total": 0,
+            "failed_checks_total": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+    # -- connection lifecycle -------------------------------------------------
+
+    def _open(self):
+        conn = psycopg2.connect(**self._conn_kwargs)
+        now = time.monotonic()
+        self._meta[conn] = {"created_at": now, "last_used": now, "uses": 0}
+        return conn
+
+    def _expired(self, conn) -> bool:
+        meta = self._meta.get(conn)
+        if conn.closed or meta is None:
+            return True
+        if self.max_uses and meta["uses"] >= self.max_uses:
+            return True
+        if self.max_lifetime and time.monotonic() - meta["created_at"] >= self.max_lifetime:
+            return True
+        return False
+
+    def _healthy(self, conn) -> bool:
+        meta = self._meta[conn]
+        if time.monotonic() - meta["last_used"] < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        self._meta.pop(conn, None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def open(self) -> None:
+        """Pre-open ``min_size`` connections so the first requests find them warm."""
+        with self._cond:
+            missing = self.min_size - len(self._idle) - self._in_use
+            for _ in range(max(0, missing)):
+                self._idle.append(self._open())
+                self._counters["opened_total"] += 1
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._in_use + self._opening >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counters["timeouts_total"] += 1
+                            raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._in_use += 1
+                else:
+                    self._opening += 1
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use += 1
+                    self._counters["opened_total"] += 1
+            else:
+                expired = self._expired(conn)
+                if expired or not self._healthy(conn):
+                    with self._cond:
+                        counter = "recycled_total" if expired else "failed_checks_total"
+                        self._counters[counter] += 1
+                        self._discard(conn)
+                        self._in_use -= 1
+                        self._cond.notify()
+                    continue
+            meta = self._meta[conn]
+            meta["uses"] += 1
+            with self._cond:
+                self._counters["acquired_total"] += 1
+                self._counters["wait_seconds_total"] += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        with self._cond:
+            self._in_use -= 1
+            if not discard and not conn.closed:
+                status = conn.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        discard = True
+            if discard or self._closed or conn.closed:
+                self._discard(conn)
+            elif self._expired(conn):
+                self._counters["recycled_total"] += 1
+                self._discard(conn)
+            else:
+                self._meta[conn]["last_used"] = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commit on success, roll back on error, then return it."""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken or bool(conn.closed))
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            size = len(self._idle) + self._in_use
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "saturation": round(self._in_use / self.max_size, 3),
+                **self._counters,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it from settings on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = get_settings()
+                _pool = ConnectionPool(
+                    min_size=settings.db_pool_min_size,
+                    max_size=settings.db_pool_max_size,
+                    timeout=settings.db_pool_timeout,
+                    max_uses=settings.db_pool_max_uses,
+                    max_lifetime=settings.db_pool_max_lifetime,
+                    health_check_interval=settings.db_pool_health_check_interval,
+                    host=settings.db_host,
+                    port=settings.db_port,
+                    dbname=settings.db_name,
+                    user=settings.db_user,
+                    password=settings.db_password,
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_db_conn():
+    """Borrow a pooled connection: ``with get_db_conn() as conn: ...``.
+
+    The transaction is committed when the block exits normally and rolled
+    back on error; the connection always goes back to the pool.
+    """
+    return get_pool().connection()
@@ -1,36 +1,69 @@
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Any, AsyncIterator, Dict, Optional
 
+import asyncpg
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 
 from app.core.config import get_settings
-from app.db import get_db_conn
-from app.services.users import get_user_by_id
+from app.async_db import WROTE_SQL, acquire, acquire_read, commit_hooks, record_commit_lsn, replica_set, run_commit_hooks
+from app.services.response_cache import data_versions
+from app.services.spatial_index import spatial_index
+from app.services.users import get_principal
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+async def get_conn() -> AsyncIterator[asyncpg.Connection]:
+    """One connection and transaction per request.
+
+    FastAPI caches the dependency for the request, so the handler and its
+    other dependencies share it. The transaction commits when the handler returns and
+    rolls back if it raises (including HTTPException). Response-cache versions
+    bumped by the handler are bumped again after the transaction ends, and
+    ``after_commit`` callbacks run only once it committed. With
+    read replicas or a session-consistent spatial index, a committed write
+    sets the client's read-your-writes cookie.
+    """
+    async with acquire() as conn:
+        with data_versions.deferred(), commit_hooks() as hooks:
+            async with conn.transaction():
+                yield conn
+                wrote = (replica_set.enabled or spatial_index.tracks_writes) and await conn.fetchval(WROTE_SQL)
+            await run_commit_hooks(hooks)
+            if wrote:
+                await record_commit_lsn(conn)
+
+
+async def get_read_conn() -> AsyncIterator[asyncpg.Connection]:
+    """Request-scoped connection for read-only handlers (autocommit, no BEGIN/COMMIT); may be a replica."""
+    async with acquire_read() as conn:
+        yield conn
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    if "sub" in to_encode:
+        to_encode["sub"] = str(to_encode["sub"])
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=15))
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
+def user_token_claims(user_id: int, username: str, role: str) -> Dict[str, Any]:
+    """Claims for a user's access token; role claims only when JWT_EMBED_ROLE is on."""
+    claims: Dict[str, Any] = {"sub": user_id}
+    if settings.jwt_embed_role:
+        claims.update({"username": username, "role": role})
+    return claims
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
-
-def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """The token's user, without a request connection: read-only handlers stay on their replica."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -38,14 +71,25 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
     )
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
-    with get_db_conn() as conn:
-        user = get_user_by_id(conn, int(user_id))
-        if user is None:
+    if settings.jwt_embed_role and payload.get("role") and payload.get("username"):
+        # Signed claims stand only while they match the user's row, cached per user rather than
+        # per token: a role change or deletion revokes the token (within PRINCIPAL_CACHE_TTL in
+        # other workers, at once in this one).
+        current = await get_principal(user_id, None)
+        if current is None or (current["username"], current["role"]) != (payload["username"], payload["role"]):
             raise credentials_exception
-        return user
+        return current
+    user = await get_principal(user_id, payload.get("jti") or payload.get("iat"))
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+async def require_admin(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return current_user
 
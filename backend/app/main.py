@@ -1,12 +1,27 @@
-from fastapi import FastAPI
+import logging
+
+import asyncpg
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.core.config import get_settings
-from app.routers import places, health
+from app.core.consistency import ReadYourWritesMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.async_db import close_async_pool, init_async_pool, replica_set
+from app.db import PoolTimeout, close_pool
+from app.services.clusters import cluster_manager
+from app.services.notifications import notification_hub
+from app.services.pagination import NEXT_CURSOR_HEADER, InvalidCursor
+from app.services.passwords import HashingBusy, password_hasher
+from app.services.ratings import rating_aggregator
+from app.services.spatial_index import spatial_index
+from app.routers import areas, auth, places, health
 from app.routers import routes as routes_router
 from app.routers import users as users_router
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.app_name, version=settings.version)
 
@@ -17,10 +32,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
+if replica_set.enabled or spatial_index.tracks_writes:
+    app.add_middleware(ReadYourWritesMiddleware, ttl=settings.read_your_writes_ttl)
+if settings.metrics_enabled:
+    # Outermost, so the measured latency includes every other middleware.
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+
+@app.on_event("startup")
+async def open_db_pool():
+    try:
+        await init_async_pool()
+    except (OSError, asyncpg.PostgresError) as exc:
+        # acquire() retries creating the pool once the database is reachable.
+        logger.warning("Could not open database pool: %s", exc)
+    replica_set.start()
+    spatial_index.start()
+    cluster_manager.start()
+    if settings.notify_enabled:
+        notification_hub.start()
+    if settings.rating_write_behind:
+        rating_aggregator.start()
+
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await cluster_manager.stop()
+    await notification_hub.stop()
+    await rating_aggregator.stop()
+    await replica_set.stop()
+    await spatial_index.stop()
+    await close_async_pool()
+    close_pool()
+    password_hasher.shutdown()
+
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, retry later"})
+
+
+@app.exception_handler(HashingBusy)
+def hashing_busy_handler(request: Request, exc: HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many authentication requests, retry later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(InvalidCursor)
+def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 
 app.include_router(health.router)
+app.include_router(auth.router)
 app.include_router(users_router.router)
 app.include_router(places.router)
 app.include_router(routes_router.router)
-
+app.include_router(areas.router)
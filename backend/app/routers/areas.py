@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.core.config import get_settings
+from app.deps import get_conn, get_current_user, get_read_conn
+from app.schemas import AreaCreate, AreaOut
+from app.services.pagination import decode_cursor, keyset_clause, paginate, set_next_cursor
+
+router = APIRouter(prefix="/areas", tags=["areas"])
+settings = get_settings()
+
+AREA_COLUMNS = "id, user_id, name, created_at, (SELECT COUNT(*) FROM area_parts ap WHERE ap.area_id = areas.id) AS parts"
+
+
+def _row_to_area(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "user_id": row["user_id"],
+        "parts": row["parts"],
+        "created_at": row["created_at"],
+        "geometry": json.loads(row["geometry"]) if row.get("geometry") else None,
+    }
+
+
+@router.post("", response_model=AreaOut, status_code=201)
+async def create_area(
+    payload: AreaCreate,
+    current_user=Depends(get_current_user),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    """Save a polygon for reuse as ``area_id`` in polygon searches; it is subdivided once, here."""
+    try:
+        area = await conn.fetchrow(
+            """
+            INSERT INTO areas (user_id, name, geom)
+            VALUES ($1, $2, ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_SetSRID(ST_GeomFromGeoJSON($3), 4326)), 3)))
+            RETURNING id, user_id, name, created_at, ST_IsEmpty(geom) AS empty;
+            """,
+            current_user["id"],
+            payload.name,
+            json.dumps(payload.geojson),
+        )
+    except asyncpg.PostgresError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid polygon: {exc}")
+    if area["empty"]:
+        raise HTTPException(status_code=400, detail="Invalid polygon: no area left after validation")
+    status = await conn.execute(
+        "INSERT INTO area_parts (area_id, geom) SELECT id, ST_Subdivide(geom, $2) FROM areas WHERE id = $1;",
+        area["id"],
+        settings.polygon_subdivide_vertices,
+    )
+    return _row_to_area({**area, "parts": int(status.split()[-1])})
+
+
+@router.get("", response_model=List[AreaOut])
+async def list_areas(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    conn: asyncpg.Connection = Depends(get_read_conn),
+):
+    params: List[Any] = []
+    cursor_clause = ""
+    if cursor:
+        after = decode_cursor(cursor, "areas", 1)
+        cursor_clause = "WHERE " + keyset_clause(params, ["id"], after, descending=True)
+    params.append(limit + 1)
+    sql = f"""
+        SELECT {AREA_COLUMNS}
+        FROM areas
+        {cursor_clause}
+        ORDER BY id DESC
+        LIMIT ${len(params)};
+    """
+    rows, next_cursor = paginate(await conn.fetch(sql, *params), limit, "areas", lambda r: [r["id"]])
+    set_next_cursor(response, next_cursor)
+    return [_row_to_area(r) for r in rows]
+
+
+@router.get("/{area_id:int}", response_model=AreaOut)
+async def get_area(area_id: int, conn: asyncpg.Connection = Depends(get_read_conn)):
+    row = await conn.fetchrow(
+        f"SELECT {AREA_COLUMNS}, ST_AsGeoJSON(geom) AS geometry FROM areas WHERE id = $1;", area_id
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Area not found")
+    return _row_to_area(row)
+
+
+@router.delete("/{area_id:int}")
+async def delete_area(
+    area_id: int,
+    current_user=Depends(get_current_user),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    owner = await conn.fetchrow("SELECT user_id FROM areas WHERE id = $1 FOR UPDATE;", area_id)
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Area not found")
+    if owner["user_id"] != current_user["id"] and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only the owner or an admin can delete an area")
+    await conn.execute("DELETE FROM areas WHERE id = $1;", area_id)
+    return {"status": "deleted", "id": area_id}
@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from app.async_db import async_pool_stats, replica_set
+from app.core.metrics import render_metrics
+from app.services.notifications import notification_hub
+from app.services.spatial_index import spatial_index
 
 router = APIRouter()
 
@@ -7,3 +12,19 @@ router = APIRouter()
 def health():
     return {"status": "ok"}
 
+
+@router.get("/health/db")
+def health_db():
+    return {
+        "status": "ok",
+        "pool": async_pool_stats(),
+        "replicas": replica_set.stats(),
+        "notifications": notification_hub.stats(),
+        "spatial_index": spatial_index.stats(),
+    }
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    payload, content_type = render_metrics()
+    return Response(payload, media_type=content_type)
@@ -1,30 +1,89 @@
-import json
-from typing import List, Any, Dict, Optional
+import asyncio
+from typing import List, Any, Dict, Literal, Optional, Tuple, Union
 
-import psycopg2.extras
-from fastapi import APIRouter, HTTPException, Query
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-from app.db import get_db_conn
+from app.async_db import acquire_read
+from app.core import consistency
+from app.core.config import get_settings
+from app.deps import get_conn, get_read_conn, require_admin
 from app.schemas import (
     PlaceCreate,
     PlaceUpdate,
     RateRequest,
+    PolygonBatchRequest,
+    PolygonBatchResult,
+    PolygonCount,
     PolygonRequest,
+    DistanceMatrixRequest,
+    DistanceMatrixResponse,
     DistanceResponse,
+    PlaceDistanceOut,
+    PlaceOut,
+    PlaceSearchOut,
     ReviewCreate,
 )
-from app.services.places import row_to_place, refresh_avg_rating
+from app.services.clusters import cluster_manager, grid_clusters
+from app.services.export import MEDIA_TYPES, stream_encoded_features, stream_features
+from app.services.places import (
+    PLACE_COLUMNS,
+    place_coordinates,
+    place_filter_clauses,
+    prefix_tsquery,
+    row_to_place,
+)
+from app.services.ingest import FORMATS, ImportFormatError, format_from_content_type, import_places
+from app.services.pagination import decode_cursor, keyset_clause, paginate, set_next_cursor
+from app.services.notifications import MAX_RADIUS_M, Subscriber, SubscriberLimit, notification_hub
+from app.services.polygons import (
+    InvalidPolygon,
+    Sources,
+    UnknownArea,
+    batch_matches,
+    count_matches,
+    page_matches,
+    polygon_sources,
+)
+from app.services.ratings import apply_rating_delta
+from app.services.response_cache import data_versions, response_cache
+from app.services.spatial_index import spatial_index
+from app.services.tags import autocomplete_tags, invalidate_tags
+from app.services.tiles import MAX_ZOOM, filters_key, render_tile, tile_cache
 
 router = APIRouter(prefix="/places", tags=["places"])
+settings = get_settings()
+
+
+def _index_page(rows: List[Dict[str, Any]], limit: int, scope: str, columns: List[str]) -> Response:
+    """Page of spatial-index results in the same shape and cursor format as the SQL path."""
+    rows, next_cursor = paginate(rows, limit, scope, lambda r: [r[c] for c in columns])
+    response = Response(spatial_index.render(rows, extra=("distance_m",)), media_type="application/json")
+    set_next_cursor(response, next_cursor)
+    return response
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    try:
+        lon1, lat1, lon2, lat2 = [float(x) for x in bbox.split(",")]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid bbox format, expected lon1,lat1,lon2,lat2")
+    return lon1, lat1, lon2, lat2
+
+
+async def _invalidate_place_tiles(conn, place_id: int) -> None:
+    coords = await place_coordinates(conn, place_id)
+    if coords:
+        await tile_cache.invalidate_point(*coords)
 
 
 @router.post("", response_model=Dict[str, Any])
-def create_place(payload: PlaceCreate):
-    sql = """
+async def create_place(payload: PlaceCreate, conn: asyncpg.Connection = Depends(get_conn)):
+    sql = f"""
         INSERT INTO places (name, category, description, address, tags, hours, geom)
-        VALUES (%s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
-        RETURNING id, name, category, description, address, tags, avg_rating, hours,
-                  ST_AsGeoJSON(geom) AS geometry, created_at;
+        VALUES ($1, $2, $3, $4, $5, $6, ST_SetSRID(ST_MakePoint($7, $8), 4326))
+        RETURNING {PLACE_COLUMNS};
     """
     params = (
         payload.name,
@@ -32,249 +91,493 @@ def create_place(payload: PlaceCreate):
         payload.description,
         payload.address,
         payload.tags or [],
-        psycopg2.extras.Json(payload.hours) if payload.hours is not None else None,
+        payload.hours,
         payload.lon,
         payload.lat,
     )
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, params)
-        row = cur.fetchone()
+    row = await conn.fetchrow(sql, *params)
+    await tile_cache.invalidate_point(payload.lon, payload.lat)
+    cluster_manager.mark_dirty()
+    data_versions.bump("places")
+    if payload.tags:
+        invalidate_tags()
+        data_versions.bump("tags")
     return row_to_place(row)
 
 
-@router.get("", response_model=List[Dict[str, Any]])
-def list_places(
+@router.post("/import")
+async def bulk_import(
+    request: Request,
+    fmt: Optional[Literal["geojson", "ndjson", "csv"]] = Query(None, alias="format"),
+    admin=Depends(require_admin),
+):
+    fmt = fmt or format_from_content_type(request.headers.get("content-type"))
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="Pass format=geojson|ndjson|csv or a matching Content-Type")
+    # Batches commit as they go (see import_places), so caches are refreshed even after a format error.
+    try:
+        report = await import_places(request.stream(), fmt, settings.import_batch_size, settings.import_max_errors)
+    except ImportFormatError as exc:
+        report = exc.report
+        error = str(exc)
+    else:
+        error = None
+    if report and (report["inserted"] or report["updated"]):
+        await tile_cache.clear()
+        cluster_manager.mark_dirty()
+        invalidate_tags()
+        data_versions.bump_all()
+    if error is not None:
+        if report and (report["inserted"] or report["updated"]):
+            error += f" ({report['inserted']} inserted and {report['updated']} updated before it were kept)"
+        raise HTTPException(status_code=400, detail=error)
+    return report
+
+
+@router.get("", response_model=List[PlaceOut])
+async def list_places(
     category: Optional[str] = None,
     tag: Optional[str] = Query(None, description="Filter by a tag"),
     min_rating: Optional[float] = Query(None, ge=0, le=5),
     limit: int = Query(50, ge=1, le=500),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    conn: asyncpg.Connection = Depends(get_read_conn),
 ):
-    clauses = []
     params: List[Any] = []
-    if category:
-        clauses.append("category = %s")
-        params.append(category)
-    if tag:
-        clauses.append("%s = ANY(tags)")
-        params.append(tag)
-    if min_rating is not None:
-        clauses.append("avg_rating >= %s")
-        params.append(min_rating)
+    clauses = place_filter_clauses(params, category, tag, min_rating)
+    if cursor:
+        clauses.append(keyset_clause(params, ["id"], decode_cursor(cursor, "places", 1), descending=True))
     where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(limit + 1)
+    # Walks the primary key backwards from the cursor, so every page costs the same.
     sql = f"""
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
+        SELECT {PLACE_COLUMNS}
         FROM places
         {where}
         ORDER BY id DESC
-        LIMIT %s OFFSET %s;
+        LIMIT ${len(params)};
     """
-    params.extend([limit, offset])
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-    return [row_to_place(r) for r in rows]
+    rows, next_cursor = paginate(await conn.fetch(sql, *params), limit, "places", lambda r: [r["id"]])
+    response = ORJSONResponse([row_to_place(r) for r in rows])
+    set_next_cursor(response, next_cursor)
+    return response
 
 
-@router.get("/nearby", response_model=List[Dict[str, Any]])
-def nearby_places(
+@router.get("/nearby", response_model=List[PlaceDistanceOut])
+async def nearby_places(
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
     limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None,
+    tag: Optional[str] = Query(None, description="Filter by a tag"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_radius_m: Optional[float] = Query(None, gt=0, le=200_000, description="Ignore places farther than this"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
 ):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry,
-               ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326)) AS distance_m,
-               created_at
-        FROM places
-        ORDER BY distance_m
-        LIMIT %s;
-    """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (lon, lat, limit))
-        rows = cur.fetchall()
-    return [row_to_place(r) | {"distance_m": float(r["distance_m"])} for r in rows]
-
-
-@router.get("/{place_id}", response_model=Dict[str, Any])
-def get_place(place_id: int):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
-        FROM places
-        WHERE id = %s;
+    after = decode_cursor(cursor, "places.nearby", 2) if cursor else None
+    if spatial_index.serving("nearby_places"):
+        rows = spatial_index.nearby(lon, lat, limit + 1, (category, tag, min_rating), max_radius_m, after)
+        return _index_page(rows, limit, "places.nearby", ["distance_m", "id"])
+    point = "ST_SetSRID(ST_MakePoint($1, $2), 4326)::geography"
+    params: List[Any] = [lon, lat]
+    clauses = place_filter_clauses(params, category, tag, min_rating)
+    if max_radius_m is not None:
+        params.append(max_radius_m)
+        clauses.append(f"ST_DWithin(geom::geography, {point}, ${len(params)}, false)")
+    cursor_clause = ""
+    if after is not None:
+        cursor_clause = "WHERE " + keyset_clause(params, ["distance_m", "id"], after, descending=False)
+        # <-> on geography is the great-circle distance on a slightly larger sphere than
+        # ST_DistanceSphere, so this prefilter never drops rows the exact check keeps.
+        clauses.append(f"geom::geography <-> {point} >= ${len(params) - 1}")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.extend([(limit + 1) * 2, limit + 1])
+    # Inner query walks idx_places_geog in KNN order (no full scan/sort); the outer one
+    # re-ranks the small candidate set by exact spherical distance with id as tiebreaker.
+    sql = f"""
+        SELECT *
+        FROM (
+            SELECT {PLACE_COLUMNS},
+                   ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint($1, $2), 4326)) AS distance_m
+            FROM places
+            {where}
+            ORDER BY geom::geography <-> {point}
+            LIMIT ${len(params) - 1}
+        ) AS candidates
+        {cursor_clause}
+        ORDER BY distance_m, id
+        LIMIT ${len(params)};
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (place_id,))
-        row = cur.fetchone()
+    async with acquire_read() as conn:
+        found = await conn.fetch(sql, *params)
+    rows, next_cursor = paginate(found, limit, "places.nearby", lambda r: [r["distance_m"], r["id"]])
+    response = ORJSONResponse([row_to_place(r) | {"distance_m": r["distance_m"]} for r in rows])
+    set_next_cursor(response, next_cursor)
+    return response
+
+
+@router.get("/{place_id:int}", response_model=Dict[str, Any])
+async def get_place(place_id: int, request: Request):
+    async def build():
+        sql = f"""
+            SELECT {PLACE_COLUMNS}
+            FROM places
+            WHERE id = $1;
+        """
+        async with acquire_read() as conn:
+            row = await conn.fetchrow(sql, place_id)
         if not row:
             raise HTTPException(status_code=404, detail="Place not found")
-    return row_to_place(row)
+        return row_to_place(row)
+
+    # Cache hits and 304s answer without taking a database connection.
+    return await response_cache.serve(request, build, scopes=[f"place:{place_id}"])
 
 
-@router.put("/{place_id}", response_model=Dict[str, Any])
-def update_place(place_id: int, payload: PlaceUpdate):
+@router.put("/{place_id:int}", response_model=Dict[str, Any])
+async def update_place(place_id: int, payload: PlaceUpdate, conn: asyncpg.Connection = Depends(get_conn)):
     updates = []
     params: List[Any] = []
     if payload.name is not None:
-        updates.append("name = %s")
         params.append(payload.name)
+        updates.append(f"name = ${len(params)}")
     if payload.category is not None:
-        updates.append("category = %s")
         params.append(payload.category)
+        updates.append(f"category = ${len(params)}")
     if payload.description is not None:
-        updates.append("description = %s")
         params.append(payload.description)
+        updates.append(f"description = ${len(params)}")
     if payload.address is not None:
-        updates.append("address = %s")
         params.append(payload.address)
+        updates.append(f"address = ${len(params)}")
     if payload.tags is not None:
-        updates.append("tags = %s")
         params.append(payload.tags)
+        updates.append(f"tags = ${len(params)}")
     if payload.hours is not None:
-        updates.append("hours = %s")
-        params.append(psycopg2.extras.Json(payload.hours))
+        params.append(payload.hours)
+        updates.append(f"hours = ${len(params)}")
     if payload.lat is not None and payload.lon is not None:
-        updates.append("geom = ST_SetSRID(ST_MakePoint(%s, %s), 4326)")
         params.extend([payload.lon, payload.lat])
+        updates.append(f"geom = ST_SetSRID(ST_MakePoint(${len(params) - 1}, ${len(params)}), 4326)")
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
+    params.append(place_id)
     sql = f"""
+        WITH old AS (
+            SELECT id AS old_id, ST_X(geom) AS old_lon, ST_Y(geom) AS old_lat
+            FROM places
+            WHERE id = ${len(params)}
+            FOR UPDATE
+        )
         UPDATE places
         SET {', '.join(updates)}
-        WHERE id = %s
-        RETURNING id, name, category, description, address, tags, avg_rating, hours,
-                  ST_AsGeoJSON(geom) AS geometry, created_at;
+        FROM old
+        WHERE places.id = old.old_id
+        RETURNING {PLACE_COLUMNS}, old_lon, old_lat;
     """
-    params.append(place_id)
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, params)
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Place not found")
+    row = await conn.fetchrow(sql, *params)
+    if not row:
+        raise HTTPException(status_code=404, detail="Place not found")
+    await tile_cache.invalidate_point(row["old_lon"], row["old_lat"])
+    data_versions.bump("places", f"place:{place_id}")
+    if payload.tags is not None or payload.category is not None:
+        invalidate_tags()
+        data_versions.bump("tags")
+    if payload.lat is not None and payload.lon is not None:
+        await tile_cache.invalidate_point(payload.lon, payload.lat)
+        cluster_manager.mark_dirty()
     return row_to_place(row)
 
 
-@router.delete("/{place_id}")
-def delete_place(place_id: int):
-    with get_db_conn() as conn, conn.cursor() as cur:
-        cur.execute("DELETE FROM places WHERE id = %s RETURNING id;", (place_id,))
-        deleted = cur.fetchone()
-        if not deleted:
-            raise HTTPException(status_code=404, detail="Place not found")
+@router.delete("/{place_id:int}")
+async def delete_place(place_id: int, conn: asyncpg.Connection = Depends(get_conn)):
+    deleted = await conn.fetchrow(
+        "DELETE FROM places WHERE id = $1 RETURNING id, ST_X(geom) AS lon, ST_Y(geom) AS lat;", place_id
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Place not found")
+    await tile_cache.invalidate_point(deleted["lon"], deleted["lat"])
+    cluster_manager.mark_dirty()
+    invalidate_tags()
+    data_versions.bump("places", f"place:{place_id}", "tags")
     return {"status": "deleted", "id": place_id}
 
 
-@router.get("/within", response_model=List[Dict[str, Any]])
-def places_within_radius(
+# order_by -> (sort key columns of the inner query, descending); the key doubles as the cursor.
+WITHIN_ORDERS = {
+    "distance": (["distance_m", "id"], False),
+    "newest": (["created_at", "id"], True),
+    "rating": (["rating_key", "id"], True),
+    "id": (["id"], False),
+}
+
+
+@router.get("/within", response_model=List[PlaceDistanceOut])
+async def places_within_radius(
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
     radius_m: float = Query(1000, gt=0, le=50_000),
+    order_by: Literal["distance", "newest", "rating", "id"] = "distance",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
 ):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
-        FROM places
-        WHERE ST_DWithin(
-            geom::geography,
-            ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography,
-            %s
-        );
+    columns, descending = WITHIN_ORDERS[order_by]
+    scope = f"places.within.{order_by}"
+    after = decode_cursor(cursor, scope, len(columns)) if cursor else None
+    if spatial_index.serving("places_within_radius"):
+        rows = spatial_index.within(lon, lat, radius_m, columns, descending, after, limit + 1)
+        return _index_page(rows, limit, scope, columns)
+    params: List[Any] = [lon, lat, radius_m]
+    cursor_clause = ""
+    if after is not None:
+        cursor_clause = "WHERE " + keyset_clause(params, columns, after, descending)
+    params.append(limit + 1)
+    direction = " DESC" if descending else ""
+    # geom::geography matches the idx_places_geog expression, so ST_DWithin is an index scan;
+    # the radius bounds the set the outer query filters by cursor and top-N sorts.
+    # rating_key puts unrated places last (ratings are >= 0).
+    sql = f"""
+        SELECT *
+        FROM (
+            SELECT {PLACE_COLUMNS},
+                   ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint($1, $2), 4326)) AS distance_m,
+                   COALESCE(avg_rating, -1)::float8 AS rating_key
+            FROM places
+            WHERE ST_DWithin(
+                geom::geography,
+                ST_SetSRID(ST_MakePoint($1, $2), 4326)::geography,
+                $3
+            )
+        ) AS found
+        {cursor_clause}
+        ORDER BY {', '.join(c + direction for c in columns)}
+        LIMIT ${len(params)};
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (lon, lat, radius_m))
-        rows = cur.fetchall()
-    return [row_to_place(r) for r in rows]
+    async with acquire_read() as conn:
+        found = await conn.fetch(sql, *params)
+    rows, next_cursor = paginate(found, limit, scope, lambda r: [r[c] for c in columns])
+    response = ORJSONResponse([row_to_place(r) | {"distance_m": r["distance_m"]} for r in rows])
+    set_next_cursor(response, next_cursor)
+    return response
 
 
-@router.post("/within-polygon", response_model=List[Dict[str, Any]])
-def places_within_polygon(payload: PolygonRequest):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
-        FROM places
-        WHERE ST_Within(
-            geom,
-            ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)
-        );
-    """
-    geojson_str = json.dumps(payload.geojson)
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (geojson_str,))
-        rows = cur.fetchall()
-    return [row_to_place(r) for r in rows]
+async def _polygon_sources(conn, polygons: List[PolygonRequest]) -> Sources:
+    try:
+        return await polygon_sources(conn, polygons)
+    except InvalidPolygon as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid polygon: {exc}")
+    except UnknownArea as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+
+@router.post("/within-polygon", response_model=Union[List[PlaceOut], PolygonCount])
+async def places_within_polygon(
+    payload: PolygonRequest,
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    count_only: bool = Query(False, description="Return {count} instead of the places"),
+    conn: asyncpg.Connection = Depends(get_read_conn),
+):
+    """Places inside a polygon (boundary included), by id; large polygons are subdivided first."""
+    sources = await _polygon_sources(conn, [payload])
+    if count_only:
+        counts = await count_matches(conn, sources, 1)
+        return ORJSONResponse({"count": counts[0]})
+    after_id = decode_cursor(cursor, "places.polygon", 1)[0] if cursor else 0
+    rows, next_cursor = paginate(
+        await page_matches(conn, sources, after_id, limit + 1), limit, "places.polygon", lambda r: [r["id"]]
+    )
+    response = ORJSONResponse([row_to_place(r) for r in rows])
+    set_next_cursor(response, next_cursor)
+    return response
 
 
-@router.post("/{place_id}/rate")
-def rate_place(place_id: int, payload: RateRequest):
+@router.post("/within-polygons", response_model=List[PolygonBatchResult])
+async def places_within_polygons(
+    payload: PolygonBatchRequest,
+    limit: int = Query(100, ge=0, le=1000, description="Places returned per polygon; 0 for counts only"),
+    conn: asyncpg.Connection = Depends(get_read_conn),
+):
+    """Matches for several polygons in one query: total count and the first ``limit`` places of each."""
+    if len(payload.polygons) > settings.polygon_batch_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.polygon_batch_max} polygons per request")
+    sources = await _polygon_sources(conn, payload.polygons)
+    if limit == 0:
+        counts = await count_matches(conn, sources, len(payload.polygons))
+        return ORJSONResponse([{"index": i, "count": c, "places": []} for i, c in enumerate(counts)])
+    matches = await batch_matches(conn, sources, limit)
+    results = []
+    for index in range(len(payload.polygons)):
+        total, rows = matches.get(index, (0, []))
+        results.append({"index": index, "count": total, "places": [row_to_place(r) for r in rows]})
+    return ORJSONResponse(results)
+
+
+@router.post("/{place_id:int}/rate")
+async def rate_place(place_id: int, payload: RateRequest, conn: asyncpg.Connection = Depends(get_conn)):
     # backward compatible: store in reviews
-    upsert_sql = """
+    insert_sql = """
         INSERT INTO reviews (place_id, user_id, rating, text)
-        VALUES (%s, %s, %s, %s)
-        RETURNING place_id;
+        VALUES ($1, $2, $3, $4)
+        RETURNING rating;
     """
     try:
-        with get_db_conn() as conn, conn.cursor() as cur:
-            cur.execute(upsert_sql, (place_id, None, payload.rating, payload.comment))
-            if cur.fetchone() is None:
-                raise HTTPException(status_code=404, detail="Place not found")
-            avg_rating = refresh_avg_rating(conn, place_id)
-            conn.commit()
-    except psycopg2.errors.ForeignKeyViolation:
+        rating = await conn.fetchval(insert_sql, place_id, None, payload.rating, payload.comment)
+    except asyncpg.ForeignKeyViolationError:
         raise HTTPException(status_code=404, detail="Place not found")
+    avg_rating = await apply_rating_delta(conn, place_id, rating, 1)
+    await _invalidate_place_tiles(conn, place_id)
+    data_versions.bump("places", f"place:{place_id}")
     return {"place_id": place_id, "avg_rating": avg_rating}
 
 
-@router.post("/{place_id}/reviews")
-def create_review(place_id: int, payload: ReviewCreate):
+@router.post("/{place_id:int}/reviews")
+async def create_review(place_id: int, payload: ReviewCreate, conn: asyncpg.Connection = Depends(get_conn)):
     insert_sql = """
         INSERT INTO reviews (place_id, user_id, rating, text)
-        VALUES (%s, %s, %s, %s)
-        RETURNING id;
+        VALUES ($1, $2, $3, $4)
+        RETURNING id, rating;
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(insert_sql, (place_id, None, payload.rating, payload.text))
-        if cur.fetchone() is None:
-            raise HTTPException(status_code=404, detail="Place not found")
-        avg_rating = refresh_avg_rating(conn, place_id)
-        conn.commit()
-    return {"place_id": place_id, "avg_rating": avg_rating}
+    try:
+        row = await conn.fetchrow(insert_sql, place_id, None, payload.rating, payload.text)
+    except asyncpg.ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Place not found")
+    avg_rating = await apply_rating_delta(conn, place_id, row["rating"], 1)
+    await _invalidate_place_tiles(conn, place_id)
+    data_versions.bump("places", f"place:{place_id}")
+    return {"place_id": place_id, "review_id": row["id"], "avg_rating": avg_rating}
 
 
-@router.get("/{place_id}/distance", response_model=DistanceResponse)
-def place_distance(
+@router.put("/{place_id:int}/reviews/{review_id:int}")
+async def update_review(
+    place_id: int, review_id: int, payload: ReviewCreate, conn: asyncpg.Connection = Depends(get_conn)
+):
+    update_sql = """
+        WITH old AS (
+            SELECT id, rating FROM reviews WHERE id = $1 AND place_id = $2 FOR UPDATE
+        )
+        UPDATE reviews r
+        SET rating = $3, text = $4
+        FROM old
+        WHERE r.id = old.id
+        RETURNING old.rating AS old_rating, r.rating AS new_rating;
+    """
+    row = await conn.fetchrow(update_sql, review_id, place_id, payload.rating, payload.text)
+    if not row:
+        raise HTTPException(status_code=404, detail="Review not found")
+    avg_rating = await apply_rating_delta(conn, place_id, row["new_rating"] - row["old_rating"], 0)
+    await _invalidate_place_tiles(conn, place_id)
+    data_versions.bump("places", f"place:{place_id}")
+    return {"place_id": place_id, "review_id": review_id, "avg_rating": avg_rating}
+
+
+@router.delete("/{place_id:int}/reviews/{review_id:int}")
+async def delete_review(place_id: int, review_id: int, conn: asyncpg.Connection = Depends(get_conn)):
+    rating = await conn.fetchval(
+        "DELETE FROM reviews WHERE id = $1 AND place_id = $2 RETURNING rating;", review_id, place_id
+    )
+    if rating is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    avg_rating = await apply_rating_delta(conn, place_id, -rating, -1)
+    await _invalidate_place_tiles(conn, place_id)
+    data_versions.bump("places", f"place:{place_id}")
+    return {"place_id": place_id, "review_id": review_id, "avg_rating": avg_rating}
+
+
+@router.get("/{place_id:int}/distance", response_model=DistanceResponse)
+async def place_distance(
     place_id: int,
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
 ):
+    if spatial_index.serving("place_distance"):
+        distance = spatial_index.distance(place_id, lon, lat)
+        if distance is None:
+            raise HTTPException(status_code=404, detail="Place not found")
+        return DistanceResponse(id=place_id, distance_m=distance)
     sql = """
         SELECT
             id,
-            ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326)) AS distance_m
+            ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint($1, $2), 4326)) AS distance_m
         FROM places
-        WHERE id = %s;
+        WHERE id = $3;
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (lon, lat, place_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Place not found")
+    async with acquire_read() as conn:
+        row = await conn.fetchrow(sql, lon, lat, place_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Place not found")
     return DistanceResponse(id=row["id"], distance_m=float(row["distance_m"]))
 
 
+@router.post("/distance-matrix", response_model=DistanceMatrixResponse)
+async def distance_matrix(payload: DistanceMatrixRequest, conn: asyncpg.Connection = Depends(get_read_conn)):
+    if len(payload.origins) > settings.distance_matrix_max_origins:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.distance_matrix_max_origins} origins per request"
+        )
+    # Bound the matrix before touching the database: places x origins <= max cells.
+    max_places = min(settings.distance_matrix_max_places, settings.distance_matrix_max_cells // len(payload.origins))
+    params: List[Any] = [[o[0] for o in payload.origins], [o[1] for o in payload.origins]]
+    if payload.place_ids is not None:
+        if len(payload.place_ids) > max_places:
+            raise HTTPException(
+                status_code=400, detail=f"At most {max_places} place ids for {len(payload.origins)} origins"
+            )
+        params.append(payload.place_ids)
+        clauses = [f"id = ANY(${len(params)}::int[])"]
+    else:
+        clauses = place_filter_clauses(params, payload.category, payload.tag, payload.min_rating)
+        if payload.bbox:
+            params.extend(payload.bbox)
+            n = len(params)
+            clauses.append(f"geom && ST_MakeEnvelope(${n - 3}, ${n - 2}, ${n - 1}, ${n}, 4326)")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(max_places + 1)
+    # One set-based pass: every selected place against all origins, aggregated to one
+    # row per place so the result is (places x origins) values in (places) rows.
+    sql = f"""
+        WITH o AS (
+            SELECT * FROM UNNEST($1::float8[], $2::float8[]) WITH ORDINALITY AS o(lon, lat, ord)
+        ),
+        p AS (
+            SELECT id, geom FROM places {where} ORDER BY id LIMIT ${len(params)}
+        )
+        SELECT p.id,
+               array_agg(
+                   round(ST_DistanceSphere(p.geom, ST_SetSRID(ST_MakePoint(o.lon, o.lat), 4326))::numeric, 1)::float8
+                   ORDER BY o.ord
+               ) AS distances
+        FROM p CROSS JOIN o
+        GROUP BY p.id
+        ORDER BY p.id;
+    """
+    rows = await conn.fetch(sql, *params)
+    if len(rows) > max_places:
+        raise HTTPException(status_code=400, detail=f"Filter matches more than {max_places} places, narrow it")
+    place_ids = [r["id"] for r in rows]
+    found = set(place_ids)
+    return DistanceMatrixResponse(
+        origins=payload.origins,
+        place_ids=place_ids,
+        distances_m=[r["distances"] for r in rows],
+        missing=sorted({i for i in payload.place_ids or [] if i not in found}),
+    )
+
+
 @router.get("/stats/by-category")
-def stats_by_category():
+async def stats_by_category(request: Request):
+    return await response_cache.serve(request, _category_stats, scopes=["places"])
+
+
+async def _category_stats() -> List[Dict[str, Any]]:
     sql = """
         SELECT category, COUNT(*) AS count, AVG(avg_rating) AS avg_rating
         FROM places
         GROUP BY category
         ORDER BY count DESC;
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql)
-        rows = cur.fetchall()
+    async with acquire_read() as conn:
+        rows = await conn.fetch(sql)
     return [
         {
             "category": r["category"],
@@ -286,130 +589,261 @@ def stats_by_category():
 
 
 @router.get("/tags", response_model=List[str])
-def list_tags(search: Optional[str] = Query(None, min_length=1, description="ILIKE filter for tags")):
-    base_sql = """
-        SELECT DISTINCT tag
-        FROM places
-        CROSS JOIN UNNEST(tags) AS tag
-    """
-    params: List[Any] = []
-    if search:
-        base_sql += " WHERE tag ILIKE %s"
-        params.append(f"%{search}%")
-    base_sql += " ORDER BY tag ASC LIMIT 200;"
-    with get_db_conn() as conn, conn.cursor() as cur:
-        cur.execute(base_sql, params)
-        rows = cur.fetchall()
-    return [r[0] for r in rows]
-
-
-@router.get("/search", response_model=List[Dict[str, Any]])
-def text_search(q: str = Query(..., min_length=2), limit: int = Query(20, ge=1, le=200)):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
-        FROM places
-        WHERE name ILIKE %s OR address ILIKE %s OR description ILIKE %s
-        ORDER BY id DESC
-        LIMIT %s;
+async def list_tags(
+    request: Request,
+    search: Optional[str] = Query(None, min_length=1, description="Substring filter; prefix matches first"),
+    category: Optional[str] = Query(None, description="Only tags used in this category"),
+    limit: int = Query(200, ge=1, le=500),
+):
+    async def build():
+        async with acquire_read() as conn:
+            return await autocomplete_tags(conn, search, category, limit)
+
+    return await response_cache.serve(request, build, scopes=["tags"])
+
+
+@router.get("/search", response_model=List[PlaceSearchOut])
+async def text_search(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=200),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Boost results near this point"),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    conn: asyncpg.Connection = Depends(get_read_conn),
+):
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    params: List[Any] = [q, prefix_tsquery(q)]
+    # Stemmed (russian) and exact (simple) matches plus word-prefix matches, all served by idx_places_search.
+    tsq = (
+        "(websearch_to_tsquery('russian', $1) || websearch_to_tsquery('simple', $1)"
+        " || COALESCE(to_tsquery('simple', $2), ''::tsquery))"
+    )
+    score = f"(ts_rank(search_vector, {tsq}) + similarity(name, $1))::float8"
+    if lat is not None:
+        params.extend([lon, lat, settings.search_geo_bias_m])
+        score += (
+            f" / (1 + ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(${len(params) - 2}, ${len(params) - 1}), 4326))"
+            f" / ${len(params)})"
+        )
+    cursor_clause = ""
+    if cursor:
+        after = decode_cursor(cursor, "places.search", 2)
+        cursor_clause = "WHERE " + keyset_clause(params, ["score", "id"], after, descending=True)
+    params.append(limit + 1)
+    # name/address % $1 are trigram matches (typos) served by the gin_trgm_ops indexes.
+    sql = f"""
+        SELECT *
+        FROM (
+            SELECT {PLACE_COLUMNS},
+                   {score} AS score
+            FROM places
+            WHERE search_vector @@ {tsq} OR name % $1 OR address % $1
+        ) AS ranked
+        {cursor_clause}
+        ORDER BY score DESC, id DESC
+        LIMIT ${len(params)};
     """
-    pattern = f"%{q}%"
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (pattern, pattern, pattern, limit))
-        rows = cur.fetchall()
-    return [row_to_place(r) for r in rows]
+    rows, next_cursor = paginate(
+        await conn.fetch(sql, *params), limit, "places.search", lambda r: [r["score"], r["id"]]
+    )
+    response = ORJSONResponse([row_to_place(r) | {"score": r["score"]} for r in rows])
+    set_next_cursor(response, next_cursor)
+    return response
 
 
-@router.get("/notifications")
-def recent_notifications(
+@router.get("/notifications", response_model=List[PlaceOut])
+async def recent_notifications(
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
     radius_m: float = Query(1000, gt=0, le=50_000),
+    limit: int = Query(100, ge=1, le=500),
+    conn: asyncpg.Connection = Depends(get_read_conn),
 ):
-    sql = """
-        SELECT id, name, category, description, address, tags, avg_rating, hours,
-               ST_AsGeoJSON(geom) AS geometry, created_at
+    # Served by idx_places_recent_geog: (geom::geography, created_at) over moderated rows only.
+    sql = f"""
+        SELECT {PLACE_COLUMNS}
         FROM places
         WHERE is_moderated = TRUE
           AND created_at > NOW() - INTERVAL '7 days'
           AND ST_DWithin(
             geom::geography,
-            ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography,
-            %s
+            ST_SetSRID(ST_MakePoint($1, $2), 4326)::geography,
+            $3
           )
         ORDER BY created_at DESC
-        LIMIT 100;
+        LIMIT $4;
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (lon, lat, radius_m))
-        rows = cur.fetchall()
-    return [row_to_place(r) for r in rows]
+    rows = await conn.fetch(sql, lon, lat, radius_m, limit)
+    return ORJSONResponse([row_to_place(r) for r in rows])
 
 
-@router.get("/export/geojson")
-def export_geojson(bbox: str = Query(..., description="lon1,lat1,lon2,lat2")):
+def _subscribe(lon: float, lat: float, radius_m: float) -> Subscriber:
+    if not notification_hub.running:
+        raise HTTPException(status_code=503, detail="Notifications are disabled")
     try:
-        lon1, lat1, lon2, lat2 = [float(x) for x in bbox.split(",")]
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid bbox format, expected lon1,lat1,lon2,lat2")
-    sql = """
-        SELECT json_build_object(
-            'type', 'FeatureCollection',
-            'features', json_agg(
-                json_build_object(
-                    'type', 'Feature',
-                    'geometry', ST_AsGeoJSON(geom)::json,
-                    'properties', json_build_object(
-                        'id', id,
-                        'name', name,
-                        'category', category,
-                        'address', address,
-                        'tags', tags,
-                        'avg_rating', avg_rating,
-                        'created_at', created_at
-                    )
-                )
-            )
-        )
-        FROM (
-            SELECT * FROM places
-            WHERE ST_Intersects(
-                geom,
-                ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-            )
-        ) AS sub;
+        return notification_hub.subscribe(lon, lat, radius_m)
+    except SubscriberLimit as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"})
+
+
+@router.get("/notifications/stream")
+async def notifications_stream(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000, gt=0, le=MAX_RADIUS_M),
+):
+    """Server-Sent Events: ``created``/``moderated`` with the place, for places appearing within the radius.
+
+    Pushed from Postgres NOTIFY, so nothing is queried while nothing changes.
+    Use GET /notifications once for the backlog, then keep this stream open.
+    """
+    sub = _subscribe(lon, lat, radius_m)
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=settings.notify_keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield event.sse
+        finally:
+            notification_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/notifications/ws")
+async def notifications_ws(
+    websocket: WebSocket,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000, gt=0, le=MAX_RADIUS_M),
+):
+    """Same events as /notifications/stream as JSON text frames.
+
+    The client may move its geofence by sending ``{"lat": .., "lon": .., "radius_m": ..}``.
     """
-    with get_db_conn() as conn, conn.cursor() as cur:
-        cur.execute(sql, (lon1, lat1, lon2, lat2))
-        row = cur.fetchone()
-        return row[0] or {"type": "FeatureCollection", "features": []}
+    try:
+        sub = _subscribe(lon, lat, radius_m)
+    except HTTPException as exc:
+        await websocket.close(code=1013, reason=exc.detail)
+        return
+    await websocket.accept()
+
+    async def pump() -> None:
+        while True:
+            event = await sub.queue.get()
+            await websocket.send_text(event.text)
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                new_lat, new_lon = float(message["lat"]), float(message["lon"])
+                new_radius = float(message.get("radius_m", sub.radius_m))
+                if not (-90 <= new_lat <= 90 and -180 <= new_lon <= 180 and 0 < new_radius <= MAX_RADIUS_M):
+                    raise ValueError("lat/lon/radius_m out of range")
+            except (KeyError, TypeError, ValueError, AttributeError) as exc:
+                await websocket.send_json({"error": f"Invalid geofence: {exc}"})
+                continue
+            notification_hub.index.move(sub, new_lon, new_lat, new_radius)
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        notification_hub.unsubscribe(sub)
+
+
+@router.get("/export/geojson")
+async def export_geojson(
+    request: Request,
+    bbox: str = Query(..., description="lon1,lat1,lon2,lat2"),
+    category: Optional[str] = None,
+    tag: Optional[str] = Query(None, description="Filter by a tag"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    fmt: Literal["geojson", "ndjson"] = Query(
+        "geojson", alias="format", description="FeatureCollection or one Feature per line"
+    ),
+):
+    # Conditional GET only: exports are too large to keep, but an unchanged one needn't be resent.
+    check = response_cache.validators(request, scopes=["places"])
+    if check.fresh:
+        return check.not_modified()
+    lon1, lat1, lon2, lat2 = _parse_bbox(bbox)
+    if spatial_index.serving("export_geojson"):
+        features = spatial_index.bbox_features(lon1, lat1, lon2, lat2, (category, tag, min_rating))
+        return StreamingResponse(
+            stream_encoded_features(features, fmt, settings.export_batch_size),
+            media_type=MEDIA_TYPES[fmt],
+            headers=check.headers,
+        )
+    params: List[Any] = [lon1, lat1, lon2, lat2]
+    clauses = ["geom && ST_MakeEnvelope($1, $2, $3, $4, 4326)"]
+    clauses += place_filter_clauses(params, category, tag, min_rating)
+    # The stream opens its own connection: request-scoped ones are released before the body is sent.
+    return StreamingResponse(
+        stream_features(f"WHERE {' AND '.join(clauses)}", params, fmt, settings.export_batch_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers=check.headers,
+    )
 
 
 @router.get("/clustered")
-def clustered(zoom: int = Query(12, ge=1, le=20)):
-    # heuristic k by zoom
-    k = max(1, min(30, int(zoom * 1.5)))
-    sql = f"""
-        WITH clusters AS (
-            SELECT ST_ClusterKMeans(geom, %s) OVER () AS cid, id, name, category,
-                   address, tags, avg_rating, hours, created_at, geom
-            FROM places
+async def clustered(
+    request: Request,
+    zoom: int = Query(12, ge=0, le=20),
+    bbox: Optional[str] = Query(None, description="lon1,lat1,lon2,lat2; whole world when omitted"),
+):
+    envelope = _parse_bbox(bbox) if bbox else (-180.0, -85.0, 180.0, 85.0)
+    index = cluster_manager.index
+    if index.ready:
+        # Results change only when a rebuilt index is swapped in, not on every write.
+        return await response_cache.serve(
+            request,
+            lambda: _query_index(index, zoom, envelope),
+            version=f"clusters@{index.built_at}",
+            last_modified=index.built_at,
         )
-        SELECT cid,
-               ST_AsGeoJSON(ST_Centroid(ST_Collect(geom))) AS geometry,
-               COUNT(*) AS count
-        FROM clusters
-        GROUP BY cid;
-    """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (k,))
-        rows = cur.fetchall()
-    return [
-        {
-            "cluster_id": int(r["cid"]),
-            "count": int(r["count"]),
-            "geometry": json.loads(r["geometry"]),
-        }
-        for r in rows
-    ]
+    # Index still building (e.g. right after startup): cluster the viewport in SQL.
+    async with acquire_read() as conn:
+        return await grid_clusters(conn, zoom, envelope)
+
+
+async def _query_index(index, zoom: int, envelope: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+    return index.query(zoom, envelope)
 
+
+@router.get("/tiles/{z:int}/{x:int}/{y:int}.mvt")
+async def place_tile(
+    z: int,
+    x: int,
+    y: int,
+    category: Optional[str] = None,
+    tag: Optional[str] = Query(None, description="Filter by a tag"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+):
+    if z > MAX_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    filters = {"category": category, "tag": tag, "min_rating": min_rating}
+    fkey = filters_key(filters)
+    data = await tile_cache.get(z, x, y, fkey)
+    if data is None:
+        # Cached tiles are shared, so a replica must have replayed this process's writes.
+        with consistency.at_least(consistency.latest_write_lsn()):
+            async with acquire_read() as conn:
+                data = await render_tile(conn, z, x, y, filters)
+        await tile_cache.set(z, x, y, fkey, data)
+    return Response(
+        content=data,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": "public, max-age=60"},
+    )
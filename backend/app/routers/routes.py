@@ -1,53 +1,122 @@
 import json
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Literal, Optional
 
-import psycopg2.extras
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 
-from app.db import get_db_conn
-from app.deps import get_current_user
+from app.core.config import get_settings
+from app.deps import get_conn, get_current_user, get_read_conn
 from app.schemas import RouteCreate
+from app.services.pagination import decode_cursor, keyset_clause, paginate, set_next_cursor
+from app.services.places import row_to_place
+from app.services.routes import corridor_sql, route_geometry_sql
 
 router = APIRouter(prefix="/routes", tags=["routes"])
+settings = get_settings()
 
 
 def _row_to_route(row) -> Dict[str, Any]:
-    return {
+    route = {
         "id": row["id"],
         "name": row["name"],
         "user_id": row["user_id"],
         "geometry": json.loads(row["geometry"]) if row.get("geometry") else None,
         "created_at": row.get("created_at"),
     }
+    if "polyline" in row.keys():
+        route["polyline"] = row["polyline"]
+    return route
 
 
 @router.post("", response_model=Dict[str, Any])
-def create_route(payload: RouteCreate, current_user=Depends(get_current_user)):
+async def create_route(
+    payload: RouteCreate,
+    current_user=Depends(get_current_user),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
     if not payload.points or len(payload.points) < 2:
         raise HTTPException(status_code=400, detail="Route requires at least 2 points")
     line_geojson = json.dumps({"type": "LineString", "coordinates": payload.points})
     sql = """
         INSERT INTO routes (user_id, name, geom)
-        VALUES (%s, %s, ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326))
+        VALUES ($1, $2, ST_SetSRID(ST_GeomFromGeoJSON($3), 4326))
         RETURNING id, user_id, name, ST_AsGeoJSON(geom) AS geometry, created_at;
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (current_user["id"], payload.name, line_geojson))
-        row = cur.fetchone()
+    row = await conn.fetchrow(sql, current_user["id"], payload.name, line_geojson)
     return _row_to_route(row)
 
 
 @router.get("", response_model=List[Dict[str, Any]])
-def list_routes(limit: int = Query(50, ge=1, le=200), offset: int = Query(0, ge=0), current_user=Depends(get_current_user)):
-    sql = """
-        SELECT id, user_id, name, ST_AsGeoJSON(geom) AS geometry, created_at
+async def list_routes(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Simplify geometry to one pixel at this zoom"),
+    geometry_format: Literal["geojson", "polyline"] = Query(
+        "geojson", alias="format", description="polyline: encoded polyline, precision 5"
+    ),
+    current_user=Depends(get_current_user),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    """The user's routes, newest first.
+
+    ``zoom`` drops vertices closer than a pixel at that zoom (long GPS traces
+    shrink by orders of magnitude); ``format=polyline`` replaces ``geometry``
+    with an encoded polyline string (``[lat, lon]`` order, 1e-5 degrees).
+    """
+    params: List[Any] = [current_user["id"]]
+    geometry = route_geometry_sql(params, zoom, geometry_format)
+    cursor_clause = ""
+    if cursor:
+        after = decode_cursor(cursor, "routes", 2)
+        cursor_clause = "AND " + keyset_clause(params, ["created_at", "id"], after, descending=True)
+    params.append(limit + 1)
+    # Served by idx_routes_user_created: (user_id, created_at DESC, id DESC).
+    sql = f"""
+        SELECT id, user_id, name, {geometry}, created_at
         FROM routes
-        WHERE user_id = %s
-        ORDER BY created_at DESC
-        LIMIT %s OFFSET %s;
+        WHERE user_id = $1 {cursor_clause}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ${len(params)};
     """
-    with get_db_conn() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (current_user["id"], limit, offset))
-        rows = cur.fetchall()
+    rows, next_cursor = paginate(
+        await conn.fetch(sql, *params), limit, "routes", lambda r: [r["created_at"], r["id"]]
+    )
+    set_next_cursor(response, next_cursor)
     return [_row_to_route(r) for r in rows]
 
+
+@router.get("/{route_id:int}/places")
+async def route_places(
+    route_id: int,
+    distance_m: float = Query(300, gt=0, description="Corridor half-width, metres"),
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    current_user=Depends(get_current_user),
+    conn: asyncpg.Connection = Depends(get_read_conn),
+):
+    """Places within ``distance_m`` of the route, in the order they are passed.
+
+    Each place carries ``along_m`` (distance from the route start to its
+    projection on the route) and ``distance_m`` (distance from the route).
+    """
+    if distance_m > settings.route_corridor_max_m:
+        raise HTTPException(status_code=400, detail=f"distance_m must be <= {settings.route_corridor_max_m:g}")
+    owner = await conn.fetchval("SELECT user_id FROM routes WHERE id = $1;", route_id)
+    if owner is None or (owner != current_user["id"] and current_user.get("role") != "admin"):
+        raise HTTPException(status_code=404, detail="Route not found")
+    after = decode_cursor(cursor, "routes.places", 2) if cursor else None
+    params: List[Any] = [route_id, distance_m, settings.route_corridor_piece_m]
+    sql = corridor_sql(params, limit + 1, category, tag, min_rating, after)
+    rows, next_cursor = paginate(
+        await conn.fetch(sql, *params), limit, "routes.places", lambda r: [r["along_m"], r["id"]]
+    )
+    response = ORJSONResponse(
+        [row_to_place(r) | {"along_m": r["along_m"], "distance_m": r["distance_m"]} for r in rows]
+    )
+    set_next_cursor(response, next_cursor)
+    return response
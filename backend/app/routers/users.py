@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException
 
-from app.deps import get_current_user
-from app.schemas import UserOut
+from app.deps import get_conn, get_current_user, require_admin
+from app.schemas import RoleUpdate, UserOut
+from app.services.users import delete_user, update_user_role
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/me", response_model=UserOut)
-def read_me(current_user=Depends(get_current_user)):
+async def read_me(current_user=Depends(get_current_user)):
     return {
         "id": current_user["id"],
         "username": current_user["username"],
@@ -15,3 +17,26 @@ def read_me(current_user=Depends(get_current_user)):
         "created_at": current_user.get("created_at"),
     }
 
+
+@router.put("/{user_id:int}/role", response_model=UserOut)
+async def set_role(
+    user_id: int,
+    payload: RoleUpdate,
+    admin=Depends(require_admin),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    user = await update_user_role(conn, user_id, payload.role)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+@router.delete("/{user_id:int}")
+async def remove_user(
+    user_id: int,
+    admin=Depends(require_admin),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
+    if not await delete_user(conn, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"status": "deleted", "id": user_id}
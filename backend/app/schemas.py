@@ -18,6 +18,30 @@ class PlaceCreate(PlaceBase):
     lon: float = Field(..., ge=-180, le=180)
 
 
+class PointGeometry(BaseModel):
+    type: str = "Point"
+    coordinates: List[float] = Field(..., description="[lon, lat]")
+
+
+class PlaceOut(PlaceBase):
+    id: int
+    avg_rating: Optional[float] = None
+    geometry: PointGeometry
+    created_at: Optional[datetime] = None
+
+
+class PlaceDistanceOut(PlaceOut):
+    distance_m: float
+
+
+class PlaceSearchOut(PlaceOut):
+    score: float
+
+
+class PlaceImport(PlaceCreate):
+    external_id: Optional[str] = Field(None, min_length=1, max_length=255, description="Upsert key from the source")
+
+
 class PlaceUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     category: Optional[str] = Field(None, min_length=1, max_length=120)
@@ -46,96 +70,84 @@ class RateRequest(BaseModel):
     comment: Optional[str] = Field(None, max_length=2000)
 
 
-class PolygonRequest(BaseModel):
-    geojson: Dict[str, Any] = Field(..., description="Polygon or MultiPolygon GeoJSON")
+POLYGON_TYPES = ("Polygon", "MultiPolygon")
 
 
-class DistanceResponse(BaseModel):
-    id: int
-    distance_m: float
+def _check_polygon(v: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if v is not None and v.get("type") not in POLYGON_TYPES:
+        raise ValueError("Expected a Polygon or MultiPolygon geometry")
+    return v
 
 
-class Token(BaseModel):
-    access_token: str
-    token_type: str = "bearer"
+class PolygonRequest(BaseModel):
+    geojson: Optional[Dict[str, Any]] = Field(None, description="Polygon or MultiPolygon GeoJSON")
+    area_id: Optional[int] = Field(None, description="Saved area (POST /areas) to use instead of geojson")
 
+    _polygon = validator("geojson", allow_reuse=True)(_check_polygon)
 
-class UserCreate(BaseModel):
-    username: str = Field(..., min_length=3, max_length=50)
-    password: str = Field(..., min_length=6, max_length=128)
-    role: Optional[str] = Field(None, description="Optional role (admin/user) when allowed")
-
+    @validator("area_id", always=True)
+    def one_source(cls, v, values):
+        if (v is None) == (values.get("geojson") is None):
+            raise ValueError("Provide exactly one of geojson or area_id")
+        return v
 
-class UserOut(BaseModel):
-    id: int
-    username: str
-    created_at: Optional[datetime]
-    role: Optional[str]
 
+class PolygonBatchRequest(BaseModel):
+    polygons: List[PolygonRequest] = Field(..., min_length=1)
 
-class ReviewCreate(BaseModel):
-    rating: float = Field(..., ge=0, le=5)
-    text: Optional[str] = Field(None, max_length=4000)
 
+class PolygonCount(BaseModel):
+    count: int
 
-class RouteCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=255)
-    points: List[List[float]] = Field(..., description="Array of [lon, lat]")
-from datetime import datetime
-from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field, validator
+class PolygonBatchResult(BaseModel):
+    index: int = Field(..., description="Position of the polygon in the request")
+    count: int = Field(..., description="All places inside, not just the returned ones")
+    places: List[PlaceOut] = Field(default_factory=list)
 
 
-class PlaceBase(BaseModel):
+class AreaCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
-    category: str = Field(..., min_length=1, max_length=120)
-    description: Optional[str] = Field(None, max_length=2000)
-    address: Optional[str] = Field(None, max_length=255)
-    tags: List[str] = Field(default_factory=list)
-    hours: Optional[Dict[str, Any]] = Field(None, description="Arbitrary JSON with working hours info")
-
-
-class PlaceCreate(PlaceBase):
-    lat: float = Field(..., ge=-90, le=90)
-    lon: float = Field(..., ge=-180, le=180)
+    geojson: Dict[str, Any] = Field(..., description="Polygon or MultiPolygon GeoJSON")
 
+    _polygon = validator("geojson", allow_reuse=True)(_check_polygon)
 
-class PlaceUpdate(BaseModel):
-    name: Optional[str] = Field(None, min_length=1, max_length=255)
-    category: Optional[str] = Field(None, min_length=1, max_length=120)
-    description: Optional[str] = Field(None, max_length=2000)
-    address: Optional[str] = Field(None, max_length=255)
-    tags: Optional[List[str]] = None
-    hours: Optional[Dict[str, Any]] = None
-    lat: Optional[float] = Field(None, ge=-90, le=90)
-    lon: Optional[float] = Field(None, ge=-180, le=180)
 
-    @validator("lat")
-    def lat_requires_lon(cls, v, values):
-        if v is not None and values.get("lon") is None:
-            raise ValueError("Provide lon when updating lat")
-        return v
+class AreaOut(BaseModel):
+    id: int
+    name: str
+    user_id: Optional[int]
+    parts: int = Field(..., description="Pieces the area is subdivided into for indexed lookups")
+    created_at: Optional[datetime]
+    geometry: Optional[Dict[str, Any]] = None
 
-    @validator("lon")
-    def lon_requires_lat(cls, v, values):
-        if v is not None and values.get("lat") is None:
-            raise ValueError("Provide lat when updating lon")
-        return v
 
+class DistanceResponse(BaseModel):
+    id: int
+    distance_m: float
 
-class RateRequest(BaseModel):
-    rating: float = Field(..., ge=0, le=5)
-    comment: Optional[str] = Field(None, max_length=2000)
 
+class DistanceMatrixRequest(BaseModel):
+    origins: List[List[float]] = Field(..., min_length=1, description="Array of [lon, lat]")
+    place_ids: Optional[List[int]] = Field(None, min_length=1, description="Places to measure; omit to use the filters")
+    category: Optional[str] = None
+    tag: Optional[str] = None
+    min_rating: Optional[float] = Field(None, ge=0, le=5)
+    bbox: Optional[List[float]] = Field(None, min_length=4, max_length=4, description="[lon1, lat1, lon2, lat2]")
 
-class PolygonRequest(BaseModel):
-    geojson: Dict[str, Any] = Field(..., description="Polygon or MultiPolygon GeoJSON")
+    @validator("origins")
+    def origins_are_points(cls, v):
+        for point in v:
+            if len(point) != 2 or not (-180 <= point[0] <= 180 and -90 <= point[1] <= 90):
+                raise ValueError("Each origin must be [lon, lat] within valid ranges")
+        return v
 
 
-class DistanceResponse(BaseModel):
-    id: int
-    distance_m: float
+class DistanceMatrixResponse(BaseModel):
+    origins: List[List[float]]
+    place_ids: List[int]
+    distances_m: List[List[float]] = Field(..., description="One row per place id, one column per origin")
+    missing: List[int] = Field(default_factory=list, description="Requested place ids that do not exist")
 
 
 class Token(BaseModel):
@@ -146,10 +158,25 @@ class Token(BaseModel):
 class UserCreate(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=6, max_length=128)
+    role: Optional[str] = Field(None, description="Optional role (admin/user) when allowed")
 
 
 class UserOut(BaseModel):
     id: int
     username: str
     created_at: Optional[datetime]
+    role: Optional[str]
+
+
+class RoleUpdate(BaseModel):
+    role: str = Field(..., pattern="^(admin|user)$")
+
+
+class ReviewCreate(BaseModel):
+    rating: float = Field(..., ge=0, le=5)
+    text: Optional[str] = Field(None, max_length=4000)
+
 
+class RouteCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    points: List[List[float]] = Field(..., description="Array of [lon, lat]")
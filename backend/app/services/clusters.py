@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.async_db import acquire, connect_primary
+from app.core.config import get_settings
+from app.core.metrics import query_name
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_RADIUS_PX = 60
+TILE_EXTENT_PX = 512
+# Statement-level trigger on places (see db/init.sql), also used by the spatial index.
+CHANGES_CHANNEL = "places_changes"
+
+
+def _lon_to_x(lon: float) -> float:
+    return lon / 360.0 + 0.5
+
+
+def _lat_to_y(lat: float) -> float:
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi if abs(sin) < 1 else (0.0 if sin > 0 else 1.0)
+    return min(max(y, 0.0), 1.0)
+
+
+def _x_to_lon(x: float) -> float:
+    return (x - 0.5) * 360.0
+
+
+def _y_to_lat(y: float) -> float:
+    return 360.0 * math.atan(math.exp((180.0 - y * 360.0) * math.pi / 180.0)) / math.pi - 90.0
+
+
+class _Item:
+    __slots__ = ("x", "y", "count", "cluster_id", "place_id", "expansion_zoom")
+
+    def __init__(self, x, y, count, cluster_id, place_id, expansion_zoom):
+        self.x = x
+        self.y = y
+        self.count = count
+        self.cluster_id = cluster_id
+        self.place_id = place_id
+        self.expansion_zoom = expansion_zoom
+
+
+def _min_place_id(item: _Item) -> int:
+    return item.place_id if item.place_id is not None else item.cluster_id >> 5
+
+
+class ClusterIndex:
+    """Hierarchical greedy point clustering precomputed for every zoom level.
+
+    Level ``max_zoom + 1`` holds the raw places; each lower level greedily merges
+    items of the level above that fall within ``CLUSTER_RADIUS_PX`` screen pixels.
+    A cluster's id is derived from the smallest place id it contains and the zoom
+    it was formed at, so ids stay the same across rebuilds of unchanged data.
+    Every level is bucketed by web-mercator tile so viewport queries touch only
+    the tiles they cover.
+    """
+
+    def __init__(self, min_zoom: int = 0, max_zoom: int = 16):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._levels: Dict[int, Dict[Tuple[int, int], List[_Item]]] = {}
+        self.size = 0
+        self.built_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def build(self, points: Iterable[Tuple[int, float, float]]) -> None:
+        """(Re)build all levels from ``(place_id, lon, lat)`` tuples; safe to call from a thread."""
+        items = [_Item(_lon_to_x(lon), _lat_to_y(lat), 1, None, pid, None) for pid, lon, lat in sorted(points)]
+        size = len(items)
+        levels = {self.max_zoom + 1: self._bucket(items, self.max_zoom + 1)}
+        for z in range(self.max_zoom, self.min_zoom - 1, -1):
+            items = self._cluster(items, z)
+            levels[z] = self._bucket(items, z)
+        self._levels = levels
+        self.size = size
+        self.built_at = time.time()
+
+    @staticmethod
+    def _bucket(items: List[_Item], z: int) -> Dict[Tuple[int, int], List[_Item]]:
+        n = 2**z
+        buckets: Dict[Tuple[int, int], List[_Item]] = defaultdict(list)
+        for it in items:
+            buckets[(min(int(it.x * n), n - 1), min(int(it.y * n), n - 1))].append(it)
+        return dict(buckets)
+
+    @staticmethod
+    def _cluster(items: List[_Item], z: int) -> List[_Item]:
+        r = CLUSTER_RADIUS_PX / (TILE_EXTENT_PX * 2**z)
+        r2 = r * r
+        grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, it in enumerate(items):
+            grid[(int(it.x / r), int(it.y / r))].append(i)
+        taken = [False] * len(items)
+        result: List[_Item] = []
+        for i, it in enumerate(items):
+            if taken[i]:
+                continue
+            taken[i] = True
+            cx, cy = int(it.x / r), int(it.y / r)
+            members = [it]
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for j in grid.get((gx, gy), ()):
+                        other = items[j]
+                        if not taken[j] and (other.x - it.x) ** 2 + (other.y - it.y) ** 2 <= r2:
+                            taken[j] = True
+                            members.append(other)
+            if len(members) == 1:
+                result.append(it)
+                continue
+            count = sum(m.count for m in members)
+            seed = min(_min_place_id(m) for m in members)
+            result.append(
+                _Item(
+                    sum(m.x * m.count for m in members) / count,
+                    sum(m.y * m.count for m in members) / count,
+                    count,
+                    (seed << 5) + z,
+                    None,
+                    z + 1,
+                )
+            )
+        return result
+
+    def query(self, zoom: int, bbox: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+        """Clusters (and single places) of ``zoom`` whose centre lies in ``bbox``."""
+        z = min(max(zoom, self.min_zoom), self.max_zoom + 1)
+        level = self._levels.get(z, {})
+        lon1, lat1, lon2, lat2 = bbox
+        x1, x2 = sorted((_lon_to_x(lon1), _lon_to_x(lon2)))
+        y1, y2 = sorted((_lat_to_y(lat1), _lat_to_y(lat2)))
+        n = 2**z
+        result = []
+        for tx in range(max(int(x1 * n), 0), min(int(x2 * n), n - 1) + 1):
+            for ty in range(max(int(y1 * n), 0), min(int(y2 * n), n - 1) + 1):
+                for it in level.get((tx, ty), ()):
+                    if x1 <= it.x <= x2 and y1 <= it.y <= y2:
+                        result.append(
+                            {
+                                "cluster_id": it.cluster_id,
+                                "place_id": it.place_id,
+                                "count": it.count,
+                                "expansion_zoom": it.expansion_zoom,
+                                "geometry": {
+                                    "type": "Point",
+                                    "coordinates": [_x_to_lon(it.x), _y_to_lat(it.y)],
+                                },
+                            }
+                        )
+        return result
+
+
+class ClusterIndexManager:
+    """Keeps a ClusterIndex in sync with ``places`` by rebuilding it in the background.
+
+    Writes only call :meth:`mark_dirty`; a single task coalesces bursts of writes
+    into one rebuild at most every ``debounce`` seconds and swaps the new index in
+    atomically, so readers never see a half-built one. Writes from other workers,
+    the CLI importer or plain SQL reach it through LISTEN on ``places_changes``;
+    after a lost listener connection the index is rebuilt, as changes may have
+    been missed.
+    """
+
+    def __init__(self, min_zoom: int, max_zoom: int, debounce: float):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.debounce = debounce
+        self.index = ClusterIndex(min_zoom, max_zoom)
+        self._dirty: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def mark_dirty(self) -> None:
+        if self._dirty is not None:
+            self._dirty.set()
+
+    async def rebuild(self) -> None:
+        async with acquire() as conn:
+            with query_name("cluster_rebuild"):
+                rows = await conn.fetch("SELECT id, ST_X(geom) AS lon, ST_Y(geom) AS lat FROM places")
+        points = [(r["id"], r["lon"], r["lat"]) for r in rows]
+        index = ClusterIndex(self.min_zoom, self.max_zoom)
+        started = time.monotonic()
+        await asyncio.get_running_loop().run_in_executor(None, index.build, points)
+        self.index = index
+        logger.info("Cluster index rebuilt: %d places in %.2fs", len(points), time.monotonic() - started)
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Cluster index rebuild failed")
+                self._dirty.set()
+            await asyncio.sleep(self.debounce)
+
+    async def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await connect_primary()
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANGES_CHANNEL, lambda *_: self.mark_dirty())
+                self.mark_dirty()
+                delay = 1.0
+                await lost.wait()
+                logger.warning("Cluster index listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Cluster index listener unavailable (%s), retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._dirty = asyncio.Event()
+            self._dirty.set()
+            self._task = asyncio.create_task(self._run())
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, self._listener) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._listener = None
+
+
+async def grid_clusters(conn, zoom: int, bbox: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+    """Viewport grid clustering in SQL, used until the in-memory index is built."""
+    cell = 360.0 / 2**zoom * CLUSTER_RADIUS_PX / TILE_EXTENT_PX
+    sql = """
+        SELECT MIN(id) AS min_id, COUNT(*) AS count, AVG(ST_X(geom)) AS lon, AVG(ST_Y(geom)) AS lat
+        FROM places
+        WHERE geom && ST_MakeEnvelope($1, $2, $3, $4, 4326)
+        GROUP BY ST_SnapToGrid(geom, $5);
+    """
+    rows = await conn.fetch(sql, *bbox, cell)
+    return [
+        {
+            "cluster_id": (r["min_id"] << 5) + zoom if r["count"] > 1 else None,
+            "place_id": r["min_id"] if r["count"] == 1 else None,
+            "count": int(r["count"]),
+            "expansion_zoom": zoom + 1 if r["count"] > 1 else None,
+            "geometry": {"type": "Point", "coordinates": [float(r["lon"]), float(r["lat"])]},
+        }
+        for r in rows
+    ]
+
+
+_settings = get_settings()
+cluster_manager = ClusterIndexManager(
+    min_zoom=0,
+    max_zoom=_settings.cluster_max_zoom,
+    debounce=_settings.cluster_rebuild_debounce,
+)
@@ -0,0 +1,80 @@
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+import orjson
+
+from app.async_db import acquire_read
+
+FEATURE_SQL = """
+    SELECT json_build_object(
+        'type', 'Feature',
+        'geometry', ST_AsGeoJSON(geom)::json,
+        'properties', json_build_object(
+            'id', id,
+            'name', name,
+            'category', category,
+            'address', address,
+            'tags', tags,
+            'avg_rating', avg_rating,
+            'created_at', created_at
+        )
+    )::text AS feature
+    FROM places
+"""
+
+FEATURE_PROPERTIES = ("id", "name", "category", "address", "tags", "avg_rating", "created_at")
+
+MEDIA_TYPES = {"geojson": "application/geo+json", "ndjson": "application/x-ndjson"}
+
+
+def _encode_batch(batch: List[bytes], fmt: str, first: bool) -> bytes:
+    if fmt == "ndjson":
+        return b"\n".join(batch) + b"\n"
+    return (b"" if first else b",") + b",".join(batch)
+
+
+def encode_feature(place: Dict[str, Any]) -> bytes:
+    """A place dict (``row_to_place``) as the export's GeoJSON Feature."""
+    return orjson.dumps({
+        "type": "Feature",
+        "geometry": place["geometry"],
+        "properties": {key: place[key] for key in FEATURE_PROPERTIES},
+    })
+
+
+async def stream_encoded_features(features: AsyncIterator[bytes], fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Wrap JSON-encoded features into the export document, ``batch_size`` features per chunk.
+
+    ``fmt`` is ``geojson`` (one FeatureCollection) or ``ndjson`` (one Feature
+    per line). ``features`` is closed when the client goes away.
+    """
+    if fmt == "geojson":
+        yield b'{"type":"FeatureCollection","features":['
+    first = True
+    batch: List[bytes] = []
+    async with aclosing(features):
+        async for feature in features:
+            batch.append(feature)
+            if len(batch) >= batch_size:
+                yield _encode_batch(batch, fmt, first)
+                first = False
+                batch = []
+    if batch:
+        yield _encode_batch(batch, fmt, first)
+    if fmt == "geojson":
+        yield b"]}"
+
+
+async def _cursor_features(sql: str, params: Sequence[Any], prefetch: int) -> AsyncIterator[bytes]:
+    async with acquire_read() as conn, conn.transaction(readonly=True):
+        async for record in conn.cursor(sql, *params, prefetch=prefetch):
+            yield record["feature"].encode()
+
+
+def stream_features(where: str, params: Sequence[Any], fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Yield an export document chunk by chunk from a server-side cursor.
+
+    Each feature is serialized once, in Postgres, and passed through as text; at
+    most ``batch_size`` features are held in memory at a time.
+    """
+    return stream_encoded_features(_cursor_features(f"{FEATURE_SQL} {where}", params, batch_size), fmt, batch_size)
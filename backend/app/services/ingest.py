@@ -0,0 +1,315 @@
+import codecs
+import csv
+import json
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import asyncpg
+from pydantic import ValidationError
+
+from app.async_db import acquire
+from app.core.metrics import query_name
+from app.schemas import PlaceImport
+
+FORMATS = ("geojson", "ndjson", "csv")
+CONTENT_TYPES = {
+    "application/geo+json": "geojson",
+    "application/json": "geojson",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "text/csv": "csv",
+}
+# Longest single record (line, CSV row or GeoJSON feature) kept in memory while parsing.
+MAX_RECORD_CHARS = 1 << 20
+
+STAGE_COLUMNS = ("row_no", "external_id", "name", "category", "description", "address", "tags", "hours", "lon", "lat")
+
+STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS places_import_stage (
+        row_no INTEGER,
+        external_id TEXT,
+        name TEXT,
+        category TEXT,
+        description TEXT,
+        address TEXT,
+        tags TEXT[],
+        hours TEXT,
+        lon DOUBLE PRECISION,
+        lat DOUBLE PRECISION
+    ) ON COMMIT DROP;
+"""
+
+MERGE_SQL = """
+    WITH merged AS (
+        INSERT INTO places (external_id, name, category, description, address, tags, hours, geom)
+        SELECT external_id, name, category, description, address, tags, hours::jsonb,
+               ST_SetSRID(ST_MakePoint(lon, lat), 4326)
+        FROM places_import_stage
+        ORDER BY row_no
+        ON CONFLICT (external_id) DO UPDATE SET
+            name = EXCLUDED.name,
+            category = EXCLUDED.category,
+            description = EXCLUDED.description,
+            address = EXCLUDED.address,
+            tags = EXCLUDED.tags,
+            hours = EXCLUDED.hours,
+            geom = EXCLUDED.geom
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+           COUNT(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged;
+"""
+
+_FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+_SEPARATORS = " \t\r\n,"
+
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+class ImportFormatError(ValueError):
+    """The upload is structurally broken and cannot be parsed any further.
+
+    ``report`` holds what was imported (and committed) before the break.
+    """
+
+    report: Optional[Dict[str, Any]] = None
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    return CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+
+
+async def _text_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        async for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f"Upload is not valid UTF-8: {exc}")
+    if tail:
+        yield tail
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buf = ""
+    async for text in _text_chunks(chunks):
+        *lines, buf = (buf + text).split("\n")
+        for line in lines:
+            yield line
+        if len(buf) > MAX_RECORD_CHARS:
+            raise ImportFormatError(f"Line longer than {MAX_RECORD_CHARS} characters")
+    if buf:
+        yield buf
+
+
+def _flat_record(obj: Any) -> Dict[str, Any]:
+    """A place record from a GeoJSON Point feature or an already flat object."""
+    if not isinstance(obj, dict):
+        raise ValueError("Record must be a JSON object")
+    if obj.get("type") != "Feature":
+        return obj
+    geometry = obj.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        raise ValueError("Only Point geometries are supported")
+    lon, lat = geometry["coordinates"][:2]
+    record = dict(obj.get("properties") or {})
+    if record.get("external_id") is None and obj.get("id") is not None:
+        record["external_id"] = obj["id"]
+    return {**record, "lon": lon, "lat": lat}
+
+
+async def _ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    row_no = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        row_no += 1
+        try:
+            yield row_no, _flat_record(json.loads(line)), None
+        except (ValueError, KeyError, TypeError) as exc:
+            yield row_no, None, str(exc)
+
+
+async def _geojson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Features of a FeatureCollection, decoded one at a time as they arrive."""
+    decoder = json.JSONDecoder()
+    buf, pos, row_no = "", 0, 0
+    started = done = False
+    async for text in _text_chunks(chunks):
+        buf, pos = buf[pos:] + text, 0
+        if not started:
+            match = _FEATURES_START.search(buf)
+            if match is None:
+                if len(buf) > MAX_RECORD_CHARS:
+                    raise ImportFormatError("No 'features' array found; expected a FeatureCollection")
+                continue
+            started, pos = True, match.end()
+        while True:
+            while pos < len(buf) and buf[pos] in _SEPARATORS:
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                done = True
+                break
+            try:
+                feature, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely a feature cut by the chunk boundary: wait for more input.
+                if len(buf) - pos > MAX_RECORD_CHARS:
+                    raise ImportFormatError(f"Malformed feature after #{row_no}")
+                break
+            row_no += 1
+            pos = end
+            try:
+                yield row_no, _flat_record(feature), None
+            except (ValueError, KeyError, TypeError) as exc:
+                yield row_no, None, str(exc)
+        if done:
+            break
+    if not started:
+        raise ImportFormatError("No 'features' array found; expected a FeatureCollection")
+    if not done:
+        raise ImportFormatError(f"FeatureCollection is truncated after feature #{row_no}")
+
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    record: Dict[str, Any] = {k: v for k, v in row.items() if k and v != ""}
+    if "tags" in record:
+        record["tags"] = [t.strip() for t in record["tags"].split(";") if t.strip()]
+    if "hours" in record:
+        record["hours"] = json.loads(record["hours"])
+    return record
+
+
+async def _csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Rows of a CSV with a header line; quoted fields may span lines. Tags are ``;``-separated."""
+    header = None
+    pending = ""
+    row_no = 0
+    async for line in _lines(chunks):
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            # Inside a quoted field that continues on the next line.
+            if len(pending) > MAX_RECORD_CHARS:
+                raise ImportFormatError(f"Unterminated quoted field after row {row_no}")
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            continue
+        row_no += 1
+        if len(values) != len(header):
+            yield row_no, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        try:
+            yield row_no, _csv_record(dict(zip(header, values))), None
+        except ValueError as exc:
+            yield row_no, None, f"hours: {exc}"
+    if pending:
+        raise ImportFormatError(f"Unterminated quoted field after row {row_no}")
+
+
+PARSERS = {"geojson": _geojson_records, "ndjson": _ndjson_records, "csv": _csv_records}
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors())
+
+
+def _add_error(report: Dict[str, Any], row_no: int, external_id: Any, message: str, max_errors: int) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < max_errors:
+        report["errors"].append({"row": row_no, "external_id": external_id, "error": message})
+    else:
+        report["errors_truncated"] = True
+
+
+async def _merge_rows(conn, rows: List[Tuple[int, PlaceImport]], report: Dict[str, Any], max_errors: int) -> None:
+    """Upsert ``rows`` in one transaction.
+
+    If the database rejects them, the halves are retried on their own down
+    to single rows, so only the offending rows are reported as failed.
+    """
+    records = [
+        (
+            row_no,
+            p.external_id,
+            p.name,
+            p.category,
+            p.description,
+            p.address,
+            p.tags,
+            json.dumps(p.hours) if p.hours is not None else None,
+            p.lon,
+            p.lat,
+        )
+        for row_no, p in rows
+    ]
+    try:
+        async with conn.transaction():
+            with query_name("import_merge"):
+                await conn.execute(STAGE_SQL)
+                await conn.copy_records_to_table("places_import_stage", records=records, columns=STAGE_COLUMNS)
+                counts = await conn.fetchrow(MERGE_SQL)
+    except asyncpg.PostgresError as exc:
+        if len(rows) == 1:
+            row_no, p = rows[0]
+            _add_error(report, row_no, p.external_id, f"rejected by the database: {exc}", max_errors)
+            return
+        middle = len(rows) // 2
+        await _merge_rows(conn, rows[:middle], report, max_errors)
+        await _merge_rows(conn, rows[middle:], report, max_errors)
+        return
+    report["inserted"] += counts["inserted"]
+    report["updated"] += counts["updated"]
+
+
+async def _merge(batch: Dict[Any, Tuple[int, PlaceImport]], report: Dict[str, Any], max_errors: int) -> None:
+    async with acquire() as conn:
+        await _merge_rows(conn, sorted(batch.values(), key=lambda item: item[0]), report, max_errors)
+
+
+async def import_places(chunks: AsyncIterator[bytes], fmt: str, batch_size: int, max_errors: int) -> Dict[str, Any]:
+    """Stream an upload into ``places``, upserting by ``external_id``.
+
+    Records are validated against ``PlaceImport`` and loaded ``batch_size`` at
+    a time with COPY into a temp staging table, then merged with one
+    INSERT ... ON CONFLICT. Each batch commits on its own and holds a pooled
+    connection only while it is merged, so tag-dictionary rows touched by the
+    triggers are not locked for the whole upload. Invalid rows are skipped and
+    listed (at most ``max_errors``) in the returned report; within a batch the
+    last row with a given ``external_id`` wins. Raises ImportFormatError if the
+    upload itself cannot be parsed; batches before the error stay imported.
+    """
+    report: Dict[str, Any] = {"inserted": 0, "updated": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    batch: Dict[Any, Tuple[int, PlaceImport]] = {}
+    try:
+        async for row_no, record, error in PARSERS[fmt](chunks):
+            if error is None:
+                if record.get("external_id") is not None:
+                    record["external_id"] = str(record["external_id"])
+                try:
+                    place = PlaceImport(**record)
+                except ValidationError as exc:
+                    error = _validation_message(exc)
+            if error is not None:
+                _add_error(report, row_no, (record or {}).get("external_id"), error, max_errors)
+                continue
+            batch[place.external_id if place.external_id is not None else ("row", row_no)] = (row_no, place)
+            if len(batch) >= batch_size:
+                await _merge(batch, report, max_errors)
+                batch = {}
+    except ImportFormatError as exc:
+        exc.report = report
+        raise
+    if batch:
+        await _merge(batch, report, max_errors)
+    return report
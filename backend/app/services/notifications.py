@@ -0,0 +1,287 @@
+import asyncio
+import json
+import logging
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import orjson
+
+from app.async_db import acquire, connect_primary
+from app.core.config import get_settings
+from app.core.metrics import query_name
+from app.services.places import PLACE_COLUMNS, row_to_place
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "places_events"
+EARTH_RADIUS_M = 6_371_008.8
+M_PER_DEG_LAT = 111_320.0
+MAX_RADIUS_M = 50_000
+
+# Places created while the listener was reconnecting are replayed from here.
+CATCH_UP_SQL = """
+    SELECT id, ST_X(geom) AS lon, ST_Y(geom) AS lat
+    FROM places
+    WHERE is_moderated AND id > $1
+    ORDER BY id
+    LIMIT $2;
+"""
+CATCH_UP_LIMIT = 1000
+# Events taken off the backlog at once; their place rows are loaded with one query.
+EVENT_BATCH = 500
+EVENT_ROWS_SQL = f"SELECT {PLACE_COLUMNS} FROM places WHERE id = ANY($1::int[]) AND is_moderated"
+
+
+def distance_m(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Great-circle distance (haversine, mean Earth radius)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class SubscriberLimit(Exception):
+    """Raised when a worker already serves NOTIFY_MAX_SUBSCRIBERS streams."""
+
+
+class PlaceEvent:
+    """One event, encoded once and shared by every subscriber it goes to."""
+
+    __slots__ = ("id", "text", "sse")
+
+    def __init__(self, op: str, place: Dict[str, Any]):
+        self.id = place["id"]
+        self.text = orjson.dumps({"op": op, "place": place}).decode()
+        self.sse = f"id: {self.id}\nevent: {op}\ndata: {self.text}\n\n".encode()
+
+
+class Subscriber:
+    """A geofence plus the bounded queue its stream reads from; the oldest events go first on overflow."""
+
+    def __init__(self, lon: float, lat: float, radius_m: float, queue_size: int):
+        self.lon = lon
+        self.lat = lat
+        self.radius_m = radius_m
+        self.queue: "asyncio.Queue[PlaceEvent]" = asyncio.Queue(queue_size)
+        self.dropped = 0
+        self.cells: List[Tuple[int, int]] = []
+
+    def covers(self, lon: float, lat: float) -> bool:
+        return distance_m(self.lon, self.lat, lon, lat) <= self.radius_m
+
+    def deliver(self, event: PlaceEvent) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class GeofenceIndex:
+    """Uniform lon/lat grid of subscriber geofences.
+
+    A subscriber is registered in every cell its circle's bounding box
+    touches, so matching an event is one dict lookup plus an exact distance
+    check against the few geofences in that cell, however many clients are
+    connected.
+    """
+
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], Set[Subscriber]] = defaultdict(set)
+        self.size = 0
+
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        return math.floor(lon / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    def _cells_for(self, sub: Subscriber) -> Iterator[Tuple[int, int]]:
+        dlat = sub.radius_m / M_PER_DEG_LAT
+        dlon = sub.radius_m / (M_PER_DEG_LAT * max(math.cos(math.radians(sub.lat)), 0.01))
+        x1, y1 = self._cell(sub.lon - dlon, max(sub.lat - dlat, -90))
+        x2, y2 = self._cell(sub.lon + dlon, min(sub.lat + dlat, 90))
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                yield x, y
+
+    def add(self, sub: Subscriber) -> None:
+        sub.cells = list(self._cells_for(sub))
+        for cell in sub.cells:
+            self._cells[cell].add(sub)
+        self.size += 1
+
+    def remove(self, sub: Subscriber) -> None:
+        for cell in sub.cells:
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(sub)
+                if not members:
+                    del self._cells[cell]
+        sub.cells = []
+        self.size -= 1
+
+    def move(self, sub: Subscriber, lon: float, lat: float, radius_m: float) -> None:
+        self.remove(sub)
+        sub.lon, sub.lat, sub.radius_m = lon, lat, radius_m
+        self.add(sub)
+
+    def match(self, lon: float, lat: float) -> List[Subscriber]:
+        return [s for s in self._cells.get(self._cell(lon, lat), ()) if s.covers(lon, lat)]
+
+
+class NotificationHub:
+    """Per-worker fan-out of place events from Postgres NOTIFY to SSE/WebSocket subscribers.
+
+    One dedicated connection LISTENs on ``places_events`` (the trigger on
+    ``places`` notifies on insert and on moderation) and appends events to a
+    bounded backlog (oldest dropped on overflow). A single consumer drains it
+    in batches: each event is matched against the geofence index, the rows of
+    places someone is interested in are loaded with one query per batch, and
+    each event is queued to every matching subscriber. Work per event is
+    independent of the number of connected clients. The connection is
+    re-established with backoff; places inserted meanwhile are replayed.
+    """
+
+    def __init__(self, cell_deg: float, queue_size: int, max_subscribers: int, backlog: int):
+        self.index = GeofenceIndex(cell_deg)
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.last_id = 0
+        self._primed = False
+        self.events_total = 0
+        self.events_dropped = 0
+        self.deliveries_total = 0
+        self._events: "asyncio.Queue[Tuple[str, int, float, float]]" = asyncio.Queue(backlog)
+        self._task: Optional[asyncio.Task] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def subscribe(self, lon: float, lat: float, radius_m: float) -> Subscriber:
+        if self.index.size >= self.max_subscribers:
+            raise SubscriberLimit(f"At most {self.max_subscribers} notification streams per worker")
+        sub = Subscriber(lon, lat, radius_m, self.queue_size)
+        self.index.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        if sub.cells:
+            self.index.remove(sub)
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            op, place_id, lon, lat = event["op"], int(event["id"]), float(event["lon"]), float(event["lat"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s payload: %r", CHANNEL, payload)
+            return
+        if self._events.full():
+            self._events.get_nowait()
+            self.events_dropped += 1
+        self._events.put_nowait((op, place_id, lon, lat))
+
+    async def _consume(self) -> None:
+        while True:
+            batch = [await self._events.get()]
+            while len(batch) < EVENT_BATCH and not self._events.empty():
+                batch.append(self._events.get_nowait())
+            try:
+                await self.dispatch(batch)
+            except Exception:
+                logger.exception("Could not deliver %d place events", len(batch))
+
+    async def dispatch(self, events: List[Tuple[str, int, float, float]]) -> int:
+        """Deliver ``(op, place_id, lon, lat)`` events; returns the number of deliveries."""
+        self.events_total += len(events)
+        matched = []
+        for op, place_id, lon, lat in events:
+            if op == "created":
+                self.last_id = max(self.last_id, place_id)
+            targets = self.index.match(lon, lat)
+            if targets:
+                matched.append((op, place_id, targets))
+        if not matched:
+            return 0
+        async with acquire() as conn:
+            with query_name("place_event"):
+                rows = await conn.fetch(EVENT_ROWS_SQL, list({place_id for _, place_id, _ in matched}))
+        places = {row["id"]: row_to_place(row) for row in rows}
+        delivered = 0
+        for op, place_id, targets in matched:
+            place = places.get(place_id)
+            if place is None:
+                continue
+            event = PlaceEvent(op, place)
+            # Subscribers may have left or moved while the rows were loading.
+            for sub in targets:
+                if sub.cells:
+                    sub.deliver(event)
+                    delivered += 1
+        self.deliveries_total += delivered
+        return delivered
+
+    async def _catch_up(self) -> None:
+        async with acquire() as conn:
+            with query_name("place_event_catch_up"):
+                rows = await conn.fetch(CATCH_UP_SQL, self.last_id, CATCH_UP_LIMIT)
+        await self.dispatch([("created", row["id"], row["lon"], row["lat"]) for row in rows])
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await connect_primary()
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                if self._primed:
+                    await self._catch_up()
+                else:
+                    self.last_id = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM places")
+                    self._primed = True
+                logger.info("Listening for %s", CHANNEL)
+                delay = 1.0
+                await lost.wait()
+                logger.warning("Notification listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Notification listener unavailable (%s), retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._consumer = asyncio.create_task(self._consume())
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, self._consumer) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._consumer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "subscribers": self.index.size,
+            "events_total": self.events_total,
+            "events_backlog": self._events.qsize(),
+            "events_dropped": self.events_dropped,
+            "deliveries_total": self.deliveries_total,
+        }
+
+
+_settings = get_settings()
+notification_hub = NotificationHub(
+    cell_deg=_settings.notify_grid_deg,
+    queue_size=_settings.notify_queue_size,
+    max_subscribers=_settings.notify_max_subscribers,
+    backlog=_settings.notify_backlog,
+)
@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor token that is malformed or was issued for another listing."""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(scope: str, values: Sequence[Any]) -> str:
+    """Opaque token holding the sort key of the last row of a page."""
+    payload = json.dumps({"s": scope, "k": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, scope: str, size: int) -> List[Any]:
+    """Sort key stored in ``token``; it must come from the same ``scope`` and have ``size`` parts."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        values = [_decode_value(v) for v in payload["k"]]
+        valid = payload["s"] == scope and len(values) == size
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise InvalidCursor("Invalid or foreign cursor")
+    return values
+
+
+def keyset_clause(params: List[Any], columns: Sequence[str], values: Sequence[Any], descending: bool) -> str:
+    """Row comparison that resumes after ``values``; appends them to ``params`` as $n."""
+    placeholders = []
+    for value in values:
+        params.append(value)
+        placeholders.append(f"${len(params)}")
+    op = "<" if descending else ">"
+    return f"({', '.join(columns)}) {op} ({', '.join(placeholders)})"
+
+
+def paginate(
+    rows: Sequence[Any], limit: int, scope: str, key: Callable[[Any], Sequence[Any]]
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim a ``limit + 1`` fetch to ``limit`` rows and build the cursor for the next page, if any."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(scope, key(rows[-1]))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import get_settings
+
+
+class HashingBusy(Exception):
+    """Raised when too many hash/verify jobs are already queued."""
+
+
+@lru_cache()
+def _crypt_context(rounds: int) -> CryptContext:
+    # min == max == default so any change of the cost factor marks old hashes for rehash.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def hash_password_sync(password: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(password)
+
+
+def verify_and_update_sync(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _crypt_context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated process pool so it never blocks request workers."""
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingBusy(f"{self._pending} password jobs already pending")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password_sync, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Check ``password``; when valid but hashed with another cost, also return a fresh hash."""
+        return await self._submit(verify_and_update_sync, password, hashed, self.rounds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self._pending, "max_pending": self.max_pending}
+
+
+_settings = get_settings()
+password_hasher = PasswordHasher(
+    workers=_settings.password_hash_workers,
+    max_pending=_settings.password_hash_max_pending,
+    rounds=_settings.password_bcrypt_rounds,
+)
@@ -1,11 +1,18 @@
-import json
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List, Optional, Tuple
 
-import psycopg2.extras
+from app.core.metrics import query_name
+
+# Select list every place response is built from. Coordinates come back as float8
+# so row_to_place builds the geometry directly instead of parsing ST_AsGeoJSON text.
+PLACE_COLUMNS = (
+    "id, name, category, description, address, tags, avg_rating, hours, "
+    "ST_X(geom) AS lon, ST_Y(geom) AS lat, created_at"
+)
 
 
 def row_to_place(row) -> Dict[str, Any]:
-    """Convert DB row to dict for JSON response."""
+    """Convert a row selected with PLACE_COLUMNS to a dict ready for JSON encoding."""
     return {
         "id": row["id"],
         "name": row["name"],
@@ -15,27 +22,41 @@ def row_to_place(row) -> Dict[str, Any]:
         "tags": row.get("tags") or [],
         "avg_rating": float(row["avg_rating"]) if row.get("avg_rating") is not None else None,
         "hours": row.get("hours"),
-        "geometry": json.loads(row["geometry"]) if row.get("geometry") else None,
+        "geometry": {"type": "Point", "coordinates": [row["lon"], row["lat"]]},
         "created_at": row.get("created_at"),
     }
 
 
-def refresh_avg_rating(conn, place_id: int) -> float:
-    """Recalculate and update avg_rating after rating changes (from reviews)."""
-    sql = """
-        WITH stats AS (
-            SELECT AVG(rating) AS avg_rating
-            FROM reviews
-            WHERE place_id = %s
-        )
-        UPDATE places
-        SET avg_rating = stats.avg_rating
-        FROM stats
-        WHERE id = %s
-        RETURNING COALESCE(stats.avg_rating, 0) AS avg_rating;
-    """
-    with conn.cursor() as cur:
-        cur.execute(sql, (place_id, place_id))
-        row = cur.fetchone()
-    return float(row[0]) if row else 0.0
+def prefix_tsquery(text: str) -> Optional[str]:
+    """Turn free text into a ``simple`` tsquery matching word prefixes: ``каф ар`` -> ``каф:* & ар:*``."""
+    words = re.findall(r"[^\W_]+", text.lower())
+    return " & ".join(f"{w}:*" for w in words) or None
+
+
+def place_filter_clauses(
+    params: List[Any],
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    alias: str = "",
+) -> List[str]:
+    """SQL conditions for the common place filters; values are appended to ``params`` as $n."""
+    prefix = f"{alias}." if alias else ""
+    clauses = []
+    if category:
+        params.append(category)
+        clauses.append(f"{prefix}category = ${len(params)}")
+    if tag:
+        params.append(tag)
+        clauses.append(f"${len(params)} = ANY({prefix}tags)")
+    if min_rating is not None:
+        params.append(min_rating)
+        clauses.append(f"{prefix}avg_rating >= ${len(params)}")
+    return clauses
+
 
+async def place_coordinates(conn, place_id: int) -> Optional[Tuple[float, float]]:
+    """Return (lon, lat) of a place, used to invalidate spatial caches."""
+    with query_name("place_coordinates"):
+        row = await conn.fetchrow("SELECT ST_X(geom) AS lon, ST_Y(geom) AS lat FROM places WHERE id = $1", place_id)
+    return (row["lon"], row["lat"]) if row else None
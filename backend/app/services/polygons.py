@@ -0,0 +1,146 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+import asyncpg
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.services.places import PLACE_COLUMNS
+
+# Client GeoJSON -> valid (multi)polygon -> pieces of at most $2 vertices, as WKB.
+PREPARE_SQL = """
+    SELECT ST_AsBinary(part)
+    FROM ST_Subdivide(
+        ST_CollectionExtract(ST_MakeValid(ST_SetSRID(ST_GeomFromGeoJSON($1), 4326)), 3), $2
+    ) AS part;
+"""
+
+# Pieces of every requested polygon, tagged with its position in the request:
+# prepared client polygons arrive as WKB ($1/$2), saved areas are read from area_parts ($3/$4).
+# Small pieces keep each GIST probe tight; DISTINCT drops places on a seam between two pieces.
+MATCHES_CTE = """
+    WITH parts AS (
+        SELECT s.poly, ST_GeomFromWKB(s.wkb, 4326) AS geom
+        FROM UNNEST($1::int[], $2::bytea[]) AS s(poly, wkb)
+        UNION ALL
+        SELECT a.poly, ap.geom
+        FROM UNNEST($3::int[], $4::int[]) AS a(poly, area_id)
+        JOIN area_parts ap ON ap.area_id = a.area_id
+    ),
+    matches AS (
+        SELECT DISTINCT parts.poly, p.id
+        FROM parts
+        JOIN places p ON ST_Intersects(p.geom, parts.geom)
+        {where}
+    )
+"""
+
+COUNT_SQL = MATCHES_CTE.format(where="") + """
+    SELECT poly, COUNT(*) AS total FROM matches GROUP BY poly;
+"""
+
+PAGE_SQL = MATCHES_CTE.format(where="WHERE p.id > $5") + f"""
+    SELECT {PLACE_COLUMNS}
+    FROM places
+    WHERE id IN (SELECT id FROM matches)
+    ORDER BY id
+    LIMIT $6;
+"""
+
+BATCH_SQL = MATCHES_CTE.format(where="") + f"""
+    , ranked AS (
+        SELECT poly, id,
+               ROW_NUMBER() OVER (PARTITION BY poly ORDER BY id) AS rn,
+               COUNT(*) OVER (PARTITION BY poly) AS total
+        FROM matches
+    )
+    SELECT r.poly, r.total, p.*
+    FROM ranked r
+    CROSS JOIN LATERAL (SELECT {PLACE_COLUMNS} FROM places WHERE places.id = r.id) p
+    WHERE r.rn <= $5
+    ORDER BY r.poly, r.id;
+"""
+
+Sources = Tuple[List[int], List[bytes], List[int], List[int]]
+
+
+class InvalidPolygon(ValueError):
+    """PostGIS could not read the submitted GeoJSON as a polygon."""
+
+
+class UnknownArea(LookupError):
+    def __init__(self, area_id: int):
+        super().__init__(f"Area {area_id} not found")
+        self.area_id = area_id
+
+
+def polygon_key(geojson: Dict[str, Any]) -> str:
+    """Content hash of a GeoJSON geometry; key order and whitespace do not matter."""
+    canonical = json.dumps(geojson, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+async def prepare_polygon(conn, geojson: Dict[str, Any]) -> List[bytes]:
+    """Subdivided pieces of a client polygon (WKB), cached by content hash.
+
+    Clients tend to resend the same district outline; repeats skip GeoJSON
+    parsing, validation and ST_Subdivide entirely.
+    """
+    key = polygon_key(geojson)
+    parts = polygon_cache.get(key)
+    if parts is None:
+        try:
+            rows = await conn.fetch(PREPARE_SQL, json.dumps(geojson), _settings.polygon_subdivide_vertices)
+        except asyncpg.PostgresError as exc:
+            raise InvalidPolygon(str(exc))
+        parts = [r[0] for r in rows]
+        polygon_cache.set(key, parts)
+    return parts
+
+
+async def polygon_sources(conn, polygons: Sequence[Any]) -> Sources:
+    """Query parameters ($1..$4 of MATCHES_CTE) for PolygonRequest-like items."""
+    polys: List[int] = []
+    wkbs: List[bytes] = []
+    area_polys: List[int] = []
+    area_ids: List[int] = []
+    for index, polygon in enumerate(polygons):
+        if polygon.area_id is not None:
+            area_polys.append(index)
+            area_ids.append(polygon.area_id)
+            continue
+        for part in await prepare_polygon(conn, polygon.geojson):
+            polys.append(index)
+            wkbs.append(part)
+    if area_ids:
+        found = await conn.fetchval("SELECT array_agg(id) FROM areas WHERE id = ANY($1::int[])", area_ids) or []
+        missing = set(area_ids) - set(found)
+        if missing:
+            raise UnknownArea(min(missing))
+    return polys, wkbs, area_polys, area_ids
+
+
+async def count_matches(conn, sources: Sources, n_polygons: int) -> List[int]:
+    """Number of places inside each polygon."""
+    counts = [0] * n_polygons
+    for row in await conn.fetch(COUNT_SQL, *sources):
+        counts[row["poly"]] = row["total"]
+    return counts
+
+
+async def page_matches(conn, sources: Sources, after_id: int, limit: int) -> List[asyncpg.Record]:
+    """Places inside the (single) polygon with id > ``after_id``, by id, at most ``limit``."""
+    return await conn.fetch(PAGE_SQL, *sources, after_id, limit)
+
+
+async def batch_matches(conn, sources: Sources, limit: int) -> Dict[int, Tuple[int, List[asyncpg.Record]]]:
+    """Per polygon index: ``(total, first `limit` places by id)``; polygons without matches are absent."""
+    result: Dict[int, Tuple[int, List[asyncpg.Record]]] = {}
+    for row in await conn.fetch(BATCH_SQL, *sources, limit):
+        result.setdefault(row["poly"], (row["total"], []))[1].append(row)
+    return result
+
+
+_settings = get_settings()
+polygon_cache = TTLCache(_settings.polygon_cache_size, _settings.polygon_cache_ttl)
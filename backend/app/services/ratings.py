@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.async_db import acquire, after_commit
+from app.core.config import get_settings
+from app.core.metrics import query_name
+from app.services.response_cache import data_versions
+from app.services.tiles import tile_cache
+
+logger = logging.getLogger(__name__)
+
+APPLY_DELTA_SQL = """
+    UPDATE places
+    SET rating_sum = rating_sum + $2,
+        rating_count = rating_count + $3,
+        avg_rating = CASE WHEN rating_count + $3 > 0
+                          THEN ROUND((rating_sum + $2) / (rating_count + $3), 2) END
+    WHERE id = $1
+    RETURNING avg_rating;
+"""
+
+APPLY_BATCH_SQL = """
+    UPDATE places p
+    SET rating_sum = p.rating_sum + d.delta_sum,
+        rating_count = p.rating_count + d.delta_count,
+        avg_rating = CASE WHEN p.rating_count + d.delta_count > 0
+                          THEN ROUND((p.rating_sum + d.delta_sum) / (p.rating_count + d.delta_count), 2) END
+    FROM UNNEST($1::int[], $2::numeric[], $3::int[]) AS d(place_id, delta_sum, delta_count)
+    WHERE p.id = d.place_id
+    RETURNING p.id, ST_X(p.geom) AS lon, ST_Y(p.geom) AS lat;
+"""
+
+
+def _avg(rating_sum: Decimal, rating_count: int) -> float:
+    return float(round(rating_sum / rating_count, 2)) if rating_count > 0 else 0.0
+
+
+class RatingAggregator:
+    """Write-behind buffer for rating aggregates.
+
+    Handlers add ``(delta_sum, delta_count)`` per place; a background task folds
+    everything collected during ``interval`` seconds into one UPDATE, so a burst
+    of ratings for a popular place takes its row lock once instead of per rating.
+    Deltas of a failed flush are merged back and retried on the next tick.
+    A flush invalidates the places' cached tiles, which carry ``avg_rating``.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, List[Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_total = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def add(self, place_id: int, delta_sum: Decimal, delta_count: int) -> Tuple[Decimal, int]:
+        """Buffer a change; returns the place's pending ``(delta_sum, delta_count)``."""
+        pending = self._pending.setdefault(place_id, [Decimal(0), 0])
+        pending[0] += delta_sum
+        pending[1] += delta_count
+        return pending[0], pending[1]
+
+    def pending(self, place_id: int) -> Tuple[Decimal, int]:
+        delta_sum, delta_count = self._pending.get(place_id, (Decimal(0), 0))
+        return delta_sum, delta_count
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        ids = list(batch)
+        try:
+            async with acquire() as conn:
+                with query_name("rating_flush"):
+                    rows = await conn.fetch(
+                        APPLY_BATCH_SQL,
+                        ids,
+                        [batch[i][0] for i in ids],
+                        [batch[i][1] for i in ids],
+                    )
+        except BaseException:
+            for place_id, (delta_sum, delta_count) in batch.items():
+                self.add(place_id, delta_sum, delta_count)
+            raise
+        for row in rows:
+            await tile_cache.invalidate_point(row["lon"], row["lat"])
+        data_versions.bump("places", *(f"place:{i}" for i in ids))
+        self.flushed_total += len(ids)
+        return len(ids)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Rating aggregate flush failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final rating aggregate flush failed, %d places left unsynced", len(self._pending))
+
+
+async def apply_rating_delta(conn, place_id: int, delta_sum: Decimal, delta_count: int) -> float:
+    """Record a rating change for a place and return its (possibly projected) average.
+
+    ``delta_sum`` must be the rating as stored in ``reviews`` (NUMERIC(2, 1)),
+    not the raw request value, or the running sum drifts from the reviews.
+    With write-behind enabled the change is buffered once the request
+    transaction commits (a rolled-back review must not reach the aggregate)
+    and the returned average is the stored aggregate plus everything pending
+    for the place, this change included.
+    """
+    if rating_aggregator.running:
+        pending_sum, pending_count = rating_aggregator.pending(place_id)
+        after_commit(lambda: rating_aggregator.add(place_id, delta_sum, delta_count))
+        with query_name("rating_projection"):
+            row = await conn.fetchrow("SELECT rating_sum, rating_count FROM places WHERE id = $1", place_id)
+        if row is None:
+            return 0.0
+        return _avg(
+            row["rating_sum"] + pending_sum + delta_sum, row["rating_count"] + pending_count + delta_count
+        )
+    with query_name("apply_rating_delta"):
+        value = await conn.fetchval(APPLY_DELTA_SQL, place_id, delta_sum, delta_count)
+    return float(value) if value is not None else 0.0
+
+
+RECONCILE_SQL = """
+    SELECT p.id AS place_id, p.rating_sum, p.rating_count,
+           COALESCE(r.rating_sum, 0) AS actual_sum, COALESCE(r.rating_count, 0) AS actual_count
+    FROM places p
+    LEFT JOIN (
+        SELECT place_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+        FROM reviews
+        GROUP BY place_id
+    ) r ON r.place_id = p.id
+    WHERE p.rating_sum <> COALESCE(r.rating_sum, 0) OR p.rating_count <> COALESCE(r.rating_count, 0)
+    ORDER BY p.id;
+"""
+
+REPAIR_SQL = """
+    UPDATE places
+    SET rating_sum = %s,
+        rating_count = %s,
+        avg_rating = ROUND(%s::numeric / NULLIF(%s, 0), 2)
+    WHERE id = %s;
+"""
+
+
+def reconcile_ratings(conn, fix: bool = False) -> List[Dict[str, Any]]:
+    """Compare stored aggregates with ``reviews`` (psycopg2 connection); optionally repair them.
+
+    Returns the mismatching places as found before any repair. Ratings still
+    buffered by a write-behind aggregator show up as mismatches until flushed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(RECONCILE_SQL)
+        columns = [c.name for c in cur.description]
+        mismatches = [dict(zip(columns, row)) for row in cur.fetchall()]
+        if fix:
+            for m in mismatches:
+                total, count = m["actual_sum"], m["actual_count"]
+                cur.execute(REPAIR_SQL, (total, count, total, count, m["place_id"]))
+    return mismatches
+
+
+rating_aggregator = RatingAggregator(interval=get_settings().rating_flush_interval)
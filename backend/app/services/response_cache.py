@@ -0,0 +1,172 @@
+import hashlib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+from app.core import consistency
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+# Scopes bumped inside the current request transaction, bumped again once it ends.
+_deferred: ContextVar[Optional[List[str]]] = ContextVar("deferred_bumps", default=None)
+
+
+class DataVersions:
+    """Per-scope write counters that cached responses are keyed on.
+
+    Writes call :meth:`bump` with the scopes they touch (``"places"`` for
+    anything listing-wide, ``"place:<id>"`` for one place, ``"tags"``), so only
+    responses built from those scopes go stale. Versions embed a per-process
+    boot id: a restarted worker never reproduces an ETag issued before.
+
+    Counters only see writes handled by this process. Writes made by other
+    workers or the CLI are invisible here, so versions also carry the current
+    ``window``-second period: every ETag changes and Last-Modified moves
+    forward at least once per window, which bounds both stale bodies and
+    stale 304s to ``window`` seconds.
+
+    A bump made inside :meth:`deferred` (the request transaction) is repeated
+    when the block exits, so a response cached from pre-commit data during
+    the transaction cannot outlive the commit.
+    """
+
+    def __init__(self, window: float):
+        self._window = window
+        self._lock = threading.Lock()
+        self._boot = uuid.uuid4().hex[:8]
+        self._epoch = 0
+        self._counters: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+        self._base_modified = time.time()
+
+    def bump(self, *scopes: str) -> None:
+        self._bump(scopes)
+        pending = _deferred.get()
+        if pending is not None:
+            pending.extend(scopes)
+
+    def _bump(self, scopes: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for scope in scopes:
+                self._counters[scope] = self._counters.get(scope, 0) + 1
+                self._modified[scope] = now
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        pending: List[str] = []
+        _deferred.set(pending)
+        try:
+            yield
+        finally:
+            _deferred.set(None)
+            if pending:
+                self._bump(set(pending))
+
+    def bump_all(self) -> None:
+        """Invalidate every scope, e.g. after a bulk import touching unknown places."""
+        with self._lock:
+            self._epoch += 1
+            self._counters.clear()
+            self._modified.clear()
+            self._base_modified = time.time()
+
+    def state(self, scopes: Iterable[str]) -> Tuple[str, float]:
+        """``(version, last_modified)`` of the given scopes taken together."""
+        period = int(time.time() // self._window) if self._window > 0 else 0
+        with self._lock:
+            parts = [f"{scope}={self._counters.get(scope, 0)}" for scope in scopes]
+            modified = max(
+                [self._base_modified, period * self._window] + [self._modified.get(scope, 0.0) for scope in scopes]
+            )
+            return f"{self._boot}.{self._epoch}.{period}:{','.join(parts)}", modified
+
+
+class Validators:
+    """ETag/Last-Modified of one request and whether the client's copy is still fresh."""
+
+    def __init__(self, key: Tuple[Any, ...], last_modified: float, request: Request):
+        self.key = key
+        self.etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:24] + '"'
+        self.last_modified = int(last_modified)
+        self.headers = {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        self.fresh = self._client_is_fresh(request)
+
+    def _client_is_fresh(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2); weak comparison.
+            tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+
+class ResponseCache:
+    """LRU+TTL cache of rendered JSON bodies keyed on path, sorted query and data version."""
+
+    def __init__(self, maxsize: int, ttl: float, max_body: int):
+        self.entries = TTLCache(maxsize, ttl)
+        self.max_body = max_body
+
+    @staticmethod
+    def validators(
+        request: Request,
+        scopes: Iterable[str] = (),
+        version: Optional[str] = None,
+        last_modified: Optional[float] = None,
+    ) -> Validators:
+        """Validators from data ``scopes``, or from an explicit ``version``/``last_modified``."""
+        if version is None:
+            version, last_modified = data_versions.state(scopes)
+        query = tuple(sorted(request.query_params.multi_items()))
+        return Validators((request.url.path, query, version), last_modified or time.time(), request)
+
+    async def serve(self, request: Request, build: Callable[[], Awaitable[Any]], **validator_args: Any) -> Response:
+        """Answer 304, a cached body, or ``await build()`` rendered as JSON and cached.
+
+        ``build`` runs only on a miss; exceptions (e.g. 404) pass through uncached.
+        """
+        check = self.validators(request, **validator_args)
+        if check.fresh:
+            return check.not_modified()
+        body = self.entries.get(check.key)
+        if body is None:
+            # The body is shared with every client under the current version, so a
+            # replica read must already include every write this process committed.
+            with consistency.at_least(consistency.latest_write_lsn()):
+                body = ORJSONResponse(await build()).body
+            if len(body) <= self.max_body:
+                self.entries.set(check.key, body)
+        return Response(body, media_type="application/json", headers=check.headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.entries.stats()
+
+
+_settings = get_settings()
+data_versions = DataVersions(window=_settings.response_cache_ttl)
+response_cache = ResponseCache(
+    maxsize=_settings.response_cache_size,
+    ttl=_settings.response_cache_ttl,
+    max_body=_settings.response_cache_max_body,
+)
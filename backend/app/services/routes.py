@@ -0,0 +1,85 @@
+from typing import Any, List, Optional
+
+from app.services.pagination import keyset_clause
+from app.services.places import PLACE_COLUMNS, place_filter_clauses
+
+# GeoJSON coordinates in route listings: 6 decimals is ~0.1 m, far below GPS noise.
+LISTING_GEOJSON_DIGITS = 6
+# Encoded polyline precision (1e-5 deg, ~1 m), the one Google/OSRM/Valhalla clients expect by default.
+POLYLINE_PRECISION = 5
+TILE_SIZE_PX = 256
+
+
+def simplify_tolerance(zoom: int) -> float:
+    """Width of one map pixel at ``zoom`` in degrees: detail below it is invisible on screen."""
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+def route_geometry_sql(params: List[Any], zoom: Optional[int], fmt: str) -> str:
+    """Select expression for a listed route's geometry; the tolerance is appended to ``params``."""
+    geom = "geom"
+    if zoom is not None:
+        params.append(simplify_tolerance(zoom))
+        # preserveCollapsed keeps short routes as a 2-point line instead of dropping them.
+        geom = f"ST_Simplify(geom, ${len(params)}, true)"
+    if fmt == "polyline":
+        return f"ST_AsEncodedPolyline({geom}, {POLYLINE_PRECISION}) AS polyline"
+    return f"ST_AsGeoJSON({geom}, {LISTING_GEOJSON_DIGITS}) AS geometry"
+
+
+def corridor_sql(
+    params: List[Any],
+    limit: int,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    after: Optional[List[Any]] = None,
+) -> str:
+    """Places within ``$2`` metres of route ``$1``, by position along the route.
+
+    A single GIST probe with a long route's bounding box would match most of
+    the city, so the route is cut into pieces of about ``$3`` metres
+    (``ST_LineSubstring``) and ``idx_places_geog`` is probed once per piece;
+    each probe only sees a narrow box around its piece. Places near a joint
+    match two pieces, hence DISTINCT. ``params`` must hold ``$1..$3``; filter,
+    cursor (``after`` = ``[along_m, id]``) and limit values are appended.
+    """
+    filters = place_filter_clauses(params, category, tag, min_rating, alias="p")
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    cursor_clause = ""
+    if after is not None:
+        cursor_clause = "WHERE " + keyset_clause(params, ["along_m", "id"], after, descending=False)
+    params.append(limit)
+    return f"""
+        WITH route AS (
+            SELECT geom, ST_Length(geom::geography) AS length_m FROM routes WHERE id = $1
+        ),
+        pieces AS (
+            SELECT ST_LineSubstring(route.geom, i::float8 / n, (i + 1)::float8 / n) AS geom
+            FROM route
+            CROSS JOIN LATERAL (SELECT GREATEST(1, CEIL(route.length_m / $3))::int AS n) AS s
+            CROSS JOIN LATERAL generate_series(0, s.n - 1) AS i
+        ),
+        hits AS (
+            SELECT DISTINCT p.id
+            FROM pieces
+            JOIN places p ON ST_DWithin(p.geom::geography, pieces.geom::geography, $2, false)
+            {where}
+        ),
+        located AS (
+            SELECT c.*,
+                   ST_LineLocatePoint(route.geom, ST_SetSRID(ST_MakePoint(c.lon, c.lat), 4326))
+                       * route.length_m AS along_m,
+                   ST_Distance(
+                       ST_SetSRID(ST_MakePoint(c.lon, c.lat), 4326)::geography, route.geom::geography, false
+                   ) AS distance_m
+            FROM (SELECT {PLACE_COLUMNS} FROM places WHERE id IN (SELECT id FROM hits)) AS c
+            CROSS JOIN route
+        )
+        SELECT *
+        FROM located
+        {cursor_clause}
+        ORDER BY along_m, id
+        LIMIT ${len(params)};
+    """
+
@@ -0,0 +1,508 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import asyncpg
+import orjson
+
+try:
+    import numpy as np
+except ImportError:  # optional: SPATIAL_INDEX_ENABLED needs numpy installed
+    np = None
+
+from app.async_db import CURRENT_LSN_SQL, connect_primary
+from app.core import consistency, metrics
+from app.core.config import get_settings
+from app.services.export import encode_feature
+from app.services.places import PLACE_COLUMNS, row_to_place
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "places_changes"
+# Payload the trigger sends instead of ids when a statement touched too many rows.
+RELOAD_ALL = "*"
+# ST_DistanceSphere's sphere, so in-memory distances and cursors match the SQL path.
+SPHERE_RADIUS_M = 6_370_986.0
+M_PER_DEG = math.pi * SPHERE_RADIUS_M / 180.0
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# created_at NULL sorts first under ORDER BY created_at DESC, like in Postgres.
+NULL_CREATED = 2**63 - 1
+# Grid columns scanned one by one; a wider box is cheaper to answer from all places.
+MAX_SCAN_COLUMNS = 2000
+
+LOAD_SQL = f"SELECT {PLACE_COLUMNS} FROM places"
+ROWS_SQL = f"SELECT {PLACE_COLUMNS} FROM places WHERE id = ANY($1::int[])"
+
+Filters = Tuple[Optional[str], Optional[str], Optional[float]]
+
+
+def _micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return NULL_CREATED
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros: int) -> Optional[datetime]:
+    return None if micros == NULL_CREATED else EPOCH + timedelta(microseconds=int(micros))
+
+
+def sphere_distance(lon: float, lat: float, lons, lats):
+    """Haversine distance in metres from one point to arrays of points."""
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lons - lon)
+    a = np.sin(dp / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * SPHERE_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PlaceStore:
+    """Array-backed copy of ``places`` with a uniform lon/lat grid.
+
+    Coordinates, rating, creation time and interned category codes live in
+    NumPy arrays indexed by slot; each place's JSON body and export Feature
+    are kept pre-encoded, so responses are joined bytes. The grid is a sorted array of cell keys
+    over a snapshot of the slots (CSR layout: one ``searchsorted`` per grid
+    column of a query box). Places added or moved since the snapshot are kept
+    in a small dirty set scanned on every query; deleted slots are masked
+    out. The grid is rebuilt once the dirty set grows past ~1% of places.
+    """
+
+    ARRAYS = (("ids", "int64", 0), ("lon", "float64", 0), ("lat", "float64", 0),
+              ("rating", "float64", -1), ("created", "int64", 0), ("category", "int32", -1),
+              ("alive", "bool", False))
+
+    def __init__(self, cell_deg: float, capacity: int = 1024):
+        self.cell_deg = cell_deg
+        self.rows = math.ceil(180 / cell_deg) + 1
+        self.size = 0
+        for name, dtype, fill in self.ARRAYS:
+            setattr(self, name, np.full(capacity, fill, dtype=dtype))
+        self.bodies: List[Optional[bytes]] = []
+        self.features: List[Optional[bytes]] = []
+        self.slot_of: Dict[int, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.tag_slots: Dict[str, Set[int]] = {}
+        self.slot_tags: List[Tuple[str, ...]] = []
+        self.dirty: Set[int] = set()
+        self.cell_keys = np.empty(0, dtype="int64")
+        self.cell_slots = np.empty(0, dtype="int64")
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+    # --- writes ---------------------------------------------------------
+
+    def _grow(self) -> None:
+        capacity = len(self.ids) * 2
+        for name, dtype, fill in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def upsert(self, row) -> None:
+        place = row_to_place(row)
+        slot = self.slot_of.get(place["id"])
+        if slot is None:
+            if self.size == len(self.ids):
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self.bodies.append(None)
+            self.features.append(None)
+            self.slot_tags.append(())
+            self.slot_of[place["id"]] = slot
+            self.dirty.add(slot)
+        elif (self.lon[slot], self.lat[slot]) != (row["lon"], row["lat"]):
+            self.dirty.add(slot)
+        self.ids[slot] = place["id"]
+        self.lon[slot] = row["lon"]
+        self.lat[slot] = row["lat"]
+        self.rating[slot] = place["avg_rating"] if place["avg_rating"] is not None else -1
+        self.created[slot] = _micros(place["created_at"])
+        self.category[slot] = self.categories.setdefault(place["category"], len(self.categories))
+        self.alive[slot] = True
+        self._set_tags(slot, tuple(set(place["tags"])))
+        self.bodies[slot] = orjson.dumps(place)
+        self.features[slot] = encode_feature(place)
+
+    def remove(self, place_id: int) -> None:
+        slot = self.slot_of.pop(place_id, None)
+        if slot is None:
+            return
+        self.alive[slot] = False
+        self.bodies[slot] = None
+        self.features[slot] = None
+        self._set_tags(slot, ())
+        self.dirty.discard(slot)
+
+    def _set_tags(self, slot: int, tags: Tuple[str, ...]) -> None:
+        for tag in self.slot_tags[slot]:
+            members = self.tag_slots.get(tag)
+            if members is not None:
+                members.discard(slot)
+        for tag in tags:
+            self.tag_slots.setdefault(tag, set()).add(slot)
+        self.slot_tags[slot] = tags
+
+    def _cell_x(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell_deg).astype("int64")
+
+    def _cell_y(self, lat):
+        return np.floor((np.asarray(lat) + 90) / self.cell_deg).astype("int64")
+
+    def rebuild_grid(self) -> None:
+        slots = np.flatnonzero(self.alive[: self.size])
+        keys = self._cell_x(self.lon[slots]) * self.rows + self._cell_y(self.lat[slots])
+        order = np.argsort(keys, kind="stable")
+        self.cell_keys = keys[order]
+        self.cell_slots = slots[order]
+        self.dirty.clear()
+
+    def maybe_rebuild(self) -> None:
+        if len(self.dirty) > max(1000, len(self) // 100):
+            self.rebuild_grid()
+
+    # --- reads ----------------------------------------------------------
+
+    def _box_slots(self, *boxes: Tuple[float, float, float, float]):
+        """Live slots that may lie in any of the boxes (grid cells plus the dirty set); callers filter exactly."""
+        ranges = []
+        for lon1, lat1, lon2, lat2 in boxes:
+            cx1, cx2 = (int(v) for v in self._cell_x([max(lon1, -180.0), min(lon2, 180.0)]))
+            cy1, cy2 = (int(v) for v in self._cell_y([max(lat1, -90.0), min(lat2, 90.0)]))
+            ranges.append((cx1, cx2, cy1, cy2))
+        if sum(cx2 - cx1 + 1 for cx1, cx2, _, _ in ranges) > MAX_SCAN_COLUMNS:
+            return np.flatnonzero(self.alive[: self.size])
+        parts = []
+        for cx1, cx2, cy1, cy2 in ranges:
+            for cx in range(cx1, cx2 + 1):
+                lo = np.searchsorted(self.cell_keys, cx * self.rows + cy1, "left")
+                hi = np.searchsorted(self.cell_keys, cx * self.rows + cy2, "right")
+                if hi > lo:
+                    parts.append(self.cell_slots[lo:hi])
+        if self.dirty:
+            parts.append(np.fromiter(self.dirty, dtype="int64", count=len(self.dirty)))
+        if not parts:
+            return np.empty(0, dtype="int64")
+        slots = np.unique(np.concatenate(parts)) if self.dirty or len(ranges) > 1 else np.concatenate(parts)
+        return slots[self.alive[slots]]
+
+    def _filter(self, slots, filters: Filters):
+        category, tag, min_rating = filters
+        if category is not None:
+            code = self.categories.get(category)
+            slots = slots[self.category[slots] == code] if code is not None else slots[:0]
+        if min_rating is not None:
+            slots = slots[self.rating[slots] >= min_rating]
+        if tag is not None:
+            members = self.tag_slots.get(tag, ())
+            slots = slots[np.fromiter((s in members for s in slots.tolist()), dtype=bool, count=len(slots))]
+        return slots
+
+    def _radius_boxes(self, lon: float, lat: float, radius_m: float) -> List[Tuple[float, float, float, float]]:
+        """Boxes covering the circle; one that crosses the antimeridian is split in two at ±180."""
+        dlat = radius_m / M_PER_DEG
+        dlon = radius_m / (M_PER_DEG * max(math.cos(math.radians(min(abs(lat) + dlat, 90.0))), 1e-6))
+        if dlat >= 90 or dlon >= 180:
+            return [(-180.0, -90.0, 180.0, 90.0)]
+        lat1, lat2 = lat - dlat, lat + dlat
+        if lon - dlon < -180.0:
+            return [(-180.0, lat1, lon + dlon, lat2), (lon - dlon + 360.0, lat1, 180.0, lat2)]
+        if lon + dlon > 180.0:
+            return [(lon - dlon, lat1, 180.0, lat2), (-180.0, lat1, lon + dlon - 360.0, lat2)]
+        return [(lon - dlon, lat1, lon + dlon, lat2)]
+
+    def within(self, lon: float, lat: float, radius_m: float, filters: Filters):
+        """``(slots, distances)`` of places within ``radius_m`` of the point."""
+        slots = self._filter(self._box_slots(*self._radius_boxes(lon, lat, radius_m)), filters)
+        distances = sphere_distance(lon, lat, self.lon[slots], self.lat[slots])
+        keep = distances <= radius_m
+        return slots[keep], distances[keep]
+
+    def in_bbox(self, lon1: float, lat1: float, lon2: float, lat2: float, filters: Filters):
+        # Corners in any order, like ST_MakeEnvelope; no wrapping, the SQL path has none either.
+        lon1, lon2 = min(lon1, lon2), max(lon1, lon2)
+        lat1, lat2 = min(lat1, lat2), max(lat1, lat2)
+        slots = self._filter(self._box_slots((lon1, lat1, lon2, lat2)), filters)
+        lons, lats = self.lon[slots], self.lat[slots]
+        return slots[(lons >= lon1) & (lons <= lon2) & (lats >= lat1) & (lats <= lat2)]
+
+    def sort_keys(self, column: str, slots, distances):
+        if column == "distance_m":
+            return distances
+        if column == "created_at":
+            return self.created[slots]
+        if column == "rating_key":
+            return self.rating[slots]
+        return self.ids[slots]
+
+    def cursor_value(self, column: str, value: Any) -> Any:
+        return _micros(value) if column == "created_at" else value
+
+    def result(self, slot: int, distance: Optional[float]) -> Dict[str, Any]:
+        return {
+            "id": int(self.ids[slot]),
+            "slot": slot,
+            "distance_m": distance,
+            "created_at": _datetime(self.created[slot]),
+            "rating_key": float(self.rating[slot]),
+        }
+
+
+def page(
+    store: PlaceStore,
+    slots,
+    distances,
+    columns: Sequence[str],
+    descending: bool,
+    after: Optional[Sequence[Any]],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Keyset page over ``(columns..., id)`` with the semantics of the SQL row comparison."""
+    keys = [store.sort_keys(c, slots, distances) for c in columns]
+    if after is not None:
+        values = [store.cursor_value(c, v) for c, v in zip(columns, after)]
+        beyond = (lambda k, v: k < v) if descending else (lambda k, v: k > v)
+        mask = beyond(keys[-1], values[-1])
+        for key, value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+            mask = beyond(key, value) | ((key == value) & mask)
+        slots, distances, keys = slots[mask], distances[mask], [k[mask] for k in keys]
+    order = np.lexsort([-k if descending else k for k in reversed(keys)])[:limit]
+    return [store.result(int(slots[i]), float(distances[i])) for i in order]
+
+
+class SpatialIndex:
+    """Optional in-process copy of ``places`` answering radius, nearest and bbox queries without SQL.
+
+    Loaded at startup over a dedicated connection that LISTENs on
+    ``places_changes`` (statement-level triggers send the changed ids, or
+    ``*`` for large statements). Every SPATIAL_INDEX_SYNC_INTERVAL seconds,
+    or sooner after a notification, the changed rows are re-read and the
+    primary's WAL position recorded: everything committed before it is in the
+    index. Handlers ask :meth:`serving` first and use PostGIS when it says no:
+    while loading, after losing the connection or falling behind, and in
+    ``session`` consistency whenever the client's read-your-writes cookie is
+    newer than the index.
+    """
+
+    def __init__(self, enabled: bool, cell_deg: float, consistency_mode: str, sync_interval: float):
+        self.enabled = enabled and np is not None
+        self.requested = enabled
+        self.cell_deg = cell_deg
+        self.consistency_mode = consistency_mode
+        self.sync_interval = sync_interval
+        self.store: Optional[PlaceStore] = None
+        self.lsn = 0
+        self.synced_at = 0.0
+        self._connected = False
+        self._pending: Set[int] = set()
+        self._reload = True
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def tracks_writes(self) -> bool:
+        """Whether writes must report their LSN (read-your-writes cookie) for this index."""
+        return self.enabled and self.consistency_mode == "session"
+
+    @property
+    def ready(self) -> bool:
+        # Falling several sync rounds behind means the listener is stuck; PostGIS is then fresher.
+        stale_after = max(5 * self.sync_interval, 5.0)
+        return self.store is not None and self._connected and time.monotonic() - self.synced_at < stale_after
+
+    def serving(self, query: str) -> bool:
+        """True if ``query`` may be answered from memory now; counts the decision either way."""
+        if not self.enabled:
+            return False
+        use = self.ready and (self.consistency_mode == "eventual" or consistency.required_lsn() <= self.lsn)
+        metrics.SPATIAL_INDEX_QUERIES.labels(query, "memory" if use else "postgis").inc()
+        return use
+
+    # --- answering ------------------------------------------------------
+
+    def nearby(
+        self,
+        lon: float,
+        lat: float,
+        limit: int,
+        filters: Filters,
+        max_radius_m: Optional[float],
+        after: Optional[Sequence[Any]],
+    ) -> List[Dict[str, Any]]:
+        """Nearest places by (distance_m, id): search radius grows until ``limit`` places fit in it."""
+        store = self.store
+        radius = max(self.cell_deg * M_PER_DEG, float(after[0]) if after else 0.0)
+        limit_radius = max_radius_m if max_radius_m is not None else math.pi * SPHERE_RADIUS_M
+        while True:
+            radius = min(radius, limit_radius)
+            slots, distances = store.within(lon, lat, radius, filters)
+            rows = page(store, slots, distances, ["distance_m", "id"], False, after, limit)
+            # Everything closer than `radius` was a candidate, so a full page inside it is final.
+            if len(rows) >= limit or radius >= limit_radius:
+                return rows
+            radius *= 4
+
+    def within(
+        self,
+        lon: float,
+        lat: float,
+        radius_m: float,
+        columns: Sequence[str],
+        descending: bool,
+        after: Optional[Sequence[Any]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        store = self.store
+        slots, distances = store.within(lon, lat, radius_m, (None, None, None))
+        return page(store, slots, distances, columns, descending, after, limit)
+
+    def distance(self, place_id: int, lon: float, lat: float) -> Optional[float]:
+        store = self.store
+        slot = store.slot_of.get(place_id)
+        if slot is None:
+            return None
+        return float(sphere_distance(lon, lat, store.lon[slot : slot + 1], store.lat[slot : slot + 1])[0])
+
+    async def bbox_features(
+        self, lon1: float, lat1: float, lon2: float, lat2: float, filters: Filters
+    ) -> AsyncIterator[bytes]:
+        """Pre-encoded export Features of the places in the bbox, one at a time."""
+        store = self.store
+        for slot in store.in_bbox(lon1, lat1, lon2, lat2, filters).tolist():
+            feature = store.features[slot]
+            if feature is not None:  # removed by a sync since the bbox was scanned
+                yield feature
+
+    def render(self, rows: Iterable[Dict[str, Any]], extra: Sequence[str] = ()) -> bytes:
+        """JSON array of the rows' place bodies, with ``extra`` result fields appended to each."""
+        store = self.store
+        parts = []
+        for row in rows:
+            body = store.bodies[row["slot"]]
+            if extra:
+                body = body[:-1] + b"," + orjson.dumps({k: row[k] for k in extra})[1:]
+            parts.append(body)
+        return b"[" + b",".join(parts) + b"]"
+
+    # --- sync -----------------------------------------------------------
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        if payload == RELOAD_ALL:
+            self._reload = True
+        else:
+            try:
+                self._pending.update(int(v) for v in payload.split(","))
+            except ValueError:
+                logger.warning("Ignoring malformed %s payload: %r", CHANNEL, payload)
+                return
+        self._wake.set()
+
+    def _build(self, rows: Sequence[asyncpg.Record]) -> PlaceStore:
+        store = PlaceStore(self.cell_deg, capacity=max(1024, len(rows) * 2))
+        for row in rows:
+            store.upsert(row)
+        store.rebuild_grid()
+        return store
+
+    async def _load(self, conn: asyncpg.Connection) -> None:
+        self._reload = False
+        self._pending.clear()
+        started = time.perf_counter()
+        with metrics.query_name("spatial_index_load"):
+            lsn = await conn.fetchval(CURRENT_LSN_SQL)
+            rows = await conn.fetch(LOAD_SQL)
+        # Built off the event loop: requests keep being served (from the old copy or PostGIS).
+        store = await asyncio.to_thread(self._build, rows)
+        self.store, self.lsn, self.synced_at = store, lsn, time.monotonic()
+        logger.info("Spatial index loaded %d places in %.1fs", len(store), time.perf_counter() - started)
+
+    async def _sync(self, conn: asyncpg.Connection) -> None:
+        # Notifications are delivered before the result of any later statement on this
+        # connection, so after this SELECT every commit up to `lsn` is in _pending.
+        with metrics.query_name("spatial_index_sync"):
+            lsn = await conn.fetchval(CURRENT_LSN_SQL)
+            if self._reload:
+                await self._load(conn)
+                return
+            ids, self._pending = list(self._pending), set()
+            rows = await conn.fetch(ROWS_SQL, ids) if ids else []
+        store = self.store
+        found = set()
+        for row in rows:
+            store.upsert(row)
+            found.add(row["id"])
+        for place_id in ids:
+            if place_id not in found:
+                store.remove(place_id)
+        store.maybe_rebuild()
+        self.lsn, self.synced_at = lsn, time.monotonic()
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await connect_primary()
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                # Changes missed while disconnected are unknown: start from a fresh copy.
+                self._reload = True
+                delay = 1.0
+                while not lost.is_set():
+                    await self._sync(conn)
+                    self._connected = True
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.sync_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                logger.warning("Spatial index listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Spatial index sync failed (%s), retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                self._connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    def start(self) -> None:
+        if self.requested and np is None:
+            logger.error("SPATIAL_INDEX_ENABLED is set but numpy is not installed; using PostGIS only")
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        store = self.store
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "consistency": self.consistency_mode,
+            "places": len(store) if store is not None else 0,
+            "dirty": len(store.dirty) if store is not None else 0,
+            "lsn": self.lsn,
+        }
+
+
+_settings = get_settings()
+spatial_index = SpatialIndex(
+    enabled=_settings.spatial_index_enabled,
+    cell_deg=_settings.spatial_index_cell_deg,
+    consistency_mode=_settings.spatial_index_consistency,
+    sync_interval=_settings.spatial_index_sync_interval,
+)
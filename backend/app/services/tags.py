@@ -0,0 +1,58 @@
+from typing import Any, List, Optional
+
+from app.async_db import after_commit
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+_settings = get_settings()
+tag_cache = TTLCache(maxsize=_settings.tag_cache_size, ttl=_settings.tag_cache_ttl)
+
+
+def invalidate_tags() -> None:
+    """Forget memoized tag lists now and once the request transaction commits.
+
+    A ``/places/tags`` read between the two would otherwise put pre-commit
+    tags back, and the post-commit response-cache bump would rebuild from them.
+    """
+    tag_cache.clear()
+    after_commit(tag_cache.clear)
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def autocomplete_tags(conn, search: Optional[str], category: Optional[str], limit: int) -> List[str]:
+    """Most used tags (optionally within a category); with ``search``, prefix matches rank first.
+
+    Reads the trigger-maintained tag dictionary, never ``places`` itself, and
+    memoizes answers in-process for a short TTL.
+    """
+    key = ((search or "").lower(), category, limit)
+    cached = tag_cache.get(key)
+    if cached is not None:
+        return cached
+    table = "tag_category_counts" if category else "tag_dictionary"
+    params: List[Any] = []
+    clauses = ["usage_count > 0"]
+    order = "usage_count DESC, tag"
+    if category:
+        params.append(category)
+        clauses.append(f"category = ${len(params)}")
+    if search:
+        escaped = _escape_like(search.lower())
+        params.extend([f"%{escaped}%", f"{escaped}%"])
+        clauses.append(f"tag ILIKE ${len(params) - 1}")
+        order = f"lower(tag) LIKE ${len(params)} DESC, {order}"
+    params.append(limit)
+    sql = f"""
+        SELECT tag
+        FROM {table}
+        WHERE {' AND '.join(clauses)}
+        ORDER BY {order}
+        LIMIT ${len(params)};
+    """
+    rows = await conn.fetch(sql, *params)
+    tags = [r["tag"] for r in rows]
+    tag_cache.set(key, tags)
+    return tags
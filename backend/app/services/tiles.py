@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import math
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.async_db import after_commit
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.services.places import place_filter_clauses
+
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+
+def lonlat_to_tile_fraction(lon: float, lat: float, z: int) -> Tuple[float, float]:
+    """Fractional web-mercator tile coordinates of a point at zoom ``z``."""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def covering_tiles(lon: float, lat: float, z: int) -> List[Tuple[int, int, int]]:
+    """Tiles at zoom ``z`` whose buffered extent contains the point (1 to 4 tiles)."""
+    n = 2 ** z
+    fx, fy = lonlat_to_tile_fraction(lon, lat, z)
+    margin = TILE_BUFFER / TILE_EXTENT
+    xs = {min(max(int(math.floor(v)), 0), n - 1) for v in (fx - margin, fx, fx + margin)}
+    ys = {min(max(int(math.floor(v)), 0), n - 1) for v in (fy - margin, fy, fy + margin)}
+    return [(z, x, y) for x in xs for y in ys]
+
+
+def tile_columns(z: int) -> str:
+    """Feature attributes for a zoom level: low zooms only carry what styling needs."""
+    columns = ["p.id", "p.category"]
+    if z >= 12:
+        columns += ["p.name", "p.avg_rating::float8 AS avg_rating"]
+    if z >= 15:
+        columns += ["p.address", "array_to_string(p.tags, ',') AS tags"]
+    return ", ".join(columns)
+
+
+def filters_key(filters: Dict[str, Any]) -> str:
+    raw = "&".join(f"{k}={filters[k]}" for k in sorted(filters) if filters[k] is not None)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16] if raw else "all"
+
+
+class TileCache:
+    """Two-level MVT cache: LRU in memory, optional files under ``directory``.
+
+    Entries are keyed by (z, x, y, filters) so a write can drop every filter
+    variant of the tiles covering the changed point. Files are read, written
+    and removed in a worker thread and expire after ``ttl`` like the memory
+    entries, which also bounds how long a tile rendered by another worker
+    before a write stays served. Invalidation runs at once and again after
+    the request transaction commits, since a tile rendered from the
+    pre-commit snapshot in between would otherwise be cached as current.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, directory: Optional[str] = None):
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.directory = directory or None
+
+    def _tile_dir(self, z: int, x: int, y: int) -> str:
+        return os.path.join(self.directory, str(z), str(x), str(y))
+
+    async def get(self, z: int, x: int, y: int, fkey: str) -> Optional[bytes]:
+        data = self.memory.get((z, x, y, fkey))
+        if data is not None or not self.directory:
+            return data
+        path = os.path.join(self._tile_dir(z, x, y), f"{fkey}.mvt")
+        data = await asyncio.to_thread(_read_fresh, path, self.ttl)
+        if data is not None:
+            self.memory.set((z, x, y, fkey), data)
+        return data
+
+    async def set(self, z: int, x: int, y: int, fkey: str, data: bytes) -> None:
+        self.memory.set((z, x, y, fkey), data)
+        if self.directory:
+            await asyncio.to_thread(_write_atomic, self._tile_dir(z, x, y), f"{fkey}.mvt", data)
+
+    async def invalidate_point(self, lon: float, lat: float) -> None:
+        """Drop every cached tile (all zooms, all filters) that can contain the point."""
+        tiles = set()
+        for z in range(MAX_ZOOM + 1):
+            tiles.update(covering_tiles(lon, lat, z))
+        await self._drop_tiles(tiles)
+        after_commit(lambda: self._drop_tiles(tiles))
+
+    async def _drop_tiles(self, tiles: Set[Tuple[int, int, int]]) -> None:
+        self.memory.pop_where(lambda key: key[:3] in tiles)
+        if self.directory:
+            await asyncio.to_thread(_remove_dirs, [self._tile_dir(z, x, y) for z, x, y in tiles])
+            self.memory.pop_where(lambda key: key[:3] in tiles)
+
+    async def clear(self) -> None:
+        await self._clear()
+        after_commit(self._clear)
+
+    async def _clear(self) -> None:
+        self.memory.clear()
+        if self.directory:
+            await asyncio.to_thread(_remove_dirs, [self.directory])
+            self.memory.clear()
+
+
+def _read_fresh(path: str, ttl: float) -> Optional[bytes]:
+    try:
+        if time.time() - os.stat(path).st_mtime >= ttl:
+            return None
+        with open(path, "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def _write_atomic(directory: str, name: str, data: bytes) -> None:
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _remove_dirs(paths: List[str]) -> None:
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+async def render_tile(conn, z: int, x: int, y: int, filters: Dict[str, Any]) -> bytes:
+    """Build a Mapbox Vector Tile of places via ST_AsMVT; the bbox filter uses idx_places_geom."""
+    params: List[Any] = [z, x, y]
+    clauses = place_filter_clauses(params, alias="p", **filters)
+    extra = "".join(f" AND {c}" for c in clauses)
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope($1, $2, $3) AS env,
+                   ST_Transform(ST_TileEnvelope($1, $2, $3, margin => {TILE_BUFFER / TILE_EXTENT}), 4326) AS bbox
+        ),
+        features AS (
+            SELECT ST_AsMVTGeom(ST_Transform(p.geom, 3857), bounds.env, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                   {tile_columns(z)}
+            FROM places p, bounds
+            WHERE p.geom && bounds.bbox{extra}
+        )
+        SELECT ST_AsMVT(features.*, 'places', {TILE_EXTENT}, 'geom', 'id') FROM features;
+    """
+    data = await conn.fetchval(sql, *params)
+    return bytes(data or b"")
+
+
+_settings = get_settings()
+tile_cache = TileCache(
+    maxsize=_settings.tile_cache_size,
+    ttl=_settings.tile_cache_ttl,
+    directory=_settings.tile_cache_dir,
+)
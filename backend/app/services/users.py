@@ -1,24 +1,73 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Hashable
 
-import psycopg2.extras
+from app.async_db import acquire, after_commit
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 
+settings = get_settings()
 
-def get_user_by_username(conn, username: str) -> Optional[Dict[str, Any]]:
-    sql = "SELECT id, username, password_hash, role, created_at FROM users WHERE username = %s"
-    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (username,))
-        row = cur.fetchone()
-        if row:
-            return dict(row)
+# Resolved principals (user rows without password_hash) keyed by (user_id, token id).
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl)
+
+
+async def get_user_by_username(conn, username: str) -> Optional[Dict[str, Any]]:
+    sql = "SELECT id, username, password_hash, role, created_at FROM users WHERE username = $1"
+    row = await conn.fetchrow(sql, username)
+    if row:
+        return dict(row)
     return None
 
 
-def get_user_by_id(conn, user_id: int) -> Optional[Dict[str, Any]]:
-    sql = "SELECT id, username, password_hash, role, created_at FROM users WHERE id = %s"
-    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute(sql, (user_id,))
-        row = cur.fetchone()
-        if row:
-            return dict(row)
+async def get_user_by_id(conn, user_id: int) -> Optional[Dict[str, Any]]:
+    sql = "SELECT id, username, password_hash, role, created_at FROM users WHERE id = $1"
+    row = await conn.fetchrow(sql, user_id)
+    if row:
+        return dict(row)
     return None
 
+
+async def get_principal(user_id: int, token_id: Hashable) -> Optional[Dict[str, Any]]:
+    """Resolve the user behind a token; a primary connection is borrowed only on a cache miss.
+
+    ``token_id`` None caches the user once for all of their tokens.
+    """
+    key = (user_id, token_id)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+    async with acquire() as conn:
+        user = await get_user_by_id(conn, user_id)
+    if user is None:
+        return None
+    user.pop("password_hash", None)
+    principal_cache.set(key, user)
+    return user
+
+
+def invalidate_principal(user_id: int) -> int:
+    """Forget every cached principal of ``user_id`` (all tokens)."""
+    return principal_cache.pop_where(lambda key: key[0] == user_id)
+
+
+def _invalidate_principal_on_commit(user_id: int) -> None:
+    # Again after commit: a concurrent request may have re-cached the old row
+    # while this transaction was still open.
+    invalidate_principal(user_id)
+    after_commit(lambda: invalidate_principal(user_id))
+
+
+async def update_password_hash(conn, user_id: int, password_hash: str) -> None:
+    await conn.execute("UPDATE users SET password_hash = $2 WHERE id = $1", user_id, password_hash)
+
+
+async def update_user_role(conn, user_id: int, role: str) -> Optional[Dict[str, Any]]:
+    sql = "UPDATE users SET role = $2 WHERE id = $1 RETURNING id, username, role, created_at"
+    row = await conn.fetchrow(sql, user_id, role)
+    _invalidate_principal_on_commit(user_id)
+    return dict(row) if row else None
+
+
+async def delete_user(conn, user_id: int) -> bool:
+    deleted = await conn.fetchval("DELETE FROM users WHERE id = $1 RETURNING id", user_id)
+    _invalidate_principal_on_commit(user_id)
+    return deleted is not None
@@ -0,0 +1,193 @@
+"""Generate a synthetic city dataset as CSV files ready for COPY.
+
+    PYTHONPATH=backend python bench/generate.py --places 100000 --out bench/data
+
+Places are drawn around Zipf-weighted "districts" (gaussian clusters of
+different spread) plus a uniform background, so density varies the way it
+does in a real city. Output: users.csv, places.csv, reviews.csv, routes.csv
+and meta.json (city bounds, districts, vocabulary and credentials the runner
+builds its requests from). Rows are written as they are generated, so memory
+stays flat from 10k to 10M places. Same --seed, same dataset (timestamps are
+relative to the generation time so "recent" queries keep finding rows).
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.services.passwords import hash_password_sync
+
+CENTER = (37.6173, 55.7558)  # lon, lat
+CITY_RADIUS_M = 25_000
+M_PER_DEG_LAT = 111_320.0
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = {
+    "cafe": 20, "restaurant": 15, "shop": 18, "park": 8, "museum": 3, "sport": 6,
+    "viewpoint": 2, "bar": 7, "pharmacy": 6, "school": 5, "theatre": 2, "library": 3,
+}
+ADJECTIVES = ["Уютная", "Старая", "Новая", "Зелёная", "Тихая", "Большая", "Малая", "Северная", "Южная", "Городская"]
+NOUNS = {
+    "cafe": "кофейня", "restaurant": "трапезная", "shop": "лавка", "park": "роща", "museum": "галерея",
+    "sport": "площадка", "viewpoint": "смотровая", "bar": "таверна", "pharmacy": "аптека", "school": "школа",
+    "theatre": "сцена", "library": "читальня",
+}
+STREETS = ["Тверская", "Арбат", "Пятницкая", "Мясницкая", "Остоженка", "Покровка", "Сретенка", "Маросейка",
+           "Лесная", "Садовая", "Полянка", "Ордынка", "Басманная", "Солянка", "Варварка"]
+BASE_TAGS = ["wifi", "coffee", "парковка", "веранда", "детям", "животные", "панорама", "фото", "спорт", "воркаут",
+             "лавочки", "озеро", "24/7", "вегетарианское", "завтраки", "музыка", "доставка", "тихо", "книги", "туалет"]
+HOURS = [
+    {"mon-sun": "00:00-24:00"},
+    {"mon-fri": "08:00-22:00", "sat-sun": "09:00-23:00"},
+    {"mon-fri": "10:00-20:00"},
+    {"mon-sun": "07:00-23:00"},
+    None,
+]
+
+
+class Weighted:
+    def __init__(self, items: Sequence, weights: Sequence[float]):
+        self.items = list(items)
+        self.cum = list(accumulate(weights))
+
+    def pick(self, rnd: random.Random):
+        return self.items[bisect(self.cum, rnd.random() * self.cum[-1])]
+
+
+def offset(lon: float, lat: float, dx_m: float, dy_m: float) -> Tuple[float, float]:
+    return (
+        lon + dx_m / (M_PER_DEG_LAT * math.cos(math.radians(lat))),
+        lat + dy_m / M_PER_DEG_LAT,
+    )
+
+
+def random_in_city(rnd: random.Random) -> Tuple[float, float]:
+    r = CITY_RADIUS_M * math.sqrt(rnd.random())
+    a = rnd.random() * 2 * math.pi
+    return offset(*CENTER, r * math.cos(a), r * math.sin(a))
+
+
+def pg_array(values: List[str]) -> str:
+    return "{" + ",".join('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values) + "}"
+
+
+def generate(args) -> None:
+    rnd = random.Random(args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    started = time.monotonic()
+
+    n_districts = max(20, args.places // 5000)
+    districts = []
+    for _ in range(n_districts):
+        lon, lat = random_in_city(rnd)
+        districts.append((lon, lat, rnd.uniform(300, 2000)))
+    district_pick = Weighted(range(n_districts), [1 / (i + 1) for i in range(n_districts)])
+    tags = BASE_TAGS + [f"тег{i}" for i in range(args.tags - len(BASE_TAGS))]
+    tag_pick = Weighted(tags, [1 / (i + 1) ** 0.8 for i in range(len(tags))])
+    category_pick = Weighted(list(CATEGORIES), list(CATEGORIES.values()))
+
+    def point(rnd: random.Random) -> Tuple[float, float]:
+        if rnd.random() < 0.15:
+            return random_in_city(rnd)
+        lon, lat, sigma = districts[district_pick.pick(rnd)]
+        return offset(lon, lat, rnd.gauss(0, sigma), rnd.gauss(0, sigma))
+
+    # Same cost factor as the server, so bench logins never trigger a rehash-on-login write.
+    password_hash = hash_password_sync(BENCH_PASSWORD, get_settings().password_bcrypt_rounds)
+    with open(os.path.join(args.out, "users.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        for i in range(1, args.users + 1):
+            w.writerow([i, f"bench_user_{i}", password_hash, "admin" if i == 1 else "user"])
+
+    n_reviews = 0
+    with open(os.path.join(args.out, "places.csv"), "w", newline="") as fp, \
+            open(os.path.join(args.out, "reviews.csv"), "w", newline="") as fr:
+        wp, wr = csv.writer(fp), csv.writer(fr)
+        for pid in range(1, args.places + 1):
+            category = category_pick.pick(rnd)
+            lon, lat = point(rnd)
+            place_tags = sorted({tag_pick.pick(rnd) for _ in range(rnd.randint(0, 5))})
+            hours = rnd.choice(HOURS)
+            created = now - timedelta(seconds=rnd.uniform(0, 365 * 86400))
+            wp.writerow([
+                pid,
+                f"{rnd.choice(ADJECTIVES)} {NOUNS[category]} {pid}",
+                category,
+                f"{NOUNS[category].capitalize()} рядом с улицей {rnd.choice(STREETS)}" if rnd.random() < 0.7 else "",
+                f"{rnd.choice(STREETS)}, {rnd.randint(1, 120)}",
+                pg_array(place_tags),
+                json.dumps(hours, ensure_ascii=False) if hours else "",
+                f"SRID=4326;POINT({lon:.7f} {lat:.7f})",
+                "t" if rnd.random() < 0.95 else "f",
+                created.isoformat(),
+            ])
+            # Geometric number of reviews with the requested mean.
+            count = int(math.log(1 - rnd.random()) / math.log(1 - 1 / (args.reviews_per_place + 1)))
+            for _ in range(count):
+                rating = min(5.0, max(0.0, round(rnd.gauss(4.1, 0.8), 1)))
+                wr.writerow([pid, rnd.randint(1, args.users), rating, "Отзыв" if rnd.random() < 0.5 else "",
+                             (created + timedelta(days=rnd.uniform(0, 30))).isoformat()])
+            n_reviews += count
+
+    with open(os.path.join(args.out, "routes.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        for i in range(1, args.routes + 1):
+            lon, lat = point(rnd)
+            coords = [(lon, lat)]
+            for _ in range(rnd.randint(1, 14)):
+                lon, lat = offset(lon, lat, rnd.uniform(-400, 400), rnd.uniform(-400, 400))
+                coords.append((lon, lat))
+            wkt = ", ".join(f"{x:.7f} {y:.7f}" for x, y in coords)
+            w.writerow([rnd.randint(1, args.users), f"Маршрут {i}", f"SRID=4326;LINESTRING({wkt})",
+                        (now - timedelta(seconds=rnd.uniform(0, 180 * 86400))).isoformat()])
+
+    meta = {
+        "seed": args.seed,
+        "places": args.places,
+        "reviews": n_reviews,
+        "users": args.users,
+        "routes": args.routes,
+        "center": CENTER,
+        "radius_m": CITY_RADIUS_M,
+        "districts": [[round(lon, 6), round(lat, 6), round(s)] for lon, lat, s in districts],
+        "categories": list(CATEGORIES),
+        "tags": tags,
+        "words": ADJECTIVES + list(NOUNS.values()) + STREETS,
+        "password": BENCH_PASSWORD,
+        "admin_user": "bench_user_1",
+    }
+    with open(os.path.join(args.out, "meta.json"), "w") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(
+        f"{args.places} places, {n_reviews} reviews, {args.users} users, {args.routes} routes "
+        f"in {time.monotonic() - started:.1f}s -> {args.out}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, default=100_000, help="10k .. 10M")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--routes", type=int, help="default: places / 10")
+    parser.add_argument("--reviews-per-place", type=float, default=3.0, help="mean, geometric distribution")
+    parser.add_argument("--tags", type=int, default=300, help="vocabulary size (Zipf popularity)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "data"))
+    args = parser.parse_args()
+    if args.routes is None:
+        args.routes = max(1, args.places // 10)
+    args.tags = max(args.tags, len(BASE_TAGS))
+    generate(args)
+
+
+if __name__ == "__main__":
+    main()
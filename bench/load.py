@@ -0,0 +1,103 @@
+"""Load a dataset written by bench/generate.py into PostGIS (replaces all data).
+
+    PYTHONPATH=backend python bench/load.py --data bench/data [--init]
+
+Connects with the app's DB_* settings. Tables are truncated, filled with
+COPY (the per-row tag dictionary trigger is disabled meanwhile), then the
+derived data the triggers and write paths normally maintain is rebuilt in
+bulk: tag dictionary, rating aggregates, id sequences, then ANALYZE so the
+first benchmark run sees real statistics.
+"""
+import argparse
+import os
+import time
+
+import psycopg2
+
+from app.db import close_pool, get_db_conn
+
+INIT_SQL = os.path.join(os.path.dirname(__file__), "..", "db", "init.sql")
+
+COPIES = [
+    ("users", "users (id, username, password_hash, role)"),
+    ("places", "places (id, name, category, description, address, tags, hours, geom, is_moderated, created_at)"),
+    ("reviews", "reviews (place_id, user_id, rating, text, created_at)"),
+    ("routes", "routes (user_id, name, geom, created_at)"),
+]
+
+REBUILD_SQL = [
+    ("tag dictionary", """
+        INSERT INTO tag_dictionary (tag, usage_count)
+        SELECT tag, COUNT(*) FROM places CROSS JOIN LATERAL (SELECT DISTINCT UNNEST(tags) AS tag) t GROUP BY tag;
+        INSERT INTO tag_category_counts (tag, category, usage_count)
+        SELECT tag, category, COUNT(*) FROM places CROSS JOIN LATERAL (SELECT DISTINCT UNNEST(tags) AS tag) t
+        GROUP BY tag, category;
+    """),
+    ("rating aggregates", """
+        UPDATE places p
+        SET rating_sum = r.rating_sum, rating_count = r.rating_count,
+            avg_rating = ROUND(r.rating_sum / r.rating_count, 2)
+        FROM (SELECT place_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count FROM reviews GROUP BY place_id) r
+        WHERE p.id = r.place_id;
+    """),
+    ("sequences", """
+        SELECT setval(pg_get_serial_sequence('users', 'id'), COALESCE((SELECT MAX(id) FROM users), 1));
+        SELECT setval(pg_get_serial_sequence('places', 'id'), COALESCE((SELECT MAX(id) FROM places), 1));
+    """),
+    ("analyze", "ANALYZE users, places, reviews, routes, tag_dictionary, tag_category_counts;"),
+]
+
+
+def _step(label: str, started: float, rows: int = -1) -> None:
+    elapsed = time.monotonic() - started
+    rate = f", {rows / elapsed:,.0f} rows/s" if rows >= 0 and elapsed > 0 else ""
+    print(f"{label:<20} {elapsed:8.1f}s{rate}", flush=True)
+
+
+def load(data_dir: str, init: bool) -> None:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            if init:
+                started = time.monotonic()
+                with open(INIT_SQL, encoding="utf-8") as f:
+                    cur.execute(f.read())
+                _step("init.sql", started)
+            started = time.monotonic()
+            cur.execute(
+                "TRUNCATE place_ratings, reviews, routes, places, users, tag_dictionary, tag_category_counts "
+                "RESTART IDENTITY CASCADE"
+            )
+            cur.execute("ALTER TABLE places DISABLE TRIGGER USER")
+            _step("truncate", started)
+            for name, target in COPIES:
+                started = time.monotonic()
+                with open(os.path.join(data_dir, f"{name}.csv"), encoding="utf-8") as f:
+                    cur.copy_expert(f"COPY {target} FROM STDIN WITH (FORMAT csv)", f)
+                _step(f"copy {name}", started, cur.rowcount)
+            cur.execute("ALTER TABLE places ENABLE TRIGGER USER")
+            for label, sql in REBUILD_SQL:
+                started = time.monotonic()
+                cur.execute(sql)
+                _step(label, started)
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+            except psycopg2.Error as exc:
+                conn.rollback()
+                print(f"pg_stat_statements unavailable, runs will not report DB time: {str(exc).strip()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=os.path.join(os.path.dirname(__file__), "data"))
+    parser.add_argument("--init", action="store_true", help="run db/init.sql first (fresh database)")
+    args = parser.parse_args()
+    try:
+        load(args.data, args.init)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+"""Drive every API endpoint with concurrent clients and report latency, throughput and DB time.
+
+    PYTHONPATH=backend python bench/run.py --base-url http://localhost:8000 --concurrency 16 --duration 10
+    PYTHONPATH=backend python bench/run.py --save-baseline main-100k
+    PYTHONPATH=backend python bench/run.py --compare main-100k --tolerance 0.15
+
+Run against a database filled by bench/load.py: requests are built from the
+dataset's meta.json (districts, vocabulary, credentials). Scenarios run one
+after another, each with ``--concurrency`` clients for ``--duration`` seconds
+after a short warmup. Per scenario: p50/p95/p99 latency, requests/s, error
+count and, when pg_stat_statements is installed, database execution time and
+statement count per request (delta of pg_stat_statements over the scenario,
+so nothing else should use the database meanwhile).
+
+Write scenarios (``--writes``) change the dataset; they only delete rows the
+run itself created. DELETE /users is never exercised.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+import httpx
+
+from app.core.config import get_settings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+M_PER_DEG_LAT = 111_320.0
+
+DB_TIME_SQL = """
+    SELECT COALESCE(SUM(total_exec_time), 0)::float8 AS exec_ms, COALESCE(SUM(calls), 0)::int8 AS calls
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND query NOT LIKE '%pg_stat_statements%';
+"""
+
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+class Context:
+    """Dataset description plus state shared by scenarios (tokens, rows created by the run)."""
+
+    def __init__(self, meta: Dict[str, Any]):
+        self.meta = meta
+        self.tokens: Dict[str, str] = {}
+        self.created_places: List[int] = []
+        self.created_reviews: List[Tuple[int, int]] = []
+
+    def point(self, rnd: random.Random) -> Tuple[float, float]:
+        """A query location: mostly near a district (where the data is dense), sometimes anywhere."""
+        if rnd.random() < 0.2:
+            lon, lat = self.meta["center"]
+            spread = self.meta["radius_m"] / 2
+        else:
+            lon, lat, spread = rnd.choice(self.meta["districts"])
+        return offset(lon, lat, rnd.gauss(0, spread), rnd.gauss(0, spread))
+
+    def bbox(self, rnd: random.Random, half_m: float) -> str:
+        lon, lat = self.point(rnd)
+        lon1, lat1 = offset(lon, lat, -half_m, -half_m)
+        lon2, lat2 = offset(lon, lat, half_m, half_m)
+        return f"{lon1:.6f},{lat1:.6f},{lon2:.6f},{lat2:.6f}"
+
+    def place_id(self, rnd: random.Random) -> int:
+        return rnd.randint(1, self.meta["places"])
+
+    def auth(self, who: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[who]}"}
+
+
+def offset(lon: float, lat: float, dx_m: float, dy_m: float) -> Tuple[float, float]:
+    return (
+        lon + dx_m / (M_PER_DEG_LAT * math.cos(math.radians(lat))),
+        lat + dy_m / M_PER_DEG_LAT,
+    )
+
+
+def tile_of(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        build: Callable[[random.Random, Context], Optional[Request]],
+        write: bool = False,
+        after: Optional[Callable[[httpx.Response, Context], None]] = None,
+    ):
+        self.name = name
+        self.build = build
+        self.write = write
+        self.after = after
+
+
+def _q(**params: Any) -> Dict[str, Any]:
+    return {"params": {k: v for k, v in params.items() if v is not None}}
+
+
+def _filters(rnd: random.Random, ctx: Context) -> Dict[str, Any]:
+    roll = rnd.random()
+    if roll < 0.3:
+        return {"category": rnd.choice(ctx.meta["categories"])}
+    if roll < 0.5:
+        return {"tag": rnd.choice(ctx.meta["tags"][:50])}
+    if roll < 0.6:
+        return {"min_rating": 4}
+    return {}
+
+
+def _near(rnd: random.Random, ctx: Context, **extra: Any) -> Dict[str, Any]:
+    lon, lat = ctx.point(rnd)
+    return _q(lat=round(lat, 6), lon=round(lon, 6), **extra)
+
+
+def _square(rnd: random.Random, ctx: Context, half_m: float) -> Dict[str, Any]:
+    lon, lat = ctx.point(rnd)
+    ring = [offset(lon, lat, dx * half_m, dy * half_m) for dx, dy in ((-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1))]
+    return {"type": "Polygon", "coordinates": [[[round(x, 6), round(y, 6)] for x, y in ring]]}
+
+
+def _tile(rnd: random.Random, ctx: Context) -> Request:
+    z = rnd.choice([12, 13, 14, 15])
+    x, y = tile_of(*ctx.point(rnd), z)
+    return "GET", f"/places/tiles/{z}/{x}/{y}.mvt", _q(**_filters(rnd, ctx))
+
+
+def _place_payload(rnd: random.Random, ctx: Context) -> Dict[str, Any]:
+    lon, lat = ctx.point(rnd)
+    return {
+        "name": f"Bench place {uuid.uuid4().hex[:8]}",
+        "category": rnd.choice(ctx.meta["categories"]),
+        "description": "Создано бенчмарком",
+        "tags": rnd.sample(ctx.meta["tags"][:50], 2),
+        "lat": round(lat, 6),
+        "lon": round(lon, 6),
+    }
+
+
+def _import_body(rnd: random.Random, ctx: Context) -> bytes:
+    lines = []
+    for _ in range(100):
+        record = _place_payload(rnd, ctx)
+        record["external_id"] = f"bench-{uuid.uuid4().hex}"
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return "\n".join(lines).encode()
+
+
+def _route_payload(rnd: random.Random, ctx: Context) -> Dict[str, Any]:
+    lon, lat = ctx.point(rnd)
+    points = [[lon, lat]]
+    for _ in range(rnd.randint(2, 10)):
+        lon, lat = offset(lon, lat, rnd.uniform(-300, 300), rnd.uniform(-300, 300))
+        points.append([round(lon, 6), round(lat, 6)])
+    return {"name": f"Bench route {uuid.uuid4().hex[:8]}", "points": points}
+
+
+def _pop(items: List[Any]) -> Optional[Any]:
+    return items.pop() if items else None
+
+
+def _remember_place(resp: httpx.Response, ctx: Context) -> None:
+    if resp.status_code == 200:
+        ctx.created_places.append(resp.json()["id"])
+
+
+def _remember_review(resp: httpx.Response, ctx: Context) -> None:
+    if resp.status_code == 200:
+        body = resp.json()
+        ctx.created_reviews.append((body["place_id"], body["review_id"]))
+
+
+def _created_place(ctx: Context, rnd: random.Random) -> Optional[int]:
+    return rnd.choice(ctx.created_places) if ctx.created_places else None
+
+
+def _review_update(rnd: random.Random, ctx: Context) -> Optional[Request]:
+    if not ctx.created_reviews:
+        return None
+    place_id, review_id = rnd.choice(ctx.created_reviews)
+    return "PUT", f"/places/{place_id}/reviews/{review_id}", {"json": {"rating": rnd.randint(0, 50) / 10}}
+
+
+def _review_delete(rnd: random.Random, ctx: Context) -> Optional[Request]:
+    review = _pop(ctx.created_reviews)
+    return None if review is None else ("DELETE", f"/places/{review[0]}/reviews/{review[1]}", {})
+
+
+def _place_update(rnd: random.Random, ctx: Context) -> Optional[Request]:
+    place_id = _created_place(ctx, rnd)
+    if place_id is None:
+        return None
+    payload = {"description": f"Обновлено {uuid.uuid4().hex[:6]}", "tags": rnd.sample(ctx.meta["tags"][:50], 3)}
+    return "PUT", f"/places/{place_id}", {"json": payload}
+
+
+def _place_delete(rnd: random.Random, ctx: Context) -> Optional[Request]:
+    place_id = _pop(ctx.created_places)
+    return None if place_id is None else ("DELETE", f"/places/{place_id}", {})
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("health", lambda rnd, ctx: ("GET", "/health", {})),
+    Scenario("health_db", lambda rnd, ctx: ("GET", "/health/db", {})),
+    Scenario("auth_login", lambda rnd, ctx: ("POST", "/auth/login", {
+        "data": {"username": f"bench_user_{rnd.randint(1, ctx.meta['users'])}", "password": ctx.meta["password"]},
+    })),
+    Scenario("auth_me", lambda rnd, ctx: ("GET", "/auth/me", {"headers": ctx.auth("user")})),
+    Scenario("users_me", lambda rnd, ctx: ("GET", "/users/me", {"headers": ctx.auth("user")})),
+    Scenario("users_role", lambda rnd, ctx: (
+        "PUT", f"/users/{rnd.randint(2, ctx.meta['users'])}/role", {"json": {"role": "user"}, "headers": ctx.auth("admin")},
+    )),
+    Scenario("places_list", lambda rnd, ctx: ("GET", "/places", _q(limit=50, **_filters(rnd, ctx)))),
+    Scenario("places_get", lambda rnd, ctx: ("GET", f"/places/{ctx.place_id(rnd)}", {})),
+    Scenario("places_nearby", lambda rnd, ctx: ("GET", "/places/nearby", _near(rnd, ctx, limit=20, **_filters(rnd, ctx)))),
+    Scenario("places_within", lambda rnd, ctx: ("GET", "/places/within", _near(
+        rnd, ctx, radius_m=rnd.choice([500, 1000, 3000]), order_by=rnd.choice(["distance", "newest", "rating"])
+    ))),
+    Scenario("places_within_polygon", lambda rnd, ctx: (
+        "POST", "/places/within-polygon", {"json": {"geojson": _square(rnd, ctx, rnd.choice([300, 1000]))}},
+    )),
+    Scenario("places_within_polygon_count", lambda rnd, ctx: (
+        "POST", "/places/within-polygon", {"params": {"count_only": "true"}, "json": {"geojson": _square(rnd, ctx, 3000)}},
+    )),
+    Scenario("places_within_polygons", lambda rnd, ctx: (
+        "POST", "/places/within-polygons",
+        {"params": {"limit": 20}, "json": {"polygons": [{"geojson": _square(rnd, ctx, 1000)} for _ in range(5)]}},
+    )),
+    Scenario("places_search", lambda rnd, ctx: ("GET", "/places/search", _q(q=rnd.choice(ctx.meta["words"]), limit=20))),
+    Scenario("places_tags", lambda rnd, ctx: ("GET", "/places/tags", _q(search=rnd.choice(["т", "ко", "wi", None])))),
+    Scenario("places_stats", lambda rnd, ctx: ("GET", "/places/stats/by-category", {})),
+    Scenario("places_notifications", lambda rnd, ctx: ("GET", "/places/notifications", _near(rnd, ctx, radius_m=2000))),
+    Scenario("places_distance", lambda rnd, ctx: ("GET", f"/places/{ctx.place_id(rnd)}/distance", _near(rnd, ctx))),
+    Scenario("places_distance_matrix", lambda rnd, ctx: ("POST", "/places/distance-matrix", {"json": {
+        "origins": [list(ctx.point(rnd)) for _ in range(5)],
+        "bbox": [float(v) for v in ctx.bbox(rnd, 1000).split(",")],
+    }})),
+    Scenario("places_export", lambda rnd, ctx: ("GET", "/places/export/geojson", _q(bbox=ctx.bbox(rnd, 1000)))),
+    Scenario("places_clustered", lambda rnd, ctx: ("GET", "/places/clustered", _q(
+        zoom=rnd.choice([10, 12, 14]), bbox=ctx.bbox(rnd, 5000)
+    ))),
+    Scenario("places_tile", _tile),
+    Scenario("areas_list", lambda rnd, ctx: ("GET", "/areas", {"params": {"limit": 50}})),
+    Scenario("routes_list", lambda rnd, ctx: ("GET", "/routes", {"params": {"limit": 50}, "headers": ctx.auth("user")})),
+    Scenario("routes_list_polyline", lambda rnd, ctx: ("GET", "/routes", {
+        "params": {"limit": 50, "zoom": 14, "format": "polyline"}, "headers": ctx.auth("user"),
+    })),
+    Scenario("routes_places", lambda rnd, ctx: (
+        "GET", f"/routes/{rnd.randint(1, ctx.meta['routes'])}/places",
+        {"params": {"distance_m": 300}, "headers": ctx.auth("admin")},
+    )),
+    # Writes, in dependency order: later ones reuse rows the earlier ones created.
+    Scenario("places_create", lambda rnd, ctx: ("POST", "/places", {"json": _place_payload(rnd, ctx)}),
+             write=True, after=_remember_place),
+    Scenario("places_update", _place_update, write=True),
+    Scenario("places_rate", lambda rnd, ctx: (
+        "POST", f"/places/{ctx.place_id(rnd)}/rate", {"json": {"rating": rnd.randint(0, 50) / 10}},
+    ), write=True),
+    Scenario("reviews_create", lambda rnd, ctx: (
+        "POST", f"/places/{_created_place(ctx, rnd) or ctx.place_id(rnd)}/reviews",
+        {"json": {"rating": rnd.randint(0, 50) / 10, "text": "bench"}},
+    ), write=True, after=_remember_review),
+    Scenario("reviews_update", _review_update, write=True),
+    Scenario("reviews_delete", _review_delete, write=True),
+    Scenario("places_delete", _place_delete, write=True),
+    Scenario("places_import", lambda rnd, ctx: ("POST", "/places/import", {
+        "params": {"format": "ndjson"}, "content": _import_body(rnd, ctx), "headers": ctx.auth("admin"),
+    }), write=True),
+    Scenario("routes_create", lambda rnd, ctx: (
+        "POST", "/routes", {"json": _route_payload(rnd, ctx), "headers": ctx.auth("user")},
+    ), write=True),
+    Scenario("areas_create", lambda rnd, ctx: ("POST", "/areas", {
+        "json": {"name": f"Bench area {uuid.uuid4().hex[:8]}", "geojson": _square(rnd, ctx, 2000)},
+        "headers": ctx.auth("user"),
+    }), write=True),
+    Scenario("auth_signup", lambda rnd, ctx: ("POST", "/auth/signup", {
+        "json": {"username": f"bench_{uuid.uuid4().hex[:12]}", "password": ctx.meta["password"]},
+    }), write=True),
+]
+
+
+class DbTimer:
+    """Sums pg_stat_statements execution time and calls; a no-op when the extension is missing."""
+
+    def __init__(self, dsn: Optional[str]):
+        self.dsn = dsn
+        self.conn: Optional[asyncpg.Connection] = None
+
+    async def open(self) -> None:
+        settings = get_settings()
+        try:
+            self.conn = await asyncpg.connect(
+                dsn=self.dsn,
+                host=None if self.dsn else settings.db_host,
+                port=None if self.dsn else settings.db_port,
+                database=None if self.dsn else settings.db_name,
+                user=None if self.dsn else settings.db_user,
+                password=None if self.dsn else settings.db_password,
+            )
+            await self.conn.fetchrow(DB_TIME_SQL)
+        except (OSError, asyncpg.PostgresError) as exc:
+            print(f"DB time disabled: {exc}", file=sys.stderr)
+            if self.conn is not None:
+                await self.conn.close()
+            self.conn = None
+
+    async def sample(self) -> Optional[Tuple[float, int]]:
+        if self.conn is None:
+            return None
+        row = await self.conn.fetchrow(DB_TIME_SQL)
+        return row["exec_ms"], row["calls"]
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    resp = await client.post("/auth/login", data={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def _drive(
+    client: httpx.AsyncClient, scenario: Scenario, ctx: Context, rnd: random.Random, until: float, record: bool,
+    latencies: List[float], errors: List[int],
+) -> None:
+    while time.monotonic() < until:
+        request = scenario.build(rnd, ctx)
+        if request is None:
+            # Nothing left to work on (e.g. every created row already deleted).
+            return
+        method, url, kwargs = request
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+            failed = resp.status_code >= 400
+        except httpx.HTTPError:
+            resp, failed = None, True
+        elapsed = time.perf_counter() - started
+        if record:
+            latencies.append(elapsed)
+            errors[0] += failed
+        if resp is not None and scenario.after is not None:
+            scenario.after(resp, ctx)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, ctx: Context, db: DbTimer, args, seed: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = [0]
+    rnds = [random.Random(seed * 1000 + i) for i in range(args.concurrency)]
+    if args.warmup > 0:
+        until = time.monotonic() + args.warmup
+        await asyncio.gather(*(_drive(client, scenario, ctx, r, until, False, latencies, errors) for r in rnds))
+    before = await db.sample()
+    started = time.monotonic()
+    until = started + args.duration
+    await asyncio.gather(*(_drive(client, scenario, ctx, r, until, True, latencies, errors) for r in rnds))
+    wall = time.monotonic() - started
+    after = await db.sample()
+
+    result: Dict[str, Any] = {"requests": len(latencies), "errors": errors[0], "rps": round(len(latencies) / wall, 1)}
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles([x * 1000 for x in latencies], n=100, method="inclusive")
+        result.update(p50_ms=round(cuts[49], 2), p95_ms=round(cuts[94], 2), p99_ms=round(cuts[98], 2))
+    else:
+        result.update(p50_ms=None, p95_ms=None, p99_ms=None)
+    if before is not None and after is not None and latencies:
+        result["db_ms_per_req"] = round((after[0] - before[0]) / len(latencies), 3)
+        result["queries_per_req"] = round((after[1] - before[1]) / len(latencies), 2)
+    else:
+        result["db_ms_per_req"] = result["queries_per_req"] = None
+    return result
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "db_ms_per_req", "queries_per_req"]
+    print(f"{'scenario':<24}" + "".join(f"{c:>16}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<24}" + "".join(f"{_fmt(result.get(c)):>16}" for c in columns))
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Scenarios whose p95 rose or throughput fell by more than ``tolerance`` against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        if old.get("p95_ms") and result.get("p95_ms") and result["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+        if old.get("rps") and result["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['rps']} -> {result['rps']} req/s")
+        if result["errors"] > old.get("errors", 0):
+            regressions.append(f"{name}: errors {old.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+async def main_async(args) -> int:
+    with open(os.path.join(args.data, "meta.json"), encoding="utf-8") as f:
+        ctx = Context(json.load(f))
+    scenarios = [s for s in SCENARIOS if args.writes or not s.write]
+    if args.only:
+        wanted = set(args.only.split(","))
+        unknown = wanted - {s.name for s in SCENARIOS}
+        if unknown:
+            print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        scenarios = [s for s in SCENARIOS if s.name in wanted]
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    db = DbTimer(args.dsn)
+    await db.open()
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+            ctx.tokens["admin"] = await _login(client, ctx.meta["admin_user"], ctx.meta["password"])
+            ctx.tokens["user"] = await _login(client, "bench_user_2", ctx.meta["password"])
+            for i, scenario in enumerate(scenarios):
+                results[scenario.name] = await run_scenario(client, scenario, ctx, db, args, args.seed + i)
+                print(f"{scenario.name:<24} {results[scenario.name]}", file=sys.stderr, flush=True)
+    finally:
+        await db.close()
+
+    print_table(results)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "host": platform.node(),
+        "dataset": {k: ctx.meta[k] for k in ("seed", "places", "reviews", "users", "routes")},
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["dataset"] != report["dataset"] or baseline["concurrency"] != args.concurrency:
+            print("Warning: baseline was recorded with a different dataset or concurrency", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--data", default=os.path.join(BENCH_DIR, "data"), help="directory with meta.json")
+    parser.add_argument("--dsn", help="database for pg_stat_statements; default: DB_* settings")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds per scenario before measuring")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--writes", action="store_true", help="also run scenarios that modify data")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--save-baseline", metavar="NAME", help="store the report as bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="fail (exit 1) on regressions against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput change")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Per-row cost of building place list responses, legacy path vs. the current one.
+
+    PYTHONPATH=backend python bench/serialization.py [--rows 1000] [--repeat 20]
+
+Legacy: ST_AsGeoJSON text -> json.loads in row_to_place -> response_model
+validation of List[Dict[str, Any]] -> jsonable_encoder -> json.dumps.
+Current: ST_X/ST_Y floats -> row_to_place -> ORJSONResponse (no validation,
+no jsonable_encoder). Rows are synthetic, shaped like the asyncpg records of
+GET /places and GET /places/within, so only Python-side work is measured.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.services.places import row_to_place
+
+LEGACY_ADAPTER = TypeAdapter(List[Dict[str, Any]])
+
+
+def legacy_row_to_place(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "category": row["category"],
+        "description": row.get("description"),
+        "address": row.get("address"),
+        "tags": row.get("tags") or [],
+        "avg_rating": float(row["avg_rating"]) if row.get("avg_rating") is not None else None,
+        "hours": row.get("hours"),
+        "geometry": json.loads(row["geometry"]) if row.get("geometry") else None,
+        "created_at": row.get("created_at"),
+    }
+
+
+def make_rows(n: int, with_distance: bool, seed: int = 42):
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    legacy, current = [], []
+    for i in range(n):
+        lon, lat = 37.3 + rnd.random() * 0.6, 55.5 + rnd.random() * 0.4
+        base = {
+            "id": i + 1,
+            "name": f"Место {i}",
+            "category": rnd.choice(["cafe", "park", "museum", "sport"]),
+            "description": "Описание места " * 4,
+            "address": f"ул. Тестовая, {i}",
+            "tags": ["wifi", "coffee"][: rnd.randint(0, 2)],
+            "avg_rating": Decimal(f"{rnd.uniform(3, 5):.2f}"),
+            "hours": {"mon-fri": "08:00-22:00"},
+            "created_at": now - timedelta(minutes=i),
+        }
+        extra = {"distance_m": rnd.uniform(0, 5000)} if with_distance else {}
+        legacy.append(base | extra | {"geometry": json.dumps({"type": "Point", "coordinates": [lon, lat]})})
+        current.append(base | extra | {"lon": lon, "lat": lat})
+    return legacy, current
+
+
+def render_legacy(rows, with_distance: bool) -> bytes:
+    if with_distance:
+        content = [legacy_row_to_place(r) | {"distance_m": float(r["distance_m"])} for r in rows]
+    else:
+        content = [legacy_row_to_place(r) for r in rows]
+    return JSONResponse(jsonable_encoder(LEGACY_ADAPTER.validate_python(content))).body
+
+
+def render_current(rows, with_distance: bool) -> bytes:
+    if with_distance:
+        return ORJSONResponse([row_to_place(r) | {"distance_m": r["distance_m"]} for r in rows]).body
+    return ORJSONResponse([row_to_place(r) for r in rows]).body
+
+
+def measure(fn, rows, with_distance: bool, repeat: int) -> float:
+    """Median microseconds per row."""
+    fn(rows, with_distance)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows, with_distance)
+        samples.append((time.perf_counter() - started) / len(rows) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<16}{'legacy us/row':>15}{'current us/row':>16}{'speedup':>9}")
+    for endpoint, with_distance in (("/places", False), ("/places/within", True)):
+        legacy_rows, current_rows = make_rows(args.rows, with_distance)
+        before = measure(render_legacy, legacy_rows, with_distance, args.repeat)
+        after = measure(render_current, current_rows, with_distance, args.repeat)
+        print(f"{endpoint:<16}{before:>15.2f}{after:>16.2f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Интересные места города
 CREATE TABLE IF NOT EXISTS users (
@@ -24,6 +26,36 @@ CREATE TABLE IF NOT EXISTS places (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Полнотекстовый поиск: name (A) > address (B) > description (C), со стеммингом и без
+ALTER TABLE places ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', COALESCE(name, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(name, '')), 'A') ||
+    setweight(to_tsvector('russian', COALESCE(address, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(address, '')), 'B') ||
+    setweight(to_tsvector('russian', COALESCE(description, '')), 'C') ||
+    setweight(to_tsvector('simple', COALESCE(description, '')), 'C')
+) STORED;
+
+-- Агрегаты оценок: avg_rating = rating_sum / rating_count, обновляются инкрементально
+ALTER TABLE places ADD COLUMN IF NOT EXISTS rating_sum NUMERIC(14, 1) NOT NULL DEFAULT 0;
+ALTER TABLE places ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0;
+
+-- Ключ источника для массовой загрузки (upsert по external_id)
+ALTER TABLE places ADD COLUMN IF NOT EXISTS external_id TEXT;
+
+-- Словарь тегов для автодополнения, поддерживается триггерами на places
+CREATE TABLE IF NOT EXISTS tag_dictionary (
+    tag TEXT PRIMARY KEY,
+    usage_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS tag_category_counts (
+    tag TEXT NOT NULL,
+    category TEXT NOT NULL,
+    usage_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tag, category)
+);
+
 CREATE TABLE IF NOT EXISTS place_ratings (
     id SERIAL PRIMARY KEY,
     place_id INTEGER NOT NULL REFERENCES places(id) ON DELETE CASCADE,
@@ -43,6 +75,20 @@ CREATE TABLE IF NOT EXISTS reviews (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Сохранённые области для поиска по полигону; area_parts — те же полигоны, нарезанные ST_Subdivide
+CREATE TABLE IF NOT EXISTS areas (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    name TEXT NOT NULL,
+    geom GEOMETRY(MultiPolygon, 4326) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS area_parts (
+    area_id INTEGER NOT NULL REFERENCES areas(id) ON DELETE CASCADE,
+    geom GEOMETRY(Polygon, 4326) NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS routes (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -52,10 +98,128 @@ CREATE TABLE IF NOT EXISTS routes (
 );
 
 CREATE INDEX IF NOT EXISTS idx_places_geom ON places USING GIST (geom);
+-- KNN (<->) и ST_DWithin по geography в метрах
+CREATE INDEX IF NOT EXISTS idx_places_geog ON places USING GIST ((geom::geography));
+-- Уведомления: радиус + окно по created_at только по модерированным местам
+CREATE INDEX IF NOT EXISTS idx_places_recent_geog ON places USING GIST ((geom::geography), created_at)
+    WHERE is_moderated;
+CREATE INDEX IF NOT EXISTS idx_places_moderated_created ON places (created_at DESC) WHERE is_moderated;
 CREATE INDEX IF NOT EXISTS idx_places_category ON places (category);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_places_external_id ON places (external_id);
 CREATE INDEX IF NOT EXISTS idx_places_tags ON places USING GIN (tags);
+CREATE INDEX IF NOT EXISTS idx_places_search ON places USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_places_name_trgm ON places USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_places_address_trgm ON places USING GIN (address gin_trgm_ops);
 CREATE INDEX IF NOT EXISTS idx_reviews_place_id ON reviews (place_id);
 CREATE INDEX IF NOT EXISTS idx_routes_geom ON routes USING GIST (geom);
+-- Keyset-пагинация маршрутов пользователя: (created_at, id) < курсор
+CREATE INDEX IF NOT EXISTS idx_routes_user_created ON routes (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_area_parts_area ON area_parts (area_id);
+CREATE INDEX IF NOT EXISTS idx_tag_dictionary_prefix ON tag_dictionary (lower(tag) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_tag_dictionary_trgm ON tag_dictionary USING GIN (tag gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_tag_dictionary_popular ON tag_dictionary (usage_count DESC, tag);
+CREATE INDEX IF NOT EXISTS idx_tag_category_counts_popular ON tag_category_counts (category, usage_count DESC, tag);
+
+CREATE OR REPLACE FUNCTION places_sync_tag_dictionary() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE tag_dictionary d
+        SET usage_count = d.usage_count - 1
+        FROM (SELECT DISTINCT UNNEST(OLD.tags) AS tag) t
+        WHERE d.tag = t.tag;
+        UPDATE tag_category_counts c
+        SET usage_count = c.usage_count - 1
+        FROM (SELECT DISTINCT UNNEST(OLD.tags) AS tag) t
+        WHERE c.tag = t.tag AND c.category = OLD.category;
+        DELETE FROM tag_dictionary WHERE tag = ANY(OLD.tags) AND usage_count <= 0;
+        DELETE FROM tag_category_counts WHERE tag = ANY(OLD.tags) AND category = OLD.category AND usage_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO tag_dictionary (tag, usage_count)
+        SELECT DISTINCT UNNEST(NEW.tags), 1
+        ON CONFLICT (tag) DO UPDATE SET usage_count = tag_dictionary.usage_count + 1;
+        INSERT INTO tag_category_counts (tag, category, usage_count)
+        SELECT DISTINCT UNNEST(NEW.tags), NEW.category, 1
+        ON CONFLICT (tag, category) DO UPDATE SET usage_count = tag_category_counts.usage_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_places_tags_insert_delete ON places;
+CREATE TRIGGER trg_places_tags_insert_delete
+    AFTER INSERT OR DELETE ON places
+    FOR EACH ROW EXECUTE FUNCTION places_sync_tag_dictionary();
+
+DROP TRIGGER IF EXISTS trg_places_tags_update ON places;
+CREATE TRIGGER trg_places_tags_update
+    AFTER UPDATE OF tags, category ON places
+    FOR EACH ROW
+    WHEN (OLD.tags IS DISTINCT FROM NEW.tags OR OLD.category IS DISTINCT FROM NEW.category)
+    EXECUTE FUNCTION places_sync_tag_dictionary();
+
+-- Push-уведомления: NOTIFY при появлении модерированного места (вставка или снятие с модерации)
+CREATE OR REPLACE FUNCTION places_notify_event() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.is_moderated AND (TG_OP = 'INSERT' OR OLD.is_moderated IS DISTINCT FROM TRUE) THEN
+        PERFORM pg_notify('places_events', json_build_object(
+            'op', CASE WHEN TG_OP = 'INSERT' THEN 'created' ELSE 'moderated' END,
+            'id', NEW.id,
+            'lon', ST_X(NEW.geom),
+            'lat', ST_Y(NEW.geom)
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_places_notify ON places;
+CREATE TRIGGER trg_places_notify
+    AFTER INSERT OR UPDATE OF is_moderated ON places
+    FOR EACH ROW EXECUTE FUNCTION places_notify_event();
+
+-- In-memory индекс мест (SPATIAL_INDEX_ENABLED): один NOTIFY на оператор со списком id изменённых строк;
+-- если строк больше 500, вместо списка '*' — индекс перечитывается целиком
+CREATE OR REPLACE FUNCTION places_notify_changes() RETURNS TRIGGER AS $$
+DECLARE
+    ids TEXT;
+    n INTEGER;
+BEGIN
+    SELECT string_agg(id::text, ','), COUNT(*) INTO ids, n FROM changed_rows;
+    IF n > 0 THEN
+        PERFORM pg_notify('places_changes', CASE WHEN n > 500 THEN '*' ELSE ids END);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_places_changes_insert ON places;
+CREATE TRIGGER trg_places_changes_insert
+    AFTER INSERT ON places REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION places_notify_changes();
+DROP TRIGGER IF EXISTS trg_places_changes_update ON places;
+CREATE TRIGGER trg_places_changes_update
+    AFTER UPDATE ON places REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION places_notify_changes();
+DROP TRIGGER IF EXISTS trg_places_changes_delete ON places;
+CREATE TRIGGER trg_places_changes_delete
+    AFTER DELETE ON places REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION places_notify_changes();
+
+-- Заполнение словаря для уже существующих мест (повторный запуск ничего не удваивает)
+INSERT INTO tag_dictionary (tag, usage_count)
+SELECT tag, COUNT(*) FROM places CROSS JOIN LATERAL (SELECT DISTINCT UNNEST(tags) AS tag) t GROUP BY tag
+ON CONFLICT DO NOTHING;
+INSERT INTO tag_category_counts (tag, category, usage_count)
+SELECT tag, category, COUNT(*) FROM places CROSS JOIN LATERAL (SELECT DISTINCT UNNEST(tags) AS tag) t
+GROUP BY tag, category
+ON CONFLICT DO NOTHING;
+
+-- Заполнение агрегатов оценок по уже существующим отзывам (только для мест без агрегатов)
+UPDATE places p
+SET rating_sum = r.rating_sum, rating_count = r.rating_count, avg_rating = ROUND(r.rating_sum / r.rating_count, 2)
+FROM (SELECT place_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count FROM reviews GROUP BY place_id) r
+WHERE p.id = r.place_id AND p.rating_count = 0;
 
 -- Примеры вокруг центра Москвы
 INSERT INTO places (name, category, description, address, tags, avg_rating, hours, geom)